@@ -0,0 +1,204 @@
+"""Mood trend analytics over a user's daily_colors history.
+
+Rows are loaded into NumPy columns once: a continuous day axis, a [days x moods] count
+matrix, a per-day mean score and per-day hue vectors. Every series is then computed in
+vectorized form from cumulative sums:
+
+- rolling mood distributions over ``window`` days
+- the current and longest logging streaks, and the longest run of one dominant mood
+- the average hue on the color circle (circular mean, plus its concentration)
+- moving averages of mood_score
+- week-over-week deltas per ISO week
+
+The output is columnar (parallel lists indexed by day or week) so charts can use it
+directly. Results are cached per (user, window, days, today). An entry is dropped once
+this process writes the user's rows (color_cache.written_since), or once the user's
+newest row, including its mood and color, differs, which catches other workers' writes.
+NumPy is imported on the first computation, not when the API starts.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import List, Optional
+
+from backend import color_cache, core
+
+CACHE_USERS = int(os.environ.get("LUMI_ANALYTICS_CACHE_USERS", "512"))
+DEFAULT_WINDOW_DAYS = 7
+DEFAULT_HISTORY_DAYS = 365
+MAX_WINDOW_DAYS = 365
+MAX_HISTORY_DAYS = 3660
+
+# Display labels in EMOTION_MAP order, with their hues (None for Neutral)
+MOOD_HUES = {v["label"]: v["hue"] for v in core.EMOTION_MAP.values()}
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # (user_id, window, days, today) -> (newest-row key, read token, result)
+
+
+def _rolling_sum(values: "np.ndarray", window: int) -> "np.ndarray":
+    """Trailing window sums along axis 0 (shorter windows at the start)."""
+    import numpy as np
+    cumulative = np.cumsum(values, axis=0)
+    shifted = np.zeros_like(cumulative)
+    shifted[window:] = cumulative[:-window]
+    return cumulative - shifted
+
+
+def _runs(mask: "np.ndarray") -> "np.ndarray":
+    """Length of the run of True values ending at each position."""
+    import numpy as np
+    positions = np.arange(len(mask))
+    last_false = np.maximum.accumulate(np.where(~mask, positions, -1))
+    return np.where(mask, positions - last_false, 0)
+
+
+def _round_list(values: "np.ndarray", digits: int = 3) -> list:
+    import numpy as np
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def load_columns(rows: List[dict]) -> dict:
+    """Columnar view of ``rows`` on a continuous day axis from the first to the last date."""
+    import numpy as np
+    moods = list(MOOD_HUES)
+    for row in rows:
+        mood = row.get("mood") or "Neutral"
+        if mood not in MOOD_HUES and mood not in moods:
+            moods.append(mood)
+    if not rows:
+        return {"moods": moods, "days": np.array([], dtype="datetime64[D]"), "counts": np.zeros((0, len(moods))),
+                "score_sum": np.zeros(0), "hue_sin": np.zeros(0), "hue_cos": np.zeros(0), "hue_n": np.zeros(0)}
+
+    row_days = np.array([str(r["date"])[:10] for r in rows], dtype="datetime64[D]")
+    mood_index = {m: i for i, m in enumerate(moods)}
+    row_moods = np.array([mood_index[r.get("mood") or "Neutral"] for r in rows])
+    row_scores = np.array([float(r.get("mood_score") or 0) for r in rows])
+    hues = np.array([MOOD_HUES.get(m) if MOOD_HUES.get(m) is not None else np.nan for m in moods], dtype=float)
+    row_hues = np.radians(hues[row_moods])
+    has_hue = ~np.isnan(row_hues)
+
+    first = row_days.min()
+    days = np.arange(first, row_days.max() + 1)
+    offsets = (row_days - first).astype(int)
+    counts = np.zeros((len(days), len(moods)))
+    np.add.at(counts, (offsets, row_moods), 1)
+    score_sum = np.bincount(offsets, weights=row_scores, minlength=len(days))
+    hue_sin = np.bincount(offsets[has_hue], weights=np.sin(row_hues[has_hue]), minlength=len(days))
+    hue_cos = np.bincount(offsets[has_hue], weights=np.cos(row_hues[has_hue]), minlength=len(days))
+    hue_n = np.bincount(offsets[has_hue], minlength=len(days)).astype(float)
+    return {"moods": moods, "days": days, "counts": counts, "score_sum": score_sum,
+            "hue_sin": hue_sin, "hue_cos": hue_cos, "hue_n": hue_n}
+
+
+def _circular_mean(sin_sum, cos_sum, n):
+    """(mean hue in degrees, resultant length 0..1); NaN where there are no hued entries."""
+    import numpy as np
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.degrees(np.arctan2(sin_sum, cos_sum)) % 360.0
+        concentration = np.hypot(sin_sum, cos_sum) / n
+    return np.where(n > 0, mean, np.nan), np.where(n > 0, concentration, np.nan)
+
+
+def compute(rows: List[dict], window: int = DEFAULT_WINDOW_DAYS, today: Optional[date] = None) -> dict:
+    import numpy as np
+    columns = load_columns(rows)
+    moods, days, counts = columns["moods"], columns["days"], columns["counts"]
+    window = max(1, window)
+    if len(days) == 0:
+        return {"entries": 0, "moods": moods, "window_days": window, "daily": {}, "weekly": {}, "streaks": {}, "hue": {}}
+
+    entries = counts.sum(axis=1)
+    logged = entries > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_score = np.where(logged, columns["score_sum"] / entries, np.nan)
+        rolling_counts = _rolling_sum(counts, window)
+        rolling_totals = rolling_counts.sum(axis=1, keepdims=True)
+        distribution = np.where(rolling_totals > 0, rolling_counts / rolling_totals, 0.0)
+        score_ma = _rolling_sum(columns["score_sum"], window) / _rolling_sum(entries, window)
+    rolling_hue, _ = _circular_mean(_rolling_sum(columns["hue_sin"], window), _rolling_sum(columns["hue_cos"], window),
+                                    _rolling_sum(columns["hue_n"], window))
+    dominant = np.where(logged, counts.argmax(axis=1), -1)
+
+    # Streaks: consecutive logged days, and consecutive logged days with the same dominant mood
+    logging_runs = _runs(logged)
+    today = np.datetime64(today or date.today(), "D")
+    current_streak = int(logging_runs[-1]) if days[-1] >= today - 1 else 0
+    same_as_previous = np.concatenate([[False], (dominant[1:] == dominant[:-1]) & logged[1:] & logged[:-1]])
+    mood_runs = np.where(logged, _runs(same_as_previous) + 1, 0)
+    best = int(mood_runs.argmax())
+
+    hue_mean, hue_concentration = _circular_mean(columns["hue_sin"].sum(), columns["hue_cos"].sum(), columns["hue_n"].sum())
+
+    # Weeks starting on Monday (1970-01-01 was a Thursday)
+    week_index = (days.astype(int) + 3) // 7
+    weeks, week_of_day = np.unique(week_index, return_inverse=True)
+    week_entries = np.bincount(week_of_day, weights=entries)
+    week_scores = np.bincount(week_of_day, weights=columns["score_sum"])
+    week_counts = np.zeros((len(weeks), len(moods)))
+    np.add.at(week_counts, week_of_day, counts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        week_mean = np.where(week_entries > 0, week_scores / week_entries, np.nan)
+        week_distribution = np.where(week_entries[:, None] > 0, week_counts / week_entries[:, None], 0.0)
+    week_starts = (weeks * 7 - 3).astype("datetime64[D]")
+
+    return {
+        "entries": int(entries.sum()),
+        "moods": moods,
+        "window_days": window,
+        "range": {"start": str(days[0]), "end": str(days[-1]), "days": len(days)},
+        "daily": {
+            "dates": [str(d) for d in days],
+            "entries": entries.astype(int).tolist(),
+            "dominant_mood": [moods[i] if i >= 0 else None for i in dominant],
+            "mood_score": _round_list(mean_score, 2),
+            "mood_score_ma": _round_list(score_ma, 2),
+            "distribution": np.round(distribution, 3).tolist(),
+            "hue_ma": _round_list(rolling_hue, 1),
+        },
+        "streaks": {
+            "current_days": current_streak,
+            "longest_days": int(logging_runs.max()),
+            "longest_mood": {"mood": moods[dominant[best]], "days": int(mood_runs[best]), "end": str(days[best])} if logged.any() else None,
+        },
+        "hue": {"mean": _round_list(np.atleast_1d(hue_mean), 1)[0], "concentration": _round_list(np.atleast_1d(hue_concentration), 3)[0]},
+        "weekly": {
+            "week_start": [str(d) for d in week_starts],
+            "entries": week_entries.astype(int).tolist(),
+            "mood_score": _round_list(week_mean, 2),
+            "delta_entries": [None] + np.diff(week_entries).astype(int).tolist(),
+            "delta_mood_score": [None] + _round_list(np.diff(week_mean), 2),
+            "distribution": np.round(week_distribution, 3).tolist(),
+            "delta_distribution": [None] + np.round(np.diff(week_distribution, axis=0), 3).tolist(),
+        },
+    }
+
+
+def cached(user_id: str, window: int, days: int, newest: List[dict], today: date) -> Optional[dict]:
+    """The cached result if nothing the user wrote since could have changed it."""
+    key = (user_id, window, days, str(today))
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] != color_cache.newest_key(newest) or color_cache.written_since(user_id, entry[1]):
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return entry[2]
+
+
+def store(user_id: str, window: int, days: int, newest: List[dict], today: date, token: int, result: dict):
+    """Cache ``result``; ``token`` is color_cache.read_token() from before its rows were read."""
+    key = (user_id, window, days, str(today))
+    with _lock:
+        _cache[key] = (color_cache.newest_key(newest), token, result)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_USERS:
+            _cache.popitem(last=False)
+
+
+def history_start(days: int, today: Optional[date] = None) -> str:
+    days = min(max(1, days), MAX_HISTORY_DAYS)
+    return str((today or date.today()) - timedelta(days=days - 1))
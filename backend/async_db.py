@@ -0,0 +1,248 @@
+"""Async access to backend/database.py for the FastAPI handlers.
+
+Database calls run on a dedicated, bounded thread pool. All threads share the one
+database client (and so its HTTP connection pool), which lets independent reads run
+concurrently without blocking the event loop. Daily color writes go through a
+write-behind buffer: rows are queued and bulk-inserted every LUMI_DB_FLUSH_INTERVAL
+seconds or once LUMI_DB_FLUSH_SIZE rows are waiting. Failed flushes are retried with
+backoff, and the buffer is flushed on shutdown. A read for a user whose rows are still
+queued, or part of a flush in progress, flushes (or waits for that flush) first, so a
+client always sees its own writes.
+
+In upsert mode (LUMI_DAILY_UPSERT) a queued row is replaced by a later one for the same
+user and day, so only the final write of a burst reaches the database. With
+LUMI_DB_COALESCE_SECONDS > 0 such rows are also held until no new submission for that
+day has arrived for that long.
+"""
+import asyncio
+import contextvars
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
+
+from backend import database, telemetry
+
+DB_WORKERS = int(os.environ.get("LUMI_DB_WORKERS", "8"))
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("LUMI_DB_FLUSH_INTERVAL", "0.2"))
+FLUSH_SIZE = int(os.environ.get("LUMI_DB_FLUSH_SIZE", "100"))
+MAX_RETRIES = int(os.environ.get("LUMI_DB_MAX_RETRIES", "3"))
+MAX_PENDING_ROWS = int(os.environ.get("LUMI_DB_MAX_PENDING", "10000"))
+COALESCE_SECONDS = float(os.environ.get("LUMI_DB_COALESCE_SECONDS", "0"))
+RETRY_BACKOFF_SECONDS = 0.5
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="lumi-db")
+
+
+async def run(fn, *args, **kwargs):
+    """Run a blocking database function on the shared DB thread pool, inside the caller's
+    context so its spans land in the current request trace."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, partial(context.run, fn, *args, **kwargs))
+
+
+class WriteBehindBuffer:
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL_SECONDS, flush_size: int = FLUSH_SIZE,
+                 max_retries: int = MAX_RETRIES, coalesce_seconds: float = COALESCE_SECONDS):
+        self.flush_interval = flush_interval
+        self.flush_size = max(1, flush_size)
+        self.max_retries = max(1, max_retries)
+        self.coalesce_seconds = coalesce_seconds
+        self._rows: List[dict] = []
+        self._held = OrderedDict()  # (user_id, date) -> (row, release time), upsert mode only
+        self._in_flight: List[dict] = []  # rows taken by the flush that is running now
+        self._lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._retry: Optional[asyncio.Task] = None
+        self._failures = 0  # consecutive failed attempts of the current flush
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped_rows = 0
+        self.coalesced_rows = 0
+
+    def _ensure_flusher(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        telemetry.current_trace.set(None)
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._rows or self._held:
+                await self.flush(force=False)
+
+    def _coalesce(self, row: dict) -> bool:
+        """Replace a queued or held row for the same user and day; True if ``row`` was
+        absorbed (held, or swapped in for a queued row) and must not be appended."""
+        key = (row["user_id"], row["date"])
+        if self.coalesce_seconds > 0:
+            if self._held.pop(key, None) is not None:
+                self.coalesced_rows += 1
+            self._held[key] = (row, time.monotonic() + self.coalesce_seconds)
+            return True
+        for i, queued in enumerate(self._rows):
+            if (queued["user_id"], queued["date"]) == key:
+                self._rows[i] = row
+                self.coalesced_rows += 1
+                return True
+        return False
+
+    def _release_held(self, force: bool):
+        now = time.monotonic()
+        while self._held:
+            key, (row, release_at) = next(iter(self._held.items()))
+            if not force and release_at > now:
+                break
+            del self._held[key]
+            self._rows.append(row)
+
+    async def add(self, row: dict):
+        self._ensure_flusher()
+        if database.DAILY_UPSERT and self._coalesce(row):
+            return
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_size:
+            # Flush in the background so the request that filled the buffer is not held up by retries
+            asyncio.get_running_loop().create_task(self.flush(force=False))
+
+    def has_pending(self, user_id: str) -> bool:
+        return (any(row["user_id"] == user_id for row in self._rows)
+                or any(row["user_id"] == user_id for row in self._in_flight)
+                or any(key[0] == user_id for key in self._held))
+
+    async def flush(self, force: bool = True):
+        """Bulk-insert every queued row in one attempt. Held rows are included once their
+        coalescing window has passed, or always with ``force``.
+        Rows that fail go back to the front of the queue and a retry is scheduled with
+        backoff, after the lock is released, so reads that flush first (_flush_for) never
+        wait out the backoff. After ``max_retries`` failed attempts the rows wait for the
+        next periodic flush."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            self._release_held(force)
+            if not self._rows:
+                return
+            rows, self._rows = self._rows, []
+            self._in_flight = rows
+            try:
+                result = await run(database.save_daily_colors, rows)
+            finally:
+                self._in_flight = []
+            if "error" not in result:
+                self.flushes += 1
+                self.flushed_rows += len(rows)
+                self._failures = 0
+                return
+            self._failures += 1
+            print(f"[ERROR] Failed to save {len(rows)} entries (attempt {self._failures}): {result['error']}")
+            self._rows = rows + self._rows
+            if len(self._rows) > MAX_PENDING_ROWS:
+                overflow = len(self._rows) - MAX_PENDING_ROWS
+                self._rows = self._rows[overflow:]
+                self.dropped_rows += overflow
+                print(f"[ERROR] Write buffer full, dropped {overflow} oldest entries")
+            if self._failures >= self.max_retries:
+                self.failed_flushes += 1
+                self._failures = 0
+            elif self._retry is None or self._retry.done():
+                delay = RETRY_BACKOFF_SECONDS * (2 ** (self._failures - 1))
+                self._retry = asyncio.get_running_loop().create_task(self._flush_after(delay))
+
+    async def _flush_after(self, delay: float):
+        telemetry.current_trace.set(None)
+        await asyncio.sleep(delay)
+        # This attempt may need to schedule the next one
+        self._retry = None
+        await self.flush(force=False)
+
+    async def close(self):
+        for task in (self._flusher, self._retry):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._flusher = self._retry = None
+        # Shutdown may wait out the backoff: these rows have no later flush to go to
+        for attempt in range(self.max_retries):
+            await self.flush()
+            if self._retry is not None:
+                self._retry.cancel()
+                self._retry = None
+            if not self._rows:
+                break
+            if attempt + 1 < self.max_retries:
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+        if self._rows:
+            self.dropped_rows += len(self._rows)
+            print(f"[ERROR] Dropping {len(self._rows)} unsaved entries on shutdown")
+            self._rows = []
+
+    def stats(self) -> dict:
+        return {
+            "pending_rows": len(self._rows) + len(self._held) + len(self._in_flight),
+            "held_rows": len(self._held),
+            "coalesced_rows": self.coalesced_rows,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "dropped_rows": self.dropped_rows,
+        }
+
+
+write_buffer = WriteBehindBuffer()
+
+
+async def _flush_for(user_id: str):
+    if write_buffer.has_pending(user_id):
+        await write_buffer.flush()
+
+
+async def save_daily_color(user_id: str, emotion: str, color_hex: str, mood_score: int,
+                           description: Optional[str] = None, entry_text: Optional[str] = None) -> dict:
+    """Queue a daily color row for the next bulk insert"""
+    if not database.supabase:
+        return {"error": "Database not configured"}
+    await write_buffer.add(database.make_daily_color_row(user_id, emotion, color_hex, mood_score, description, entry_text))
+    return {"success": True, "queued": True}
+
+
+async def get_user_colors(user_id: str, limit: int = 30) -> List[dict]:
+    await _flush_for(user_id)
+    return await run(database.get_user_colors, user_id, limit)
+
+
+async def get_colors_by_date_range(user_id: str, start_date: str, end_date: str) -> List[dict]:
+    await _flush_for(user_id)
+    return await run(database.get_colors_by_date_range, user_id, start_date, end_date)
+
+
+async def get_write_version(user_id: str) -> Optional[int]:
+    """database.get_write_version() after flushing the user's queued rows."""
+    await _flush_for(user_id)
+    return await run(database.get_write_version, user_id)
+
+
+async def get_color_by_date(user_id: str, target_date: str) -> Optional[dict]:
+    await _flush_for(user_id)
+    return await run(database.get_color_by_date, user_id, target_date)
+
+
+async def get_mood_stats(user_id: str, days: int = 30) -> dict:
+    await _flush_for(user_id)
+    return await run(database.get_mood_stats, user_id, days)
+
+
+async def get_community_mood_today() -> dict:
+    return await run(database.get_community_mood_today)
+
+
+async def close():
+    await write_buffer.close()
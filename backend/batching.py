@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import List, Optional
+
+from backend import core, telemetry
+from backend.executor import inference_pool
+
+MAX_BATCH_SIZE = int(os.environ.get("LUMI_BATCH_MAX_SIZE", "8"))
+MAX_WAIT_MS = float(os.environ.get("LUMI_BATCH_MAX_WAIT_MS", "10"))
+LATENCY_WINDOW = 2048
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+
+class InferenceBatcher:
+    """Collects concurrent analyze requests and runs them through core.analyze_batch together.
+
+    A batch is dispatched as soon as it holds ``max_batch_size`` texts or the oldest queued
+    text has waited ``max_wait_ms``. At most one batch per inference worker runs at a time;
+    while they run, new requests keep queueing, so under load batches fill up on their own.
+    """
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS, pool=inference_pool):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.pool = pool
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self._batch_sizes = {}
+        self.requests = 0
+        self.batches = 0
+
+    async def submit(self, text: str) -> dict:
+        """Queue one text and wait for its own prediction dict.
+        Raises InferenceOverloaded when the inference pool's admission queue is full.
+        """
+        with self.pool.admit():
+            self._ensure_worker()
+            future = asyncio.get_running_loop().create_future()
+            with telemetry.span("inference"):
+                await self._queue.put((text, future, time.perf_counter()))
+                result = await future
+            # Batch-amortized model time of this text, laid out back to back so the stages
+            # end when the inference span does
+            stages = [(stage, ms) for stage, ms in result.get("cascade", {}).get("cost_ms", {}).items() if ms]
+            end = time.perf_counter() - sum(ms for _, ms in stages) / 1000.0
+            for stage, ms in stages:
+                end += ms / 1000.0
+                telemetry.add_span(stage, ms, end=end)
+            return result
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.pool.workers)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = batch[0][2] + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Take whatever is already waiting without blocking
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        # The worker outlives the request that started it, so it must not inherit its trace
+        telemetry.current_trace.set(None)
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        try:
+            texts = [text for text, _, _ in batch]
+            try:
+                results = await self.pool.run(core.analyze_batch, texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            self._record(batch)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _record(self, batch: list):
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            self._latencies_ms.append((now - enqueued_at) * 1000.0)
+        self.requests += len(batch)
+        self.batches += 1
+        self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies_ms)
+        mean_batch = self.requests / self.batches if self.batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "requests": self.requests,
+            "batches": self.batches,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "mean_batch_size": round(mean_batch, 2),
+            "mean_occupancy": round(mean_batch / self.max_batch_size, 3),
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "latency_ms": {
+                "samples": len(latencies),
+                "p50": _percentile(latencies, 50),
+                "p99": _percentile(latencies, 99),
+            },
+        }
+
+
+batcher = InferenceBatcher()
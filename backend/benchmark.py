@@ -0,0 +1,273 @@
+"""Inference benchmark and regression check for the predict path.
+
+    python -m backend.benchmark --stub --out bench.json
+    python -m backend.benchmark --stub --baseline bench.json     # exit 1 on regression
+
+Runs a fixed, seeded corpus of synthetic journal entries (varied lengths and emotions)
+through core.analyze_text, core.analyze_lines and the HTTP /predict route. It records
+per-stage time (emotion model, zero-shot, summary), throughput, p50/p99 latency, peak
+RSS and cold-start time. ``--stub`` swaps in deterministic stub pipelines with a simulated
+per-token cost, so the harness runs offline and measures only the code around the models.
+The prediction cache is disabled while measuring.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import List
+
+from backend import core
+
+CORPUS_SEED = 1234
+CORPUS_SIZE = 200
+
+TEMPLATES = {
+    "joy": ["Got great news about my promotion", "Had a wonderful dinner with friends", "I laughed all afternoon with my sister"],
+    "sadness": ["My dog has been sick and I miss how he used to be", "Felt lonely after everyone left", "I cried watching old photos"],
+    "anger": ["My coworker took credit for my work again", "Stuck in traffic for two hours, so annoying", "The landlord ignored me again"],
+    "fear": ["I'm anxious about the exam tomorrow", "Heard a strange noise at night and couldn't sleep", "Worried about my mom's surgery"],
+    "disgust": ["The kitchen at work was disgusting", "Someone was rude to a waiter and it was gross", "Found mold in my bread"],
+    "surprise": ["Wow, an old friend showed up at my door", "Didn't expect to win the raffle", "The ending of the movie shocked me"],
+    "neutral": ["Went to the store", "Did laundry and cleaned up", "Had a meeting at ten"],
+}
+PREFIXES = ["Morning: ", "Afternoon: ", "Evening: ", "A key moment: ", "Interaction: ", "A challenge: ", ""]
+
+
+def build_corpus(size: int = CORPUS_SIZE, seed: int = CORPUS_SEED) -> List[List[str]]:
+    """Journal entries as lists of lines: 1-12 lines each, mostly one dominant emotion."""
+    rng = random.Random(seed)
+    emotions = list(TEMPLATES)
+    corpus = []
+    for _ in range(size):
+        dominant = rng.choice(emotions)
+        lines = []
+        for _ in range(rng.choice([1, 1, 2, 3, 5, 8, 12])):
+            emotion = dominant if rng.random() < 0.7 else rng.choice(emotions)
+            lines.append(rng.choice(PREFIXES) + rng.choice(TEMPLATES[emotion]))
+        corpus.append(lines)
+    return corpus
+
+
+class StubEmotionClassifier:
+    """Deterministic stand-in for the emotion pipeline; cost grows with token count."""
+    labels = ["joy", "sadness", "anger", "fear", "disgust", "surprise", "neutral"]
+
+    def __init__(self, ms_per_token: float = 0.02):
+        self.ms_per_token = ms_per_token
+
+    def _one(self, text: str):
+        time.sleep(self.ms_per_token * len(text.split()) / 1000.0)
+        rng = random.Random(text)
+        weights = [rng.random() ** 3 for _ in self.labels]
+        total = sum(weights)
+        return [{"label": label, "score": w / total} for label, w in zip(self.labels, weights)]
+
+    def __call__(self, texts, **kwargs):
+        if isinstance(texts, list):
+            return [self._one(t) for t in texts]
+        return [self._one(texts)]
+
+
+class StubZeroShot:
+    """Deterministic stand-in for zero-shot NLI: one pass per candidate label."""
+
+    def __init__(self, ms_per_token: float = 0.02):
+        self.ms_per_token = ms_per_token
+
+    def _one(self, text: str, labels):
+        time.sleep(self.ms_per_token * len(text.split()) * len(labels) / 1000.0)
+        rng = random.Random("zs" + text)
+        weights = [rng.random() ** 2 for _ in labels]
+        total = sum(weights)
+        ranked = sorted(zip(labels, (w / total for w in weights)), key=lambda kv: kv[1], reverse=True)
+        return {"sequence": text, "labels": [l for l, _ in ranked], "scores": [s for _, s in ranked]}
+
+    def __call__(self, texts, candidate_labels, **kwargs):
+        if isinstance(texts, list):
+            return [self._one(t, candidate_labels) for t in texts]
+        return self._one(texts, candidate_labels)
+
+
+class _Timed:
+    def __init__(self, fn, bucket: dict, key: str):
+        self.fn, self.bucket, self.key = fn, bucket, key
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.fn(*args, **kwargs)
+        finally:
+            self.bucket[self.key] += (time.perf_counter() - start) * 1000.0
+
+
+def _percentiles(latencies_ms: List[float]) -> dict:
+    values = sorted(latencies_ms)
+    if not values:
+        return {"p50_ms": None, "p99_ms": None}
+    return {
+        "p50_ms": round(values[len(values) // 2], 3),
+        "p99_ms": round(values[min(len(values) - 1, int(len(values) * 0.99))], 3),
+    }
+
+
+def _measure(name: str, fn, inputs: list, stage_ms: dict) -> dict:
+    for key in stage_ms:
+        stage_ms[key] = 0.0
+    latencies = []
+    start = time.perf_counter()
+    for item in inputs:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    elapsed = time.perf_counter() - start
+    return {
+        "target": name,
+        "requests": len(inputs),
+        "throughput_rps": round(len(inputs) / elapsed, 2) if elapsed > 0 else None,
+        **_percentiles(latencies),
+        "stage_ms_per_request": {k: round(v / max(1, len(inputs)), 3) for k, v in stage_ms.items()},
+    }
+
+
+def _measure_http(corpus: List[List[str]], concurrency: int, stage_ms: dict) -> dict:
+    try:
+        import httpx
+        from backend.main import app
+    except ImportError as e:
+        return {"target": "http /predict", "skipped": f"missing dependency: {e}"}
+
+    for key in stage_ms:
+        stage_ms[key] = 0.0
+
+    async def run():
+        latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            async def one(lines):
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    response = await client.post("/predict", json={"lines": lines})
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - t0) * 1000.0)
+            start = time.perf_counter()
+            await asyncio.gather(*(one(lines) for lines in corpus))
+            return latencies, time.perf_counter() - start
+
+    latencies, elapsed = asyncio.run(run())
+    return {
+        "target": "http /predict",
+        "requests": len(corpus),
+        "concurrency": concurrency,
+        "throughput_rps": round(len(corpus) / elapsed, 2) if elapsed > 0 else None,
+        **_percentiles(latencies),
+        "stage_ms_per_request": {k: round(v / max(1, len(corpus)), 3) for k, v in stage_ms.items()},
+    }
+
+
+def measure_cold_start(stub: bool) -> dict:
+    """Time a fresh interpreter importing backend.core (and loading the models unless stubbed)."""
+    code = (
+        "import time; t0 = time.perf_counter(); from backend import core; t1 = time.perf_counter();"
+        + ("" if stub else " core.load_pipelines(['emotion', 'zero_shot']);")
+        + " t2 = time.perf_counter(); print(t1 - t0, t2 - t1)"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    import_s, load_s = (float(x) for x in result.stdout.strip().splitlines()[-1].split())
+    return {"import_s": round(import_s, 3), "model_load_s": round(load_s, 3), "total_s": round(import_s + load_s, 3)}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_benchmark(stub: bool = True, size: int = CORPUS_SIZE, concurrency: int = 16, cold_start: bool = True) -> dict:
+    corpus = build_corpus(size)
+    if stub:
+        core.emotion_classifier = StubEmotionClassifier()
+        core.zero_shot = StubZeroShot()
+    else:
+        core.load_pipelines(["emotion", "zero_shot"])
+    core.prediction_cache.max_entries = 0
+
+    stage_ms = {"emotion": 0.0, "zero_shot": 0.0, "summary": 0.0}
+    core.emotion_classifier = _Timed(core.emotion_classifier, stage_ms, "emotion")
+    core.zero_shot = _Timed(core.zero_shot, stage_ms, "zero_shot")
+    original_summary = core.make_summary
+    core.make_summary = _Timed(original_summary, stage_ms, "summary")
+    try:
+        texts = [core.lines_to_text(lines) for lines in corpus]
+        results = [
+            _measure("analyze_text", core.analyze_text, texts, stage_ms),
+            _measure("analyze_lines", core.analyze_lines, corpus, stage_ms),
+            _measure_http(corpus, concurrency, stage_ms),
+        ]
+    finally:
+        core.make_summary = original_summary
+
+    return {
+        "stub": stub,
+        "corpus": {"seed": CORPUS_SEED, "entries": len(corpus), "lines": sum(len(c) for c in corpus)},
+        "results": results,
+        "peak_rss_mb": _peak_rss_mb(),
+        "cold_start": measure_cold_start(stub) if cold_start else None,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of current vs baseline beyond ``tolerance`` (a fraction, e.g. 0.1)."""
+    regressions = []
+    base_by_target = {r["target"]: r for r in baseline.get("results", [])}
+    for result in current["results"]:
+        base = base_by_target.get(result["target"])
+        if not base or "skipped" in result or "skipped" in base:
+            continue
+        if base.get("throughput_rps") and result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{result['target']}: throughput {result['throughput_rps']} < baseline {base['throughput_rps']}")
+        if base.get("p99_ms") and result["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{result['target']}: p99 {result['p99_ms']}ms > baseline {base['p99_ms']}ms")
+    if baseline.get("peak_rss_mb") and current["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS {current['peak_rss_mb']}MB > baseline {baseline['peak_rss_mb']}MB")
+    base_cold = (baseline.get("cold_start") or {}).get("total_s")
+    cur_cold = (current.get("cold_start") or {}).get("total_s")
+    if base_cold and cur_cold and cur_cold > base_cold * (1 + tolerance):
+        regressions.append(f"cold start {cur_cold}s > baseline {base_cold}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stub", action="store_true", help="use deterministic stub pipelines (offline)")
+    parser.add_argument("--size", type=int, default=CORPUS_SIZE)
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients for the HTTP target")
+    parser.add_argument("--no-cold-start", action="store_true")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a previous --out file")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    report = run_benchmark(stub=args.stub, size=args.size, concurrency=args.concurrency, cold_start=not args.no_cold_start)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
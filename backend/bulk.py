@@ -0,0 +1,95 @@
+import json
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from backend import core
+from backend.executor import inference_pool
+
+BULK_BATCH_SIZE = int(os.environ.get("LUMI_BULK_BATCH_SIZE", "32"))
+
+
+async def iter_ndjson_texts(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    """Yield (text, bytes_consumed) from an NDJSON byte stream without buffering the whole body.
+    Each line is either a JSON string or an object with a "text" field; blank lines are skipped.
+    """
+    buffer = b""
+    consumed = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            consumed += len(line) + 1
+            text = _parse_line(line)
+            if text is not None:
+                yield text, consumed
+    consumed += len(buffer)
+    text = _parse_line(buffer)
+    if text is not None:
+        yield text, consumed
+
+
+def _parse_line(line: bytes) -> Optional[str]:
+    line = line.strip()
+    if not line:
+        return None
+    value = json.loads(line)
+    return value if isinstance(value, str) else str(value.get("text", ""))
+
+
+async def analyze_stream(texts: AsyncIterator[tuple], total_bytes: Optional[int] = None,
+                         batch_size: int = BULK_BATCH_SIZE) -> AsyncIterator[str]:
+    """Analyze texts in batches and yield NDJSON lines as each batch finishes.
+
+    Every input produces {"index", "text", "prediction"}; after each batch a
+    {"progress": ...} line reports how far along the upload is, and a final
+    {"done": true, ...} line closes the stream. A malformed input line ends the stream
+    with an {"error": ...} line; a batch whose inference fails gets one
+    {"server_error": ..., "first_index", "count"} line instead of its results.
+    """
+    start = time.perf_counter()
+    index = 0
+    failed = 0
+    consumed = 0
+    batch = []
+
+    async def flush():
+        nonlocal index, failed
+        lines = []
+        try:
+            predictions = await inference_pool.run_when_admitted(core.analyze_batch, batch, weight=len(batch))
+        except Exception as e:
+            print(f"[ERROR] Bulk inference failed for {len(batch)} texts: {e}")
+            lines.append(json.dumps({"server_error": f"Inference failed: {e}", "first_index": index, "count": len(batch)}) + "\n")
+            index += len(batch)
+            failed += len(batch)
+        else:
+            for text, prediction in zip(batch, predictions):
+                lines.append(json.dumps({"index": index, "text": text, "prediction": prediction}) + "\n")
+                index += 1
+        progress = {"processed": index, "elapsed_s": round(time.perf_counter() - start, 3)}
+        if total_bytes:
+            progress["fraction"] = round(min(1.0, consumed / total_bytes), 4)
+        lines.append(json.dumps({"progress": progress}) + "\n")
+        batch.clear()
+        return "".join(lines)
+
+    lines_in = texts.__aiter__()
+    while True:
+        try:
+            text, consumed = await lines_in.__anext__()
+        except StopAsyncIteration:
+            break
+        except (ValueError, AttributeError) as e:
+            # Malformed NDJSON: answer the texts read before it, then report it in-band
+            # (the status line has already been sent)
+            if batch:
+                yield await flush()
+            yield json.dumps({"error": f"Invalid input after {index} texts: {e}"}) + "\n"
+            return
+        batch.append(text)
+        if len(batch) >= batch_size:
+            yield await flush()
+    if batch:
+        yield await flush()
+    yield json.dumps({"done": True, "processed": index, "failed": failed, "elapsed_s": round(time.perf_counter() - start, 3)}) + "\n"
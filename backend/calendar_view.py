@@ -0,0 +1,85 @@
+"""Compact month payload for the calendar screen.
+
+The calendar only needs each day's color and mood. Instead of full daily_colors rows
+(with the long ``description``), a month is returned as parallel columns:
+
+    {"year": 2026, "month": 10, "moods": ["Joyful", ...], "palette": ["#f2f27f", ...],
+     "day": [1, 4, 5], "mood": [0, 2, 2], "color_hex": ["#f2f27f", ...], "mood_score": [81, 40, 55]}
+
+``mood`` holds indices into ``moods`` and ``palette``. A day with several rows shows the
+newest. The description for a day is fetched on demand from /colors/{user_id}/date/{date}.
+
+Responses carry a strong ETag built from the user's write version
+(database.get_write_version), a counter that a database trigger bumps on every write to
+their rows, so all worker processes agree on it. A client that revisits a month with
+If-None-Match gets 304 Not Modified after that one-row lookup, without reading the month.
+Without the user_write_versions table the tag hashes the month's payload instead.
+"""
+import calendar
+import hashlib
+import json
+from typing import List
+
+from backend import core
+
+# Bump when the payload layout changes so clients do not keep an old shape on 304s
+PAYLOAD_VERSION = 2
+MOODS = [v["label"] for v in core.EMOTION_MAP.values()]
+
+
+def month_range(year: int, month: int):
+    """(first day, last day) of the month as ISO strings; ValueError for an invalid month."""
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        raise ValueError(f"Invalid month: {year}-{month}")
+    return f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}"
+
+
+def etag(user_id: str, year: int, month: int, write_version: str) -> str:
+    digest = hashlib.sha256(f"{PAYLOAD_VERSION}|{user_id}|{year}-{month}|{write_version}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def payload_version(payload: dict) -> str:
+    """Stand-in write version when user_write_versions is missing: a hash of the month."""
+    return "rows:" + hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def not_modified(if_none_match: str, tag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == tag for c in candidates)
+
+
+def month_payload(rows: List[dict], year: int, month: int) -> dict:
+    moods = list(MOODS)
+    mood_index = {m: i for i, m in enumerate(moods)}
+    latest = {}
+    for row in rows:
+        day = int(str(row["date"])[8:10])
+        if day not in latest or (row.get("id") or 0) >= (latest[day].get("id") or 0):
+            latest[day] = row
+
+    days, codes, colors, scores = [], [], [], []
+    for day in sorted(latest):
+        row = latest[day]
+        mood = row.get("mood") or "Neutral"
+        if mood not in mood_index:
+            mood_index[mood] = len(moods)
+            moods.append(mood)
+        days.append(day)
+        codes.append(mood_index[mood])
+        colors.append(row.get("color_hex") or core.MOOD_HEX.get(mood, core.hue_to_hex(None)))
+        scores.append(row.get("mood_score"))
+    return {
+        "year": year,
+        "month": month,
+        "days_in_month": calendar.monthrange(year, month)[1],
+        "moods": moods,
+        "palette": [core.MOOD_HEX.get(m, core.hue_to_hex(None)) for m in moods],
+        "day": days,
+        "mood": codes,
+        "color_hex": colors,
+        "mood_score": scores,
+    }
@@ -0,0 +1,131 @@
+"""Offline accuracy-vs-cost evaluation of the emotion -> zero-shot cascade.
+
+    python -m backend.cascade_eval corpus.jsonl [--grid grid.json] [--out report.json]
+
+The corpus is JSONL with one {"text": ..., "label": ...} object per line, where ``label`` is
+an EMOTION_MAP key ("Sad/Depressed") or its display label ("Sad"). Both models run once
+over the whole corpus in batches; every policy in the grid is then replayed on the cached
+scores, so sweeping thresholds costs no extra inference. For each policy the report gives
+accuracy, the share of texts that would call zero-shot and the estimated model time per text.
+"""
+import argparse
+import itertools
+import json
+import time
+from dataclasses import asdict
+from typing import Dict, List
+
+from backend import core
+
+DEFAULT_GRID = {
+    "mode": ["full", "fast-only"],
+    "emotion_confidence_threshold": [0.35, 0.45, 0.55, 0.65],
+    "multi_label_accept_factor": [0.6, 0.75, 0.9],
+}
+BATCH_SIZE = 16
+
+
+def load_corpus(path: str) -> List[dict]:
+    display_to_key = {v["label"].lower(): k for k, v in core.EMOTION_MAP.items()}
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            label = row["label"]
+            key = label if label in core.EMOTION_MAP else display_to_key.get(label.lower())
+            if key is None:
+                raise ValueError(f"Unknown label {label!r} for text {row['text']!r}")
+            corpus.append({"text": row["text"].strip(), "label": key})
+    return corpus
+
+
+def score_corpus(texts: List[str], run_zero_shot: bool = True) -> dict:
+    """Run both models once over ``texts`` and time them per text."""
+    emotion_scores, zero_shot_outputs = [], []
+    emotion_ms = zero_shot_ms = 0.0
+    for start in range(0, len(texts), BATCH_SIZE):
+        batch = texts[start:start + BATCH_SIZE]
+        t0 = time.perf_counter()
+        emotion_scores.extend(core.classify_emotions(batch))
+        emotion_ms += (time.perf_counter() - t0) * 1000.0
+        if run_zero_shot:
+            t0 = time.perf_counter()
+            zero_shot_outputs.extend(core.classify_zero_shot(batch))
+            zero_shot_ms += (time.perf_counter() - t0) * 1000.0
+        else:
+            zero_shot_outputs.extend({"labels": [], "scores": []} for _ in batch)
+    n = max(1, len(texts))
+    return {
+        "emotion_scores": emotion_scores,
+        "zero_shot_outputs": zero_shot_outputs,
+        "emotion_ms_per_text": emotion_ms / n,
+        "zero_shot_ms_per_text": zero_shot_ms / n,
+    }
+
+
+def evaluate_policy(policy: core.CascadePolicy, corpus: List[dict], scored: dict) -> dict:
+    correct = zero_shot_calls = 0
+    for row, label_scores, output in zip(corpus, scored["emotion_scores"], scored["zero_shot_outputs"]):
+        result = core.decide_from_emotion(label_scores, policy)
+        if result is None:
+            if policy.mode == "fast-only":
+                output = {"labels": [], "scores": []}
+            else:
+                zero_shot_calls += 1
+            result = core.decide_with_zero_shot(label_scores, output, policy)
+        correct += result["raw_emotion"] == row["label"]
+    n = max(1, len(corpus))
+    zero_shot_rate = zero_shot_calls / n
+    return {
+        "policy": asdict(policy),
+        "accuracy": round(correct / n, 4),
+        "zero_shot_rate": round(zero_shot_rate, 4),
+        "est_ms_per_text": round(scored["emotion_ms_per_text"] + zero_shot_rate * scored["zero_shot_ms_per_text"], 2),
+    }
+
+
+def evaluate_grid(corpus: List[dict], grid: Dict[str, list]) -> dict:
+    base = core.default_policy()
+    needs_zero_shot = "full" in grid.get("mode", []) or base.mode == "full"
+    scored = score_corpus([row["text"] for row in corpus], run_zero_shot=needs_zero_shot)
+    keys = list(grid)
+    results = [
+        evaluate_policy(base.with_overrides(**dict(zip(keys, values))), corpus, scored)
+        for values in itertools.product(*(grid[k] for k in keys))
+    ]
+    results.sort(key=lambda r: (-r["accuracy"], r["est_ms_per_text"]))
+    return {
+        "corpus_size": len(corpus),
+        "emotion_ms_per_text": round(scored["emotion_ms_per_text"], 2),
+        "zero_shot_ms_per_text": round(scored["zero_shot_ms_per_text"], 2),
+        "current": evaluate_policy(base, corpus, scored),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus")
+    parser.add_argument("--grid", help="JSON file mapping CascadePolicy fields to lists of values")
+    parser.add_argument("--out", help="write the full report here as JSON")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    report = evaluate_grid(load_corpus(args.corpus), grid)
+
+    print(f"{'accuracy':>9} {'zero-shot':>9} {'ms/text':>8}  policy")
+    for r in report["results"]:
+        overrides = {k: r["policy"][k] for k in grid}
+        print(f"{r['accuracy']:>9.1%} {r['zero_shot_rate']:>9.1%} {r['est_ms_per_text']:>8.1f}  {overrides}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Token-budget windows for long journal entries.
+
+The HF pipelines truncate at the model's maximum length, so a long day loses its later
+lines. core.analyze_chunked() avoids that. It splits the entry into windows of at most
+the budget, classifies the windows as one batch and combines the per-window scores with
+the helpers here. The budget is the emotion model's input limit (model_max_length minus
+its special tokens), so in ``auto`` mode only entries that would really be truncated
+take this path; LUMI_CHUNK_TOKEN_BUDGET overrides it.
+
+A window is normally one line. Lines over the budget are split at sentence boundaries,
+and sentences over the budget are split between words. When there are more than
+LUMI_CHUNK_MAX_WINDOWS windows, adjacent ones are packed together, no coarser than needed.
+Whatever still does not fit is dropped and the result is marked ``truncated``. This
+bounds the model work per entry.
+"""
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+CHUNK_MODE = os.environ.get("LUMI_CHUNKED_ANALYSIS", "auto").lower()  # auto | always | off
+# Unset: use the emotion model's own limit (see token_budget)
+TOKEN_BUDGET = int(os.environ["LUMI_CHUNK_TOKEN_BUDGET"]) if os.environ.get("LUMI_CHUNK_TOKEN_BUDGET") else None
+MAX_WINDOWS = int(os.environ.get("LUMI_CHUNK_MAX_WINDOWS", "16"))
+# 512-token encoders minus <s>/</s>, for when the tokenizer is not loaded or reports no limit
+DEFAULT_MODEL_LIMIT = 510
+
+# Subword tokenizers average a little over one token per English word
+TOKENS_PER_WORD = 1.35
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate from the word count; used where the tokenizer is unavailable
+    or too costly to call (e.g. on the event loop)."""
+    return int(len(text.split()) * TOKENS_PER_WORD) + 1
+
+
+def tokenizer_counter(pipe) -> Callable[[str], int]:
+    """Exact token counter from a pipeline's tokenizer, falling back to estimate_tokens."""
+    tokenizer = getattr(pipe, "tokenizer", None)
+    if tokenizer is None:
+        return estimate_tokens
+
+    def count(text: str) -> int:
+        try:
+            return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+        except Exception:
+            return estimate_tokens(text)
+    return count
+
+
+def model_token_limit(pipe) -> int:
+    """Tokens of text the pipeline's model reads before truncating, special tokens excluded."""
+    tokenizer = getattr(pipe, "tokenizer", None)
+    max_length = getattr(tokenizer, "model_max_length", None)
+    # Tokenizers without a configured limit report a huge sentinel (int(1e30))
+    if not isinstance(max_length, int) or not 0 < max_length <= 100_000:
+        return DEFAULT_MODEL_LIMIT
+    try:
+        special = tokenizer.num_special_tokens_to_add()
+    except Exception:
+        special = 2
+    return max(1, max_length - special)
+
+
+def token_budget(pipe=None) -> int:
+    """LUMI_CHUNK_TOKEN_BUDGET if set, else the limit of ``pipe`` (the emotion pipeline)."""
+    return TOKEN_BUDGET or model_token_limit(pipe)
+
+
+def should_chunk(lines: List[str], budget: Optional[int] = None, mode: Optional[str] = None,
+                 count_tokens: Callable[[str], int] = estimate_tokens) -> bool:
+    """In ``auto`` mode: whether the entry is longer than ``budget`` tokens, i.e. would be truncated."""
+    mode = mode or CHUNK_MODE
+    if mode == "always":
+        return True
+    if mode == "off":
+        return False
+    return count_tokens(" ".join(lines)) > (budget or token_budget())
+
+
+def _split_long(text: str, budget: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Split one line into pieces of at most ``budget`` tokens, at sentences and then words."""
+    if count_tokens(text) <= budget:
+        return [text]
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        if count_tokens(sentence) <= budget:
+            pieces.append(sentence)
+            continue
+        words, current = sentence.split(), []
+        for word in words:
+            if current and count_tokens(" ".join(current + [word])) > budget:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+    return _pack(pieces, [[i] for i in range(len(pieces))], budget, count_tokens)[0]
+
+
+def _pack(texts: List[str], owners: List[List[int]], budget: int, count_tokens: Callable[[str], int]):
+    """Greedily merge adjacent texts while the merged text stays within budget."""
+    packed, packed_owners = [], []
+    for text, owner in zip(texts, owners):
+        if packed and count_tokens(packed[-1] + " " + text) <= budget:
+            packed[-1] = packed[-1] + " " + text
+            packed_owners[-1] = sorted(set(packed_owners[-1]) | set(owner))
+        else:
+            packed.append(text)
+            packed_owners.append(list(owner))
+    return packed, packed_owners
+
+
+def split_windows(lines: List[str], budget: int = DEFAULT_MODEL_LIMIT, max_windows: int = MAX_WINDOWS,
+                  count_tokens: Callable[[str], int] = estimate_tokens) -> dict:
+    """Windows of at most ``budget`` tokens over the non-blank lines.
+
+    Returns {"windows": [text], "lines": [[line index]] (the lines each window covers),
+    "tokens": [int], "truncated": bool}. Line indices refer to ``lines``.
+    """
+    texts, owners = [], []
+    for index, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        for piece in _split_long(line, budget, count_tokens):
+            texts.append(piece)
+            owners.append([index])
+    if len(texts) > max_windows:
+        # Pack only as coarsely as needed, so the line timeline keeps as much detail as it can
+        target = max(1, sum(count_tokens(t) for t in texts) // max_windows)
+        while True:
+            packed, packed_owners = _pack(texts, owners, min(target, budget), count_tokens)
+            if len(packed) <= max_windows or target >= budget:
+                break
+            target = int(target * 1.25) + 1
+        texts, owners = packed, packed_owners
+    truncated = len(texts) > max_windows
+    texts, owners = texts[:max_windows], owners[:max_windows]
+    return {"windows": texts, "lines": owners, "tokens": [count_tokens(t) for t in texts], "truncated": truncated}
+
+
+def combine_scores(score_dicts: List[Dict[str, float]], weights: List[float]) -> Dict[str, float]:
+    """Weighted mean of per-window {label: score} dicts; windows without scores are skipped."""
+    combined: Dict[str, float] = {}
+    total = 0.0
+    for scores, weight in zip(score_dicts, weights):
+        if not scores:
+            continue
+        total += weight
+        for label, score in scores.items():
+            combined[label] = combined.get(label, 0.0) + score * weight
+    if total <= 0:
+        return {}
+    return {label: score / total for label, score in combined.items()}
+
+
+def combine_zero_shot(outputs: List[dict], weights: List[float]) -> dict:
+    """Weighted mean of per-window zero-shot outputs, in the pipeline's output shape."""
+    combined = combine_scores([dict(zip(o.get("labels", []), map(float, o.get("scores", [])))) for o in outputs], weights)
+    ranked = sorted(combined.items(), key=lambda kv: kv[1], reverse=True)
+    return {"labels": [label for label, _ in ranked], "scores": [score for _, score in ranked]}
@@ -0,0 +1,221 @@
+"""Per-user read-through cache of recent ``daily_colors`` rows.
+
+For each user the cache holds one contiguous date window [start, end] together with every
+row in it. Range, single-date and "most recent N" queries are answered from the window
+when it covers them. A miss goes to the database, and the fetched rows are merged into the
+window when they touch it or replace it when they do not. Rows written through
+database.save_daily_color(s) are patched into a cached window that covers their date.
+A read takes read_token() before querying and passes it to store_*. If the user was
+written in the meantime, the possibly stale result is not cached. Users are evicted LRU,
+windows expire after LUMI_COLOR_CACHE_TTL seconds (so other workers' writes show up), and
+a window never grows beyond LUMI_COLOR_CACHE_MAX_ROWS.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import List, Optional
+
+MAX_USERS = int(os.environ.get("LUMI_COLOR_CACHE_USERS", "1024"))
+MAX_ROWS_PER_USER = int(os.environ.get("LUMI_COLOR_CACHE_MAX_ROWS", "400"))
+TTL_SECONDS = float(os.environ.get("LUMI_COLOR_CACHE_TTL", "300"))
+
+MIN_DATE = "0001-01-01"
+MAX_DATE = "9999-12-31"
+
+_lock = threading.Lock()
+_windows = OrderedDict()  # user_id -> {"start", "end", "rows", "loaded_at"}
+_stats = {"hits": 0, "misses": 0, "patched_rows": 0, "evictions": 0, "stale_stores": 0}
+_write_seq = 0  # bumped on every write or invalidation
+_write_versions = OrderedDict()  # user_id -> _write_seq of the user's latest write
+# Users without an entry (never written, or evicted) share the newest evicted version, so
+# an evicted user's version never goes back to a value handed out before their last write
+_write_version_floor = 0
+
+
+def _note_write(user_id: str):
+    """Record a write to ``user_id`` (call with _lock held)."""
+    global _write_seq, _write_version_floor
+    _write_seq += 1
+    _write_versions[user_id] = _write_seq
+    _write_versions.move_to_end(user_id)
+    while len(_write_versions) > MAX_USERS * 4:
+        _, version = _write_versions.popitem(last=False)
+        _write_version_floor = max(_write_version_floor, version)
+
+
+def _written_since(user_id: str, token: Optional[int]) -> bool:
+    return token is not None and _write_versions.get(user_id, _write_version_floor) > token
+
+
+def read_token() -> int:
+    """Take before a database read; store_* skip the result if the user is written after it."""
+    with _lock:
+        return _write_seq
+
+
+def newest_key(newest: List[dict]):
+    """The user's newest row with the columns an in-place rewrite changes. Caches derived
+    from daily_colors compare it to notice writes made by other worker processes."""
+    if not newest:
+        return None
+    row = newest[0]
+    return (str(row["date"]), row.get("id"), row.get("mood"), row.get("mood_score"), row.get("color_hex"))
+
+
+def written_since(user_id: str, token: int) -> bool:
+    """Whether this process wrote ``user_id``'s rows after read_token() returned ``token``.
+    Lets caches built on top of daily_colors reads check that they are still current."""
+    with _lock:
+        return _written_since(user_id, token)
+
+
+def _sort_key(row: dict):
+    return (str(row.get("date")), row.get("id") or 0)
+
+
+def _next_day(day: str) -> str:
+    try:
+        return str(date.fromisoformat(day) + timedelta(days=1))
+    except (ValueError, OverflowError):
+        return day
+
+
+def _window(user_id: str) -> Optional[dict]:
+    window = _windows.get(user_id)
+    if window is None:
+        return None
+    if time.time() - window["loaded_at"] > TTL_SECONDS:
+        del _windows[user_id]
+        return None
+    _windows.move_to_end(user_id)
+    return window
+
+
+def _hit(rows: List[dict]) -> List[dict]:
+    _stats["hits"] += 1
+    return [dict(r) for r in rows]
+
+
+def _store(user_id: str, start: str, end: str, rows: List[dict]):
+    """Merge rows covering [start, end] into the user's window."""
+    rows = [dict(r) for r in rows]
+    window = _window(user_id)
+    if window is not None and start <= _next_day(window["end"]) and window["start"] <= _next_day(end):
+        # Overlapping or adjacent: keep cached rows outside the fetched range, take fetched rows inside it
+        kept = [r for r in window["rows"] if not (start <= str(r["date"]) <= end)]
+        start, end = min(start, window["start"]), max(end, window["end"])
+        rows = kept + rows
+        loaded_at = window["loaded_at"]
+    else:
+        loaded_at = time.time()
+    rows.sort(key=_sort_key)
+    if len(rows) > MAX_ROWS_PER_USER:
+        # Keep the newest rows; the window then starts after the last fully dropped date
+        dropped_date = str(rows[len(rows) - MAX_ROWS_PER_USER - 1]["date"])
+        rows = [r for r in rows if str(r["date"]) > dropped_date]
+        start = _next_day(dropped_date)
+    _windows[user_id] = {"start": start, "end": end, "rows": rows, "loaded_at": loaded_at}
+    _windows.move_to_end(user_id)
+    while len(_windows) > MAX_USERS:
+        _windows.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def get_range(user_id: str, start_date: str, end_date: str) -> Optional[List[dict]]:
+    """Rows in [start_date, end_date] ordered by date, or None if the window does not cover it."""
+    with _lock:
+        window = _window(user_id)
+        if window is not None and window["start"] <= start_date and end_date <= window["end"]:
+            return _hit([r for r in window["rows"] if start_date <= str(r["date"]) <= end_date])
+        _stats["misses"] += 1
+        return None
+
+
+def get_date(user_id: str, target_date: str) -> Optional[List[dict]]:
+    """Rows on ``target_date`` (possibly empty), or None if the window does not cover it."""
+    return get_range(user_id, target_date, target_date)
+
+
+def get_recent(user_id: str, limit: int) -> Optional[List[dict]]:
+    """The newest ``limit`` rows, or None unless the window reaches the newest possible
+    date and holds enough rows (or the user's whole history)."""
+    with _lock:
+        window = _window(user_id)
+        if window is not None and window["end"] == MAX_DATE and (len(window["rows"]) >= limit or window["start"] == MIN_DATE):
+            return _hit(list(reversed(window["rows"]))[:limit])
+        _stats["misses"] += 1
+        return None
+
+
+def store_range(user_id: str, start_date: str, end_date: str, rows: List[dict], token: Optional[int] = None):
+    with _lock:
+        if _written_since(user_id, token):
+            _stats["stale_stores"] += 1
+            return
+        _store(user_id, start_date, end_date, rows)
+
+
+def store_recent(user_id: str, limit: int, rows: List[dict], token: Optional[int] = None):
+    """Cache the result of an ORDER BY date DESC LIMIT query."""
+    if len(rows) < limit:
+        start = MIN_DATE
+    elif rows:
+        # The oldest date may be cut by the limit, so only later dates are known complete
+        oldest = min(str(r["date"]) for r in rows)
+        start = _next_day(oldest)
+        rows = [r for r in rows if str(r["date"]) > oldest]
+    else:
+        return
+    with _lock:
+        if _written_since(user_id, token):
+            _stats["stale_stores"] += 1
+            return
+        _store(user_id, start, MAX_DATE, rows)
+
+
+def patch(row: dict):
+    """Add a freshly written row to its user's window if the window covers its date,
+    replacing the cached copy of the same row (an upsert returns the existing id)."""
+    with _lock:
+        _note_write(row["user_id"])
+        window = _window(row["user_id"])
+        if window is None:
+            return
+        if window["start"] <= str(row["date"]) <= window["end"]:
+            if row.get("id") is not None:
+                window["rows"] = [r for r in window["rows"] if r.get("id") != row["id"]]
+            window["rows"].append(dict(row))
+            window["rows"].sort(key=_sort_key)
+            _stats["patched_rows"] += 1
+
+
+def invalidate(user_id: Optional[str] = None):
+    global _write_seq, _write_version_floor
+    with _lock:
+        if user_id is None:
+            _windows.clear()
+            _write_seq += 1
+            _write_version_floor = _write_seq
+        else:
+            _windows.pop(user_id, None)
+            _note_write(user_id)
+
+
+def mark_written(user_ids):
+    """Record that these users' rows changed. The analytics and range-summary caches check
+    written_since(), so this also drops their entries for the users."""
+    with _lock:
+        for user_id in user_ids:
+            _note_write(user_id)
+
+
+def stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "users": len(_windows),
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "saved_round_trips": _stats["hits"],
+    }
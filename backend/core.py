@@ -1,12 +1,33 @@
+import colorsys
+import gc
 import os
-from typing import List
-from transformers import pipeline
-import torch
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import List, Optional
+from backend.inference_backends import build_pipeline, effective_backend
+from backend.prediction_cache import prediction_cache, fingerprint
+from backend.summary import summarize as make_summary
+from backend.semantic_reuse import semantic_index
+from backend import chunking, semantic_reuse, telemetry, zero_shot_engine
 
 zero_shot = None
 emotion_classifier = None
 summarizer_pipeline = None
+sentence_encoder = None
 EMOTION_MODEL = os.environ.get("EMOTION_MODEL", "j-hartmann/emotion-english-distilroberta-base")
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+
+# Model registry: names listed in LUMI_PRELOAD_MODELS load at startup, everything else on first use.
+# LUMI_MODEL_IDLE_SECONDS > 0 lets unload_idle_models() drop models that have not been used for that long.
+PRELOAD_MODELS = [m.strip() for m in os.environ.get("LUMI_PRELOAD_MODELS", "").split(",") if m.strip()]
+MODEL_IDLE_SECONDS = float(os.environ.get("LUMI_MODEL_IDLE_SECONDS", "0"))
+# Models that get one warm-up forward pass at startup; /ready reports healthy once they have
+WARM_MODELS = [m.strip() for m in os.environ.get("LUMI_WARM_MODELS", ",".join(PRELOAD_MODELS)).split(",") if m.strip()]
+# Load and warm the models in the background after the server starts listening instead of before
+WARM_IN_BACKGROUND = os.environ.get("LUMI_WARM_IN_BACKGROUND", "0").lower() in ("1", "true", "yes")
+MODEL_RETRY_SECONDS = 60.0
 
 # Thresholds
 EMOTION_CONFIDENCE_THRESHOLD = 0.45
@@ -14,6 +35,8 @@ NEUTRAL_FALLBACK_THRESHOLD = 0.22
 MULTI_LABEL_THRESHOLD = 0.20
 PROMOTE_LABEL_BOOST = 0.04
 MULTI_LABEL_ACCEPT_FACTOR = 0.75
+# "full" runs zero-shot for texts the emotion model is unsure about; "fast-only" never calls zero-shot
+CASCADE_MODE = os.environ.get("LUMI_CASCADE_MODE", "full")
 
 EMOTION_MAP = {
     "Joy/Happy": {"hue": 60, "label": "Joyful"},
@@ -39,123 +62,295 @@ EMOTION_MODEL_MAP = {
 }
 
 
-def load_pipelines():
-    global zero_shot, emotion_classifier, summarizer_pipeline
-    if zero_shot is not None and emotion_classifier is not None and summarizer_pipeline is not None:
-        return
+MODEL_SPECS = {
+    "emotion": {"attr": "emotion_classifier", "task": "text-classification", "model": EMOTION_MODEL},
+    # LUMI_ZERO_SHOT_MODE picks the plain pipeline or a fixed-label engine (see zero_shot_engine.py)
+    "zero_shot": {"attr": "zero_shot", "task": "zero-shot-classification", "model": ZERO_SHOT_MODEL, "builder": zero_shot_engine.build},
+    "summarizer": {"attr": "summarizer_pipeline", "task": "summarization", "model": SUMMARIZER_MODEL},
+    # Only used when LUMI_SEMANTIC_REUSE is on (see semantic_reuse.py)
+    "encoder": {"attr": "sentence_encoder", "task": "feature-extraction", "model": semantic_reuse.ENCODER_MODEL, "builder": semantic_reuse.build_encoder},
+}
+_model_state = {name: {"load_seconds": None, "rss_mb": None, "last_used": None, "error": None, "failed_at": None, "warm": False} for name in MODEL_SPECS}
+_model_lock = threading.Lock()
+
+
+def _current_rss_mb() -> Optional[float]:
+    return memory_mb()["rss_mb"]
+
+
+def memory_mb() -> dict:
+    """Resident memory of this process and its proportional share (PSS): pages shared
+    copy-on-write with other workers count 1/N towards each of them."""
+    memory = {"rss_mb": None, "pss_mb": None}
     try:
-        from transformers import pipeline as hf_pipeline
-        if zero_shot is None:
-            zero_shot = hf_pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-        if emotion_classifier is None:
-            emotion_classifier = hf_pipeline("text-classification", model=EMOTION_MODEL)
-        if summarizer_pipeline is None:
-            print("Loading summarization model...")
-            # Use a reliable, GPU-friendly summarization model
-            summarizer_pipeline = hf_pipeline(
-                "summarization",
-                model="facebook/bart-large-cnn"
-            )
-            print("Summarization model loaded!")
-    except Exception as e:
-        print("Warning: could not initialize transformers pipelines:", e)
+        with open("/proc/self/statm") as f:
+            memory["rss_mb"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["pss_mb"] = int(line.split()[1]) / 1024
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    return memory
 
 
-def analyze_text(text_to_analyze: str) -> dict:
-    """Analyze a single text string and return the prediction dict.
-    This function does not depend on FastAPI/pydantic so tests can import it without heavy deps.
+def _load_model(name: str):
+    spec = MODEL_SPECS[name]
+    state = _model_state[name]
+    with _model_lock:
+        pipe = globals()[spec["attr"]]
+        if pipe is not None:
+            return pipe
+        if state["failed_at"] is not None and time.time() - state["failed_at"] < MODEL_RETRY_SECONDS:
+            return None
+        print(f"Loading {name} model ({spec['model']})...")
+        rss_before = _current_rss_mb()
+        start = time.perf_counter()
+        try:
+            pipe = spec.get("builder", build_pipeline)(spec["task"], spec["model"])
+        except Exception as e:
+            print(f"Warning: could not initialize {name} pipeline:", e)
+            state["error"] = str(e)
+            state["failed_at"] = time.time()
+            return None
+        rss_after = _current_rss_mb()
+        state["load_seconds"] = round(time.perf_counter() - start, 3)
+        state["rss_mb"] = round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None
+        state["error"] = None
+        state["failed_at"] = None
+        globals()[spec["attr"]] = pipe
+        print(f"{name} model loaded in {state['load_seconds']}s")
+        return pipe
+
+
+def get_pipeline(name: str):
+    """Return the pipeline registered under ``name``, loading it on first use.
+    A pipeline assigned directly to the module global (e.g. a test stub) is used as-is.
     """
-    text = text_to_analyze.strip()
-    if not text:
-        return {"emotion": "Neutral", "hue": None, "confidence": "0%", "method": "none", "candidates": [], "version": {"emotion_model": EMOTION_MODEL, "zero_shot": "facebook/bart-large-mnli"}, "summary": "No text provided, so emotion is Neutral."}
-
-    def make_summary(user_text):
-        load_pipelines()
-        import re
-        lines = [l.strip() for l in re.split(r'[\n\r]+', user_text) if l.strip()]
-        if not lines:
-            return "You had a quiet day."
-        
-        # Extract main verbs/actions from each line and combine them
-        # This creates a condensed summary like "You did X, then Y, then Z"
-        actions = []
-        for line in lines:
-            # Remove common label prefixes
-            line_clean = re.sub(r'^(Morning|Afternoon|Evening|Night|Day|Morning:|Afternoon:|Evening:|Night:|A key moment|Interaction|A challenge|Event|Thing|Activity|Note)[\s:]*', '', line, flags=re.IGNORECASE)
-            if line_clean:
-                # Convert to second person if needed
-                line_clean = re.sub(r'\bI\b', 'you', line_clean, flags=re.IGNORECASE)
-                line_clean = re.sub(r'\bmy\b', 'your', line_clean, flags=re.IGNORECASE)
-                line_clean = re.sub(r'\bme\b', 'you', line_clean, flags=re.IGNORECASE)
-                line_clean = line_clean.strip()
-                # Lowercase first letter
-                if line_clean:
-                    line_clean = line_clean[0].lower() + line_clean[1:]
-                    actions.append(line_clean)
-        
-        if not actions:
-            return "You had a quiet day."
-        
-        # Create a natural summary by joining actions with commas
-        if len(actions) == 1:
-            action = actions[0]
-            # Avoid "You you..." by checking if it already starts with "you"
-            if action.lower().startswith('you '):
-                summary = action[0].upper() + action[1:]  # Capitalize first letter
-            else:
-                summary = f"You {action}"
-        elif len(actions) <= 3:
-            summary = "You " + ", ".join(actions)
-        else:
-            # For 4+ actions, combine them more concisely
-            summary = "You " + ", ".join(actions[:3]) + "."
-        
-        # Ensure ends with period
-        if not summary.endswith('.'):
-            summary += '.'
-        
-        return summary
+    pipe = globals()[MODEL_SPECS[name]["attr"]]
+    if pipe is None:
+        pipe = _load_model(name)
+    if pipe is not None:
+        _model_state[name]["last_used"] = time.time()
+    return pipe
+
+
+def load_pipelines(names: Optional[List[str]] = None):
+    """Eagerly load the named pipelines (all registered ones by default)."""
+    for name in names if names is not None else list(MODEL_SPECS):
+        get_pipeline(name)
+
+
+def preload_models():
+    """Load the models listed in LUMI_PRELOAD_MODELS; others stay lazy."""
+    load_pipelines([name for name in PRELOAD_MODELS if name in MODEL_SPECS])
+
+
+def warm_up(names: Optional[List[str]] = None) -> dict:
+    """Load the named models (WARM_MODELS by default) and run one forward pass through each,
+    so the first request does not pay for lazy allocations. Returns warm_state()."""
+    for name in names if names is not None else WARM_MODELS:
+        if name not in MODEL_SPECS or get_pipeline(name) is None:
+            continue
+        if name == "emotion":
+            classify_emotions(["Warming up the model."])
+        elif name == "zero_shot":
+            classify_zero_shot(["Warming up the model."])
+        elif name == "encoder":
+            sentence_encoder(["Warming up the model."])
+        _model_state[name]["warm"] = True
+    return warm_state(names)
+
+
+def warm_state(names: Optional[List[str]] = None) -> dict:
+    """{name: warmed up and still loaded} for the named models (WARM_MODELS by default)."""
+    return {
+        name: _model_state[name]["warm"] and globals()[MODEL_SPECS[name]["attr"]] is not None
+        for name in (names if names is not None else WARM_MODELS) if name in MODEL_SPECS
+    }
+
+
+def unload_model(name: str):
+    with _model_lock:
+        globals()[MODEL_SPECS[name]["attr"]] = None
+        _model_state[name]["last_used"] = None
+        _model_state[name]["warm"] = False
+    gc.collect()
+
+
+def unload_idle_models(max_idle_seconds: float = MODEL_IDLE_SECONDS) -> List[str]:
+    """Unload models unused for ``max_idle_seconds``. Returns the names that were unloaded."""
+    if max_idle_seconds <= 0:
+        return []
+    now = time.time()
+    unloaded = []
+    for name, spec in MODEL_SPECS.items():
+        last_used = _model_state[name]["last_used"]
+        if globals()[spec["attr"]] is not None and last_used is not None and now - last_used >= max_idle_seconds:
+            unload_model(name)
+            unloaded.append(name)
+    return unloaded
+
+
+def model_stats() -> dict:
+    """Load state, load time and resident memory growth per registered model."""
+    return {
+        name: {
+            "model": spec["model"],
+            "loaded": globals()[spec["attr"]] is not None,
+            "load_seconds": _model_state[name]["load_seconds"],
+            "rss_mb": _model_state[name]["rss_mb"],
+            "last_used": _model_state[name]["last_used"],
+            "error": _model_state[name]["error"],
+            "warm": _model_state[name]["warm"],
+        }
+        for name, spec in MODEL_SPECS.items()
+    }
 
-    candidate_labels = list(EMOTION_MAP.keys())
 
-    # Try emotion classifier (multi-label aware)
-    label_scores = {}
+@dataclass(frozen=True)
+class CascadePolicy:
+    """When each stage of the emotion -> zero-shot cascade gets to decide.
+    Defaults mirror the module threshold constants; see default_policy().
+    """
+    mode: str = "full"
+    emotion_confidence_threshold: float = 0.45
+    neutral_fallback_threshold: float = 0.22
+    multi_label_threshold: float = 0.20
+    promote_label_boost: float = 0.04
+    multi_label_accept_factor: float = 0.75
+
+    def __post_init__(self):
+        if self.mode not in ("full", "fast-only"):
+            raise ValueError(f"Unknown cascade mode: {self.mode}")
+
+    def with_overrides(self, **overrides) -> "CascadePolicy":
+        return replace(self, **overrides)
+
+
+def default_policy() -> CascadePolicy:
+    return CascadePolicy(
+        mode=CASCADE_MODE,
+        emotion_confidence_threshold=EMOTION_CONFIDENCE_THRESHOLD,
+        neutral_fallback_threshold=NEUTRAL_FALLBACK_THRESHOLD,
+        multi_label_threshold=MULTI_LABEL_THRESHOLD,
+        promote_label_boost=PROMOTE_LABEL_BOOST,
+        multi_label_accept_factor=MULTI_LABEL_ACCEPT_FACTOR,
+    )
+
+
+_cascade_counts = {"cache": 0, "semantic": 0, "emotion": 0, "zero-shot": 0, "fast-only": 0, "none": 0}
+_cascade_cost_ms = {"semantic": 0.0, "emotion": 0.0, "zero_shot": 0.0}
+
+
+def cascade_stats() -> dict:
+    """How many predictions each cascade stage decided and the model time spent per stage."""
+    decided = sum(_cascade_counts.values())
+    return {
+        "decided_by": dict(_cascade_counts),
+        "zero_shot_rate": round(_cascade_counts["zero-shot"] / decided, 4) if decided else 0.0,
+        "cost_ms": {stage: round(ms, 1) for stage, ms in _cascade_cost_ms.items()},
+    }
+
+
+def _version() -> dict:
+    zero_shot_model = zero_shot_engine.model_name(ZERO_SHOT_MODEL)
+    return {"emotion_model": EMOTION_MODEL, "zero_shot": zero_shot_model,
+            "backend": effective_backend(EMOTION_MODEL), "zero_shot_backend": effective_backend(zero_shot_model)}
+
+
+def _cache_fingerprint(policy: CascadePolicy) -> str:
+    # The cascade policy changes predictions as much as the model versions do
+    return fingerprint(_version(), asdict(policy))
+
+
+def _empty_result() -> dict:
+    return {"emotion": "Neutral", "hue": None, "confidence": "0%", "method": "none", "candidates": [], "version": _version(), "summary": "No text provided, so emotion is Neutral."}
+
+
+def _parse_emotion_scores(emotion_scores) -> dict:
+    if isinstance(emotion_scores, list) and len(emotion_scores) and isinstance(emotion_scores[0], list):
+        emotion_scores = emotion_scores[0]
+    return {e["label"].lower(): float(e["score"]) for e in emotion_scores}
+
+
+def classify_emotions(texts: List[str]) -> List[dict]:
+    """Run the emotion classifier over a batch of texts in one call.
+    Returns one {label: score} dict per text; empty dicts when the model is unavailable.
+    """
+    if not texts:
+        return []
+    emotion_classifier = get_pipeline("emotion")
+    if not callable(emotion_classifier):
+        return [{} for _ in texts]
     try:
-        if callable(emotion_classifier):
-            emotion_scores = emotion_classifier(text, return_all_scores=True)
-            if isinstance(emotion_scores, list) and len(emotion_scores) and isinstance(emotion_scores[0], list):
-                emotion_scores = emotion_scores[0]
-            label_scores = {e["label"].lower(): float(e["score"]) for e in emotion_scores}
+        if len(texts) == 1:
+            return [_parse_emotion_scores(emotion_classifier(texts[0], return_all_scores=True))]
+        outputs = emotion_classifier(list(texts), return_all_scores=True)
+        if not isinstance(outputs, list) or len(outputs) != len(texts):
+            raise ValueError("unexpected batch output from emotion classifier")
+        return [_parse_emotion_scores(o) for o in outputs]
     except Exception:
-        label_scores = {}
+        # Retry one text at a time so a single bad input does not fail the whole batch
+        scores = []
+        for text in texts:
+            try:
+                scores.append(_parse_emotion_scores(emotion_classifier(text, return_all_scores=True)))
+            except Exception:
+                scores.append({})
+        return scores
 
-    model_label = None
-    model_score = 0.0
 
-    selected = {label: score for label, score in label_scores.items() if score >= MULTI_LABEL_THRESHOLD}
+def classify_zero_shot(texts: List[str]) -> List[dict]:
+    """Run zero-shot classification against the EMOTION_MAP labels for a batch of texts."""
+    empty = {"labels": [], "scores": []}
+    if not texts:
+        return []
+    zero_shot = get_pipeline("zero_shot")
+    if not callable(zero_shot):
+        return [dict(empty) for _ in texts]
+    candidate_labels = list(EMOTION_MAP.keys())
+    try:
+        if len(texts) == 1:
+            return [zero_shot(texts[0], candidate_labels, multi_label=False)]
+        outputs = zero_shot(list(texts), candidate_labels, multi_label=False)
+        if not isinstance(outputs, list) or len(outputs) != len(texts):
+            raise ValueError("unexpected batch output from zero-shot pipeline")
+        return outputs
+    except Exception:
+        outputs = []
+        for text in texts:
+            try:
+                outputs.append(zero_shot(text, candidate_labels, multi_label=False))
+            except Exception:
+                outputs.append(dict(empty))
+        return outputs
+
+
+def decide_from_emotion(label_scores: dict, policy: Optional[CascadePolicy] = None):
+    """Return a prediction (without summary) when the emotion classifier is decisive, else None."""
+    policy = policy or default_policy()
+    selected = {label: score for label, score in label_scores.items() if score >= policy.multi_label_threshold}
     if selected:
         mapped_scores = {}
         for label, score in selected.items():
-            boost = PROMOTE_LABEL_BOOST if label not in ("joy", "sadness", "neutral") else 0.0
+            boost = policy.promote_label_boost if label not in ("joy", "sadness", "neutral") else 0.0
             adj = score + boost
             mapped_key = EMOTION_MODEL_MAP.get(label, "Neutral/Mixed")
             mapped_scores[mapped_key] = max(mapped_scores.get(mapped_key, 0.0), adj)
         mapped_key, mapped_score = max(mapped_scores.items(), key=lambda kv: kv[1])
-        if mapped_score >= EMOTION_CONFIDENCE_THRESHOLD * MULTI_LABEL_ACCEPT_FACTOR:
+        if mapped_score >= policy.emotion_confidence_threshold * policy.multi_label_accept_factor:
             color_data = EMOTION_MAP.get(mapped_key, EMOTION_MAP["Neutral/Mixed"])
             candidates = []
             for k, v in sorted(mapped_scores.items(), key=lambda kv: kv[1], reverse=True):
                 c_hue = EMOTION_MAP.get(k, {}).get("hue")
                 candidates.append({"source": "emotion-model", "label": k, "hue": c_hue, "score": v})
-            result = {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{mapped_score:.1%}", "raw_emotion": mapped_key, "method": "emotion-model-multi", "candidates": candidates, "version": {"emotion_model": EMOTION_MODEL, "zero_shot": "facebook/bart-large-mnli"}}
-            result["summary"] = make_summary(text)
-            return result
+            return {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{mapped_score:.1%}", "raw_emotion": mapped_key, "method": "emotion-model-multi", "candidates": candidates, "version": _version()}
 
     if label_scores:
-        top_emotion_pred = max(label_scores.items(), key=lambda kv: kv[1])
-        model_label = top_emotion_pred[0]
-        model_score = top_emotion_pred[1]
-        if model_label and model_score >= EMOTION_CONFIDENCE_THRESHOLD:
+        model_label, model_score = max(label_scores.items(), key=lambda kv: kv[1])
+        if model_label and model_score >= policy.emotion_confidence_threshold:
             mapped_key = EMOTION_MODEL_MAP.get(model_label, "Neutral/Mixed")
             color_data = EMOTION_MAP[mapped_key]
             top_labels = sorted(label_scores.items(), key=lambda kv: kv[1], reverse=True)[:3]
@@ -164,19 +359,20 @@ def analyze_text(text_to_analyze: str) -> dict:
                 mapped = EMOTION_MODEL_MAP.get(lab, "Neutral/Mixed")
                 hue = EMOTION_MAP.get(mapped, {}).get("hue")
                 candidates.append({"source": "emotion-model", "label": mapped, "hue": hue, "score": sc})
-            result = {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{model_score:.1%}", "raw_emotion": mapped_key, "method": "emotion-model", "candidates": candidates, "version": {"emotion_model": EMOTION_MODEL, "zero_shot": "facebook/bart-large-mnli"}}
-            result["summary"] = make_summary(text)
-            return result
+            return {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{model_score:.1%}", "raw_emotion": mapped_key, "method": "emotion-model", "candidates": candidates, "version": _version()}
 
-    # Fallback to zero-shot
-    load_pipelines()
-    try:
-        if callable(zero_shot):
-            output = zero_shot(text, candidate_labels, multi_label=False)
-        else:
-            output = {"labels": [], "scores": []}
-    except Exception:
-        output = {"labels": [], "scores": []}
+    return None
+
+
+def decide_with_zero_shot(label_scores: dict, output: dict, policy: Optional[CascadePolicy] = None) -> dict:
+    """Combine emotion classifier scores with a zero-shot output into a prediction (without summary).
+    In fast-only mode ``output`` is empty and the emotion scores alone decide against the neutral threshold.
+    """
+    policy = policy or default_policy()
+    model_label = None
+    model_score = 0.0
+    if label_scores:
+        model_label, model_score = max(label_scores.items(), key=lambda kv: kv[1])
 
     if output.get("labels"):
         top_emotion = output["labels"][0]
@@ -185,16 +381,14 @@ def analyze_text(text_to_analyze: str) -> dict:
         top_emotion = "Neutral/Mixed"
         top_score = 0.0
 
-    if max(top_score, model_score) < NEUTRAL_FALLBACK_THRESHOLD:
+    if max(top_score, model_score) < policy.neutral_fallback_threshold:
         top_emotion = "Neutral/Mixed"
         color_data = EMOTION_MAP[top_emotion]
         zs_candidates = []
         for lbl, sc in zip(output.get("labels", [])[:3], output.get("scores", [])[:3]):
             hue = EMOTION_MAP.get(lbl, {}).get("hue")
             zs_candidates.append({"source": "zero-shot", "label": lbl, "hue": hue, "score": float(sc)})
-        result = {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{max(top_score, model_score):.1%}", "raw_emotion": top_emotion, "method": "fallback-neutral", "candidates": zs_candidates, "version": {"emotion_model": EMOTION_MODEL, "zero_shot": "facebook/bart-large-mnli"}}
-        result["summary"] = make_summary(text)
-        return result
+        return {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{max(top_score, model_score):.1%}", "raw_emotion": top_emotion, "method": "fallback-neutral", "candidates": zs_candidates, "version": _version()}
 
     if model_score > top_score and model_label:
         mapped_key = EMOTION_MODEL_MAP.get(model_label, "Neutral/Mixed")
@@ -218,10 +412,278 @@ def analyze_text(text_to_analyze: str) -> dict:
         hue = EMOTION_MAP.get(lbl, {}).get("hue")
         candidates.append({"source": "zero-shot", "label": lbl, "hue": hue, "score": float(sc)})
 
-    result = {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{chosen_score:.1%}", "raw_emotion": raw, "method": method, "candidates": candidates, "version": {"emotion_model": EMOTION_MODEL, "zero_shot": "facebook/bart-large-mnli"}}
-    result["summary"] = make_summary(text)
+    return {"emotion": color_data["label"], "hue": color_data["hue"], "confidence": f"{chosen_score:.1%}", "raw_emotion": raw, "method": method, "candidates": candidates, "version": _version()}
+
+
+def _semantic_reuse(texts: List[str], pending: List[int], results: List[Optional[dict]], cache_fp: str):
+    """Answer pending texts from their nearest indexed neighbour where it is similar enough.
+    Returns (indices still needing the models, {index: vector} to index afterwards,
+    {index: reused prediction} for hits that are being audited against the models).
+    """
+    encoder = get_pipeline("encoder")
+    if encoder is None:
+        return pending, {}, {}
+    start = time.perf_counter()
+    with telemetry.span("semantic"):
+        vectors = encoder([texts[i] for i in pending])
+        matches = semantic_index.search(vectors, cache_fp)
+    semantic_ms = (time.perf_counter() - start) * 1000.0
+    _cascade_cost_ms["semantic"] += semantic_ms
+
+    remaining, to_index, audits = [], {}, {}
+    for i, vector, match in zip(pending, vectors, matches):
+        if match is not None and not semantic_index.should_audit():
+            prediction, similarity = match
+            prediction["method"] = "semantic-reuse"
+            prediction["similarity"] = round(similarity, 4)
+            prediction["cascade"] = {"stage": "semantic", "zero_shot_called": False, "cost_ms": {"semantic": round(semantic_ms / len(pending), 2), "emotion": 0.0, "zero_shot": 0.0}}
+            results[i] = prediction
+            _cascade_counts["semantic"] += 1
+            continue
+        remaining.append(i)
+        to_index[i] = vector
+        if match is not None:
+            audits[i] = match[0]
+    return remaining, to_index, audits
+
+
+def analyze_batch(texts: List[str], policy: Optional[CascadePolicy] = None, use_cache: bool = True) -> List[dict]:
+    """Analyze several texts at once: one emotion classifier call for the whole batch and
+    one zero-shot call for the texts the emotion model is not confident about.
+    Returns prediction dicts in the same order as ``texts``; each carries a ``cascade`` field
+    naming the deciding stage and the (batch-amortized) model time it cost.
+    Texts already in the prediction cache skip the models entirely, and so do close
+    paraphrases of recent predictions when semantic reuse is enabled. ``use_cache=False``
+    bypasses both, without reading or filling them (used by re-scoring).
+    """
+    policy = policy or default_policy()
+    cache_fp = _cache_fingerprint(policy)
+    stripped = [t.strip() for t in texts]
+    results = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(stripped):
+        if text:
+            cached = prediction_cache.get(text, cache_fp) if use_cache else None
+            if cached is not None:
+                cached["cascade"] = {"stage": "cache", "zero_shot_called": False, "cost_ms": {"emotion": 0.0, "zero_shot": 0.0, "summary": 0.0}}
+                results[i] = cached
+                _cascade_counts["cache"] += 1
+            else:
+                pending.append(i)
+        else:
+            results[i] = _empty_result()
+            results[i]["cascade"] = {"stage": "none", "zero_shot_called": False, "cost_ms": {"emotion": 0.0, "zero_shot": 0.0, "summary": 0.0}}
+            _cascade_counts["none"] += 1
+    reused, to_index, audits = [], {}, {}
+    if pending and use_cache and semantic_index.enabled:
+        remaining, to_index, audits = _semantic_reuse(stripped, pending, results, cache_fp)
+        reused = [i for i in pending if results[i] is not None]
+        pending = remaining
+    for i in reused:
+        start = time.perf_counter()
+        results[i]["summary"] = make_summary(stripped[i])
+        results[i]["cascade"]["cost_ms"]["summary"] = round((time.perf_counter() - start) * 1000.0, 3)
+    if not pending:
+        telemetry.count_decisions(r["method"] for r in results)
+        return results
+
+    start = time.perf_counter()
+    with telemetry.span("emotion"):
+        emotion_scores = classify_emotions([stripped[i] for i in pending])
+    emotion_ms = (time.perf_counter() - start) * 1000.0
+    _cascade_cost_ms["emotion"] += emotion_ms
+    emotion_ms_each = emotion_ms / len(pending)
+
+    fallthrough = []
+    for i, label_scores in zip(pending, emotion_scores):
+        result = decide_from_emotion(label_scores, policy)
+        if result is not None:
+            results[i] = result
+            results[i]["cascade"] = {"stage": "emotion", "zero_shot_called": False, "cost_ms": {"emotion": round(emotion_ms_each, 2), "zero_shot": 0.0}}
+            _cascade_counts["emotion"] += 1
+        else:
+            fallthrough.append((i, label_scores))
+
+    if fallthrough and policy.mode == "fast-only":
+        for i, label_scores in fallthrough:
+            results[i] = decide_with_zero_shot(label_scores, {"labels": [], "scores": []}, policy)
+            results[i]["cascade"] = {"stage": "fast-only", "zero_shot_called": False, "cost_ms": {"emotion": round(emotion_ms_each, 2), "zero_shot": 0.0}}
+            _cascade_counts["fast-only"] += 1
+    elif fallthrough:
+        # Fallback to zero-shot
+        start = time.perf_counter()
+        with telemetry.span("zero_shot"):
+            outputs = classify_zero_shot([stripped[i] for i, _ in fallthrough])
+        zero_shot_ms = (time.perf_counter() - start) * 1000.0
+        _cascade_cost_ms["zero_shot"] += zero_shot_ms
+        for (i, label_scores), output in zip(fallthrough, outputs):
+            results[i] = decide_with_zero_shot(label_scores, output, policy)
+            results[i]["cascade"] = {"stage": "zero-shot", "zero_shot_called": True, "cost_ms": {"emotion": round(emotion_ms_each, 2), "zero_shot": round(zero_shot_ms / len(fallthrough), 2)}}
+            _cascade_counts["zero-shot"] += 1
+
+    # The models may have just loaded on a fallback backend; key on the ones that actually ran
+    cache_fp = _cache_fingerprint(policy)
+    for i in pending:
+        start = time.perf_counter()
+        with telemetry.span("summary"):
+            results[i]["summary"] = make_summary(stripped[i])
+        results[i]["cascade"]["cost_ms"]["summary"] = round((time.perf_counter() - start) * 1000.0, 3)
+        if use_cache:
+            prediction_cache.put(stripped[i], cache_fp, results[i])
+    if to_index:
+        semantic_index.add([to_index[i] for i in pending], [results[i] for i in pending], cache_fp)
+        for i, prediction in audits.items():
+            semantic_index.record_audit(prediction, results[i])
+    telemetry.count_decisions(r["method"] for r in results)
+    return results
+
+
+def analyze_text(text_to_analyze: str) -> dict:
+    """Analyze a single text string and return the prediction dict.
+    This function does not depend on FastAPI/pydantic so tests can import it without heavy deps.
+    """
+    return analyze_batch([text_to_analyze])[0]
+
+
+def _hls_hex(hue):
+    if hue is None:
+        return "#808080"  # Grey for neutral
+    # Convert HSL to RGB (colorsys uses 0-1 range)
+    r, g, b = colorsys.hls_to_rgb(hue / 360.0, 0.65, 0.85)
+    return f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}"
+
+
+# Every EMOTION_MAP hue, converted once; predictions only ever produce these
+HUE_HEX = {v["hue"]: _hls_hex(v["hue"]) for v in EMOTION_MAP.values()}
+# Display label -> hex, for rows that only store the mood
+MOOD_HEX = {v["label"]: HUE_HEX[v["hue"]] for v in EMOTION_MAP.values()}
+
+
+def hue_to_hex(hue):
+    """Convert HSL hue (0-360) to RGB hex color with saturation=0.85, lightness=0.65"""
+    hex_color = HUE_HEX.get(hue)
+    return hex_color if hex_color is not None else _hls_hex(hue)
+
+
+def lines_to_text(lines: List[str]) -> str:
+    return " ".join([l for l in lines if l.strip()])
+
+
+def _line_timeline(lines: List[str], split: dict, window_scores: List[dict]) -> List[dict]:
+    """Dominant emotion per line, from the windows that cover it."""
+    covering = {}
+    for window, owners in enumerate(split["lines"]):
+        for line in owners:
+            covering.setdefault(line, []).append(window)
+    timeline = []
+    for line, windows in sorted(covering.items()):
+        scores = chunking.combine_scores([window_scores[w] for w in windows], [split["tokens"][w] for w in windows])
+        if scores:
+            model_label, score = max(scores.items(), key=lambda kv: kv[1])
+            mapped_key = EMOTION_MODEL_MAP.get(model_label, "Neutral/Mixed")
+        else:
+            mapped_key, score = "Neutral/Mixed", 0.0
+        color_data = EMOTION_MAP[mapped_key]
+        timeline.append({"line": line, "text": lines[line].strip(), "emotion": color_data["label"], "hue": color_data["hue"], "score": round(score, 4)})
+    return timeline
+
+
+def analyze_chunked(lines: List[str], policy: Optional[CascadePolicy] = None,
+                    token_budget: Optional[int] = None, max_windows: Optional[int] = None,
+                    use_cache: bool = True) -> dict:
+    """Analyze a long entry as token-budget windows (see backend/chunking.py) instead of one
+    truncated text. The windows go through the emotion model as one batch, and through
+    zero-shot as one batch when the combined scores are not decisive. Token-weighted window
+    scores decide ``candidates`` and hue. Adds a per-line ``timeline`` and a ``chunks`` field.
+    """
+    policy = policy or default_policy()
+    emotion_pipe = get_pipeline("emotion")
+    token_budget = token_budget or chunking.token_budget(emotion_pipe)
+    max_windows = max_windows or chunking.MAX_WINDOWS
+    text = "\n".join(l.strip() for l in lines if l.strip())
+    if not text:
+        result = _empty_result()
+        result["cascade"] = {"stage": "none", "zero_shot_called": False, "cost_ms": {"emotion": 0.0, "zero_shot": 0.0, "summary": 0.0}}
+        _cascade_counts["none"] += 1
+        telemetry.count_decisions([result["method"]])
+        return result
+
+    # Same fingerprint as analyze_batch; the chunking settings only separate the entry key
+    cache_fp = _cache_fingerprint(policy)
+    variant = f"chunked:{token_budget}:{max_windows}"
+    cached = prediction_cache.get(text, cache_fp, variant) if use_cache else None
+    if cached is not None:
+        cached["cascade"] = {"stage": "cache", "zero_shot_called": False, "cost_ms": {"emotion": 0.0, "zero_shot": 0.0, "summary": 0.0}}
+        _cascade_counts["cache"] += 1
+        telemetry.count_decisions([cached["method"]])
+        return cached
+
+    split = chunking.split_windows(lines, token_budget, max_windows, chunking.tokenizer_counter(emotion_pipe))
+    weights = [max(1, t) for t in split["tokens"]]
+    cost_ms = {"emotion": 0.0, "zero_shot": 0.0, "summary": 0.0}
+
+    start = time.perf_counter()
+    with telemetry.span("emotion"):
+        window_scores = classify_emotions(split["windows"])
+    cost_ms["emotion"] = (time.perf_counter() - start) * 1000.0
+    _cascade_cost_ms["emotion"] += cost_ms["emotion"]
+    label_scores = chunking.combine_scores(window_scores, weights)
+
+    stage = "emotion"
+    result = decide_from_emotion(label_scores, policy)
+    if result is None and policy.mode == "fast-only":
+        stage = "fast-only"
+        result = decide_with_zero_shot(label_scores, {"labels": [], "scores": []}, policy)
+    elif result is None:
+        stage = "zero-shot"
+        start = time.perf_counter()
+        with telemetry.span("zero_shot"):
+            outputs = classify_zero_shot(split["windows"])
+        cost_ms["zero_shot"] = (time.perf_counter() - start) * 1000.0
+        _cascade_cost_ms["zero_shot"] += cost_ms["zero_shot"]
+        result = decide_with_zero_shot(label_scores, chunking.combine_zero_shot(outputs, weights), policy)
+    _cascade_counts[stage] += 1
+
+    result["timeline"] = _line_timeline(lines, split, window_scores)
+    result["chunks"] = {"windows": len(split["windows"]), "token_budget": token_budget, "tokens": sum(split["tokens"]), "truncated": split["truncated"]}
+    start = time.perf_counter()
+    with telemetry.span("summary"):
+        result["summary"] = make_summary(lines_to_text(lines))
+    cost_ms["summary"] = (time.perf_counter() - start) * 1000.0
+    result["cascade"] = {"stage": stage, "zero_shot_called": stage == "zero-shot", "cost_ms": {k: round(v, 2) for k, v in cost_ms.items()}}
+    if use_cache:
+        prediction_cache.put(text, _cache_fingerprint(policy), result, variant)
+    telemetry.count_decisions([result["method"]])
     return result
 
 
-def analyze_lines(lines: List[str]) -> dict:
-    return analyze_text(" ".join([l for l in lines if l.strip()]))
+def should_chunk(lines: List[str]) -> bool:
+    """Whether an entry goes through analyze_chunked(): per LUMI_CHUNKED_ANALYSIS, or in
+    ``auto`` mode when it is longer than the emotion model reads. Counts with the model's
+    tokenizer once it is loaded; never loads it (this runs on the event loop)."""
+    return chunking.should_chunk(lines, chunking.token_budget(emotion_classifier),
+                                 count_tokens=chunking.tokenizer_counter(emotion_classifier))
+
+
+def analyze_lines(lines: List[str], chunked: Optional[bool] = None) -> dict:
+    """Analyze a journal entry. Long entries (or all of them, per LUMI_CHUNKED_ANALYSIS)
+    go through analyze_chunked(); pass ``chunked`` to force either path."""
+    if chunked is None:
+        chunked = should_chunk(lines)
+    if chunked:
+        return analyze_chunked(lines)
+    return analyze_text(lines_to_text(lines))
+
+
+def analyze_entries(entries: List[List[str]], use_cache: bool = True) -> List[dict]:
+    """analyze_lines() for several entries: the short ones share one analyze_batch call."""
+    results = [None] * len(entries)
+    short = []
+    for i, lines in enumerate(entries):
+        if should_chunk(lines):
+            results[i] = analyze_chunked(lines, use_cache=use_cache)
+        else:
+            short.append(i)
+    for i, result in zip(short, analyze_batch([lines_to_text(entries[i]) for i in short], use_cache=use_cache)):
+        results[i] = result
+    return results
@@ -3,16 +3,33 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 from datetime import date
 from typing import Optional, List
+from backend import color_cache
+from backend import mood_aggregates
+from backend import telemetry
 
 load_dotenv()
 
-# Initialize Supabase client
+# Initialize the database client: Supabase by default, or a local SQLite stand-in
+# (LUMI_DB_BACKEND=sqlite, file from LUMI_SQLITE_PATH) for tests and benchmarks
+db_backend = os.getenv("LUMI_DB_BACKEND", "supabase").lower()
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
+# Keep one daily_colors row per (user_id, date): a later save replaces the day's row.
+# Needs the unique index from backend/migrations/daily_colors_unique_day.sql.
+DAILY_UPSERT = os.getenv("LUMI_DAILY_UPSERT", "0").lower() in ("1", "true", "yes")
+# Store the journal text each row was scored from, for re-scoring (backend/rescore.py).
+# Needs the column from backend/migrations/daily_colors_entry_text.sql.
+STORE_ENTRY_TEXT = os.getenv("LUMI_STORE_ENTRY_TEXT", "0").lower() in ("1", "true", "yes")
 
 supabase: Optional[Client] = None
-
-if supabase_url and supabase_key:
+# Set once user_write_versions turns out not to exist, so it is not queried again
+_write_versions_missing = False
+
+if db_backend == "sqlite":
+    from backend.sqlite_client import SQLiteClient
+    supabase = SQLiteClient(os.getenv("LUMI_SQLITE_PATH", ":memory:"), unique_day=DAILY_UPSERT)
+    print(f"[OK] Using local SQLite database: {supabase.path}")
+elif supabase_url and supabase_key:
     try:
         supabase = create_client(supabase_url, supabase_key)
         print("[OK] Supabase connected successfully")
@@ -22,39 +39,126 @@ else:
     print("[WARNING] Supabase credentials not found. Database features disabled.")
 
 
+def make_daily_color_row(
+    user_id: str,
+    emotion: str,
+    color_hex: str,
+    mood_score: int,
+    description: Optional[str] = None,
+    entry_text: Optional[str] = None
+) -> dict:
+    """Build a daily_colors row for today"""
+    row = {
+        "user_id": user_id,
+        "date": str(date.today()),
+        "color_hex": color_hex,
+        "mood": emotion,
+        "mood_score": mood_score,
+        "description": description,
+    }
+    if STORE_ENTRY_TEXT:
+        row["entry_text"] = entry_text
+    return row
+
+
+def _latest_per_day(rows: List[dict]) -> List[dict]:
+    """The last row for each (user_id, date); one upsert request cannot touch a key twice."""
+    latest = {}
+    for row in rows:
+        latest.pop((row["user_id"], row["date"]), None)
+        latest[(row["user_id"], row["date"])] = row
+    return list(latest.values())
+
+
+def _write_rows(rows: List[dict]):
+    """Insert ``rows`` (or upsert them on (user_id, date)) and update the caches. An upsert
+    can rewrite a day that cached analytics or summaries were built from, so both modes
+    end with mark_written, which invalidates those as well."""
+    if DAILY_UPSERT:
+        rows = _latest_per_day(rows)
+        result = supabase.table("daily_colors").upsert(rows, on_conflict="user_id,date").execute()
+        for row in rows:
+            mood_aggregates.replace(row["user_id"], row["date"], row["mood"])
+    else:
+        result = supabase.table("daily_colors").insert(rows).execute()
+        for row in rows:
+            mood_aggregates.record(row["user_id"], row["date"], row["mood"])
+    for row in result.data or []:
+        color_cache.patch(row)
+    color_cache.mark_written({row["user_id"] for row in rows})
+    return result
+
+
+@telemetry.traced("database.save_daily_color")
 def save_daily_color(
     user_id: str,
     emotion: str,
     color_hex: str,
     mood_score: int,
-    description: Optional[str] = None
+    description: Optional[str] = None,
+    entry_text: Optional[str] = None
 ) -> dict:
     """Save a daily color entry to the database"""
     if not supabase:
         return {"error": "Database not configured"}
 
     try:
-        data = {
-            "user_id": user_id,
-            "date": str(date.today()),
-            "color_hex": color_hex,
-            "mood": emotion,
-            "mood_score": mood_score,
-            "description": description,
-        }
+        data = make_daily_color_row(user_id, emotion, color_hex, mood_score, description, entry_text)
+
+        result = _write_rows([data])
+        return {"success": True, "data": result.data}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@telemetry.traced("database.save_daily_colors")
+def save_daily_colors(rows: List[dict]) -> dict:
+    """Insert (or, with LUMI_DAILY_UPSERT, upsert) several daily color rows in one request"""
+    if not supabase:
+        return {"error": "Database not configured"}
+    if not rows:
+        return {"success": True, "data": []}
 
-        result = supabase.table("daily_colors").insert(data).execute()
+    try:
+        result = _write_rows(rows)
         return {"success": True, "data": result.data}
     except Exception as e:
         return {"error": str(e)}
 
 
+@telemetry.traced("database.update_daily_colors")
+def update_daily_colors(rows: List[dict]) -> dict:
+    """Rewrite existing rows in one request. Each row needs its id plus the columns to
+    set, and user_id/date (required by the upsert, left unchanged)."""
+    if not supabase:
+        return {"error": "Database not configured"}
+    if not rows:
+        return {"success": True, "data": []}
+
+    try:
+        result = supabase.table("daily_colors").upsert(rows, on_conflict="id").execute()
+        users = {row["user_id"] for row in rows}
+        for user_id in users:
+            color_cache.invalidate(user_id)
+        color_cache.mark_written(users)
+        mood_aggregates.invalidate(users, {str(row["date"]) for row in rows})
+        return {"success": True, "data": result.data}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@telemetry.traced("database.get_user_colors")
 def get_user_colors(user_id: str, limit: int = 30) -> List[dict]:
     """Get recent daily colors for a user"""
     if not supabase:
         return []
 
+    cached = color_cache.get_recent(user_id, limit)
+    if cached is not None:
+        return cached
+
     try:
+        token = color_cache.read_token()
         result = supabase.table("daily_colors")\
             .select("*")\
             .eq("user_id", user_id)\
@@ -62,18 +166,25 @@ def get_user_colors(user_id: str, limit: int = 30) -> List[dict]:
             .limit(limit)\
             .execute()
 
+        color_cache.store_recent(user_id, limit, result.data, token)
         return result.data
     except Exception as e:
         print(f"Error fetching user colors: {e}")
         return []
 
 
+@telemetry.traced("database.get_colors_by_date_range")
 def get_colors_by_date_range(user_id: str, start_date: str, end_date: str) -> List[dict]:
     """Get daily colors for a user within a date range"""
     if not supabase:
         return []
 
+    cached = color_cache.get_range(user_id, start_date, end_date)
+    if cached is not None:
+        return cached
+
     try:
+        token = color_cache.read_token()
         result = supabase.table("daily_colors")\
             .select("*")\
             .eq("user_id", user_id)\
@@ -82,17 +193,40 @@ def get_colors_by_date_range(user_id: str, start_date: str, end_date: str) -> Li
             .order("date", desc=False)\
             .execute()
 
+        color_cache.store_range(user_id, start_date, end_date, result.data, token)
         return result.data
     except Exception as e:
         print(f"Error fetching colors by date range: {e}")
         return []
 
 
+@telemetry.traced("database.get_write_version")
+def get_write_version(user_id: str) -> Optional[int]:
+    """The user's write version from user_write_versions, which a trigger bumps on every
+    daily_colors insert, update or delete (migrations/user_write_versions.sql). 0 before
+    their first write; None without a database or before the migration has run."""
+    global _write_versions_missing
+    if not supabase or _write_versions_missing:
+        return None
+    try:
+        result = supabase.table("user_write_versions").select("version").eq("user_id", user_id).execute()
+    except Exception as e:
+        print(f"[WARNING] user_write_versions is not readable, calendar ETags will hash rows instead: {e}")
+        _write_versions_missing = True
+        return None
+    return int(result.data[0]["version"]) if result.data else 0
+
+
+@telemetry.traced("database.get_color_by_date")
 def get_color_by_date(user_id: str, target_date: str) -> Optional[dict]:
     """Get daily color for a specific date"""
     if not supabase:
         return None
 
+    cached = color_cache.get_date(user_id, target_date)
+    if cached is not None:
+        return cached[0] if cached else None
+
     try:
         result = supabase.table("daily_colors")\
             .select("*")\
@@ -107,22 +241,17 @@ def get_color_by_date(user_id: str, target_date: str) -> Optional[dict]:
         return None
 
 
+@telemetry.traced("database.get_mood_stats")
 def get_mood_stats(user_id: str, days: int = 30) -> dict:
     """Get mood statistics for chart of the day"""
     if not supabase:
         return {}
 
     try:
-        # Get recent entries
-        colors = get_user_colors(user_id, limit=days)
-
-        # Count moods
-        mood_counts = {}
-        for entry in colors:
-            mood = entry.get("mood", "Neutral")
-            mood_counts[mood] = mood_counts.get(mood, 0) + 1
+        # Counts over the most recent entries, from the incremental aggregates
+        mood_counts = mood_aggregates.recent_user_counts(supabase, user_id, days)
 
-        total = len(colors)
+        total = sum(mood_counts.values())
         mood_percentages = {
             mood: round(count / total * 100, 1) if total > 0 else 0
             for mood, count in mood_counts.items()
@@ -138,6 +267,7 @@ def get_mood_stats(user_id: str, days: int = 30) -> dict:
         return {}
 
 
+@telemetry.traced("database.get_community_mood_today")
 def get_community_mood_today() -> dict:
     """Get aggregated mood statistics for ALL users today (anonymous)"""
     if not supabase:
@@ -146,21 +276,10 @@ def get_community_mood_today() -> dict:
     try:
         today = str(date.today())
 
-        # Get all entries for today (all users, anonymous)
-        result = supabase.table("daily_colors")\
-            .select("mood")\
-            .eq("date", today)\
-            .execute()
-
-        entries = result.data if result.data else []
-
-        # Count moods
-        mood_counts = {}
-        for entry in entries:
-            mood = entry.get("mood", "Neutral")
-            mood_counts[mood] = mood_counts.get(mood, 0) + 1
+        # Today's counts for all users (anonymous), from the incremental aggregates
+        mood_counts = mood_aggregates.day_counts(supabase, today)
 
-        total = len(entries)
+        total = sum(mood_counts.values())
         mood_percentages = {
             mood: round(count / total * 100, 1) if total > 0 else 0
             for mood, count in mood_counts.items()
@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from backend import core
+
+EXECUTOR_KIND = os.environ.get("LUMI_INFERENCE_EXECUTOR", "thread").lower()
+WORKERS = int(os.environ.get("LUMI_INFERENCE_WORKERS", "1"))
+QUEUE_LIMIT = int(os.environ.get("LUMI_INFERENCE_QUEUE_LIMIT", "64"))
+RETRY_AFTER_SECONDS = int(os.environ.get("LUMI_INFERENCE_RETRY_AFTER", "1"))
+
+
+class InferenceOverloaded(Exception):
+    """Raised when the inference admission queue is full."""
+
+
+class InferencePool:
+    """Bounded worker pool that keeps model inference off the asyncio event loop.
+
+    ``kind`` is "thread" (default; models are shared, torch releases the GIL during
+    forward passes) or "process" (each worker loads its own models in an initializer).
+    Admission is capped at ``queue_limit`` outstanding units of work; beyond that
+    callers get InferenceOverloaded, which the API turns into a 503 with Retry-After.
+    """
+
+    def __init__(self, kind: str = EXECUTOR_KIND, workers: int = WORKERS, queue_limit: int = QUEUE_LIMIT):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_limit = max(1, queue_limit)
+        self.outstanding = 0
+        self.rejected = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=core.preload_models)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="lumi-inference")
+        return self._executor
+
+    def has_room(self, weight: int = 1) -> bool:
+        return self.outstanding + weight <= self.queue_limit or self.outstanding == 0
+
+    @contextmanager
+    def admit(self, weight: int = 1):
+        """Reserve ``weight`` slots of the admission queue for the duration of the block."""
+        if not self.has_room(weight):
+            self.rejected += 1
+            raise InferenceOverloaded(f"Inference queue is full ({self.outstanding}/{self.queue_limit})")
+        self.outstanding += weight
+        try:
+            yield
+        finally:
+            self.outstanding -= weight
+
+    async def run(self, fn, *args):
+        """Run ``fn`` on the pool. Thread workers run it inside the caller's context so
+        spans from core land in the current request trace; process workers cannot share it."""
+        if self.kind == "thread":
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), partial(context.run, fn, *args))
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    async def run_when_admitted(self, fn, *args, weight: int = 1, poll_seconds: float = 0.05):
+        """Like run() inside admit(), but waits for room instead of raising.
+        Used by streaming bulk jobs, which cannot turn into a 503 once the response has started.
+        Waiting is not a rejection, so it does not count towards ``rejected``.
+        """
+        while not self.has_room(weight):
+            await asyncio.sleep(poll_seconds)
+        with self.admit(weight):
+            return await self.run(fn, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "outstanding": self.outstanding,
+            "rejected": self.rejected,
+        }
+
+
+inference_pool = InferencePool()
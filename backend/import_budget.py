@@ -0,0 +1,74 @@
+"""Import-time budget check for the API entry point.
+
+    python -m backend.import_budget [--module backend.main] [--budget-ms 1500] [--top 15]
+
+Imports ``--module`` in a fresh interpreter under ``-X importtime`` and prints the
+slowest imports. It exits non-zero when the total goes over ``--budget-ms``
+(LUMI_IMPORT_BUDGET_MS), or when a heavy package (torch, transformers, optimum,
+onnxruntime, numpy) is imported at all. The ML packages must load only once a model is
+actually built (see core._load_model), and numpy only once analytics or semantic reuse
+first runs. tests/test_import_budget.py runs this command against the budget,
+scaled by LUMI_IMPORT_BUDGET_HEADROOM (default 1.5) for slow shared CI runners.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import List
+
+BUDGET_MS = float(os.environ.get("LUMI_IMPORT_BUDGET_MS", "1500"))
+FORBIDDEN = ("torch", "transformers", "optimum", "onnxruntime", "numpy")
+
+
+def measure(module: str) -> List[dict]:
+    """Per-module import times, as reported by ``python -X importtime -c 'import module'``."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=root, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2,
+                        "self_ms": int(self_us) / 1000.0, "cumulative_ms": int(cumulative_us) / 1000.0})
+    return timings
+
+
+def check(module: str, budget_ms: float, top: int) -> dict:
+    timings = measure(module)
+    total_ms = sum(t["self_ms"] for t in timings)
+    forbidden = sorted({t["module"] for t in timings if t["module"].split(".")[0] in FORBIDDEN})
+    return {
+        "module": module,
+        "total_ms": round(total_ms, 1),
+        "budget_ms": budget_ms,
+        "forbidden_imports": forbidden,
+        "slowest": [{"module": t["module"], "cumulative_ms": round(t["cumulative_ms"], 1)}
+                    for t in sorted((t for t in timings if t["depth"] <= 1), key=lambda t: t["cumulative_ms"], reverse=True)[:top]],
+        "ok": total_ms <= budget_ms and not forbidden,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.main")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    report = check(args.module, args.budget_ms, args.top)
+    print(json.dumps(report, indent=2))
+    if report["forbidden_imports"]:
+        print(f"Heavy imports at startup: {', '.join(report['forbidden_imports'])}", file=sys.stderr)
+    if report["total_ms"] > args.budget_ms:
+        print(f"Import time {report['total_ms']}ms is over the {args.budget_ms}ms budget", file=sys.stderr)
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
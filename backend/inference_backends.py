@@ -0,0 +1,98 @@
+import os
+from typing import Optional
+
+# "torch" runs the HF pipelines in PyTorch eager mode (fp32); "onnx" exports the model to
+# ONNX Runtime; "onnx-int8" additionally applies dynamic int8 quantization to the export.
+INFERENCE_BACKEND = os.environ.get("LUMI_INFERENCE_BACKEND", "torch").lower()
+INTRA_OP_THREADS = int(os.environ.get("LUMI_INTRA_OP_THREADS", "0"))
+ONNX_DIR = os.environ.get("LUMI_ONNX_DIR", os.path.expanduser("~/lumi_app/onnx_models"))
+BACKENDS = ("torch", "onnx", "onnx-int8")
+# Tasks whose models are plain sequence classifiers and can be exported as such
+ONNX_TASKS = ("text-classification", "zero-shot-classification")
+
+QUANTIZED_FILE = "model_quantized.onnx"
+
+# model -> backend it was actually built on (differs from INFERENCE_BACKEND after a fallback)
+_loaded_backends = {}
+
+
+def record_backend(model: str, backend: str):
+    _loaded_backends[model] = backend
+
+
+def effective_backend(model: str) -> str:
+    """The backend ``model`` runs on: the one it loaded on, or the configured one before it loads."""
+    return _loaded_backends.get(model, INFERENCE_BACKEND)
+
+
+def _export_dir(model: str, quantize: bool) -> str:
+    return os.path.join(ONNX_DIR, model.replace("/", "--"), "int8" if quantize else "fp32")
+
+
+def export_onnx(model: str, quantize: bool = False) -> str:
+    """Export ``model`` to ONNX (and optionally quantize it) once; returns the export directory."""
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    fp32_dir = _export_dir(model, quantize=False)
+    if not os.path.exists(os.path.join(fp32_dir, "model.onnx")):
+        print(f"Exporting {model} to ONNX...")
+        ORTModelForSequenceClassification.from_pretrained(model, export=True).save_pretrained(fp32_dir)
+        AutoTokenizer.from_pretrained(model).save_pretrained(fp32_dir)
+    if not quantize:
+        return fp32_dir
+
+    int8_dir = _export_dir(model, quantize=True)
+    if not os.path.exists(os.path.join(int8_dir, QUANTIZED_FILE)):
+        print(f"Quantizing {model} to int8...")
+        quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=int8_dir, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(fp32_dir).save_pretrained(int8_dir)
+    return int8_dir
+
+
+def _build_onnx_pipeline(task: str, model: str, quantize: bool):
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+    from transformers import pipeline as hf_pipeline
+
+    model_dir = export_onnx(model, quantize=quantize)
+    session_options = onnxruntime.SessionOptions()
+    if INTRA_OP_THREADS:
+        session_options.intra_op_num_threads = INTRA_OP_THREADS
+    ort_model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir,
+        file_name=QUANTIZED_FILE if quantize else "model.onnx",
+        session_options=session_options,
+    )
+    return hf_pipeline(task, model=ort_model, tokenizer=AutoTokenizer.from_pretrained(model_dir))
+
+
+def build_pipeline(task: str, model: str, backend: Optional[str] = None):
+    """Build an HF pipeline for ``task``/``model`` on the selected inference backend.
+    Falls back to PyTorch when the task cannot be exported, ONNX Runtime is not installed,
+    or the export or session fails; effective_backend() reports which one was used.
+    """
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend != "torch" and task in ONNX_TASKS:
+        try:
+            pipe = _build_onnx_pipeline(task, model, quantize=backend == "onnx-int8")
+            record_backend(model, backend)
+            return pipe
+        except ImportError as e:
+            print(f"Warning: {backend} backend unavailable ({e}); install optimum[onnxruntime]. Using torch.")
+        except Exception as e:
+            print(f"Warning: {backend} backend failed for {model} ({type(e).__name__}: {e}). Using torch.")
+
+    from transformers import pipeline as hf_pipeline
+    if INTRA_OP_THREADS:
+        import torch
+        torch.set_num_threads(INTRA_OP_THREADS)
+    pipe = hf_pipeline(task, model=model)
+    record_backend(model, "torch")
+    return pipe
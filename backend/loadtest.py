@@ -0,0 +1,109 @@
+"""Load test: saturate inference while timing a cheap read-only route.
+
+Run against a live server:
+
+    python -m backend.loadtest --url http://127.0.0.1:8000 --concurrency 32 --requests 256
+
+It fires ``--requests`` POST /predict_text calls from ``--concurrency`` threads and, at
+the same time, polls a read-only route (``--probe``, default /community/mood-today).
+With inference off the event loop the probe latency should stay flat while /predict_text
+queues up; 503 responses show admission control kicking in.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_TEXTS = [
+    "My dog died",
+    "I got a promotion",
+    "I'm anxious about exams",
+    "This is disgusting",
+    "Wow, that's amazing!",
+    "I'm looking forward to tomorrow",
+]
+
+
+def _request(url: str, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return status, (time.perf_counter() - start) * 1000.0
+
+
+def _summary(latencies):
+    if not latencies:
+        return {"count": 0}
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(values[len(values) // 2], 1),
+        "p99_ms": round(values[min(len(values) - 1, int(len(values) * 0.99))], 1),
+        "max_ms": round(values[-1], 1),
+    }
+
+
+def run(url: str, concurrency: int, requests: int, probe: str, probe_interval: float) -> dict:
+    statuses = {}
+    predict_latencies = []
+    probe_latencies = []
+    done = threading.Event()
+
+    def probe_loop():
+        while not done.is_set():
+            status, ms = _request(url + probe)
+            if status == 200:
+                probe_latencies.append(ms)
+            time.sleep(probe_interval)
+
+    def predict(i):
+        status, ms = _request(url + "/predict_text", {"text": SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] + f" ({i})"})
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200:
+            predict_latencies.append(ms)
+
+    # Baseline probe latency with no inference load
+    baseline = [_request(url + probe)[1] for _ in range(10)]
+
+    prober = threading.Thread(target=probe_loop, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(predict, range(requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "statuses": statuses,
+        "predict": _summary(predict_latencies),
+        "probe_idle": _summary(baseline),
+        "probe_under_load": _summary(probe_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--probe", default="/community/mood-today")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+    print(json.dumps(run(args.url.rstrip("/"), args.concurrency, args.requests, args.probe, args.probe_interval), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,72 @@
+import asyncio
+import datetime
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 from backend import core
+from backend.core import hue_to_hex
 from backend import database
+from backend import async_db
+from backend import analytics
+from backend import bulk
+from backend import calendar_view
+from backend import color_cache
+from backend import mood_aggregates
+from backend import range_summary
+from backend import rescore
+from backend import telemetry
+from backend.batching import batcher
+from backend.executor import RETRY_AFTER_SECONDS, InferenceOverloaded, inference_pool
+from backend.prediction_cache import prediction_cache
+from backend.semantic_reuse import semantic_index
 
 os.environ['HF_HOME'] = os.path.expanduser("~/lumi_app/ai_models")
 
 app = FastAPI()
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], expose_headers=["ETag"])
+app.add_middleware(telemetry.TraceMiddleware)
+
+@app.exception_handler(InferenceOverloaded)
+async def inference_overloaded(request: Request, exc: InferenceOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+telemetry.register_gauge(
+    "lumi_queue_depth", "Work waiting or running, by queue.",
+    lambda: {
+        (("queue", "batcher"),): batcher.stats()["queue_depth"],
+        (("queue", "inference_pool"),): inference_pool.outstanding,
+        (("queue", "db_write_buffer"),): async_db.write_buffer.stats()["pending_rows"],
+    },
+)
+telemetry.register_gauge(
+    "lumi_model_loaded", "1 when the model is loaded in this process.",
+    lambda: {(("model", name),): int(info["loaded"]) for name, info in core.model_stats().items()},
+)
+telemetry.register_gauge(
+    "lumi_model_load_seconds", "Duration of the last load of each model.",
+    lambda: {(("model", name),): info["load_seconds"] or 0 for name, info in core.model_stats().items()},
+)
 
 class Entry(BaseModel):
     lines: list[str]
     user_id: Optional[str] = None
 
-def hue_to_hex(hue):
-    """Convert HSL hue (0-360) to RGB hex color with saturation=0.85, lightness=0.65"""
-    import colorsys
-    if hue is None:
-        return "#808080"  # Grey for neutral
-    # Convert HSL to RGB (colorsys uses 0-1 range)
-    r, g, b = colorsys.hls_to_rgb(hue / 360.0, 0.65, 0.85)
-    return f"#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}"
-
 @app.post("/predict")
 async def predict_color(entry: Entry):
-    result = core.analyze_lines(entry.lines)
+    if core.should_chunk(entry.lines):
+        # Long entry: token-budget windows, batched on their own (see backend/chunking.py)
+        with inference_pool.admit():
+            with telemetry.span("inference"):
+                result = await inference_pool.run(core.analyze_chunked, entry.lines)
+    else:
+        result = await batcher.submit(core.lines_to_text(entry.lines))
 
     # Save to database if user_id provided
     if entry.user_id and database.supabase:
@@ -38,20 +78,21 @@ async def predict_color(entry: Entry):
         hue = result.get('hue')
         color_hex = hue_to_hex(hue)
 
-        # Save to database
-        save_result = database.save_daily_color(
+        # Queue for the next bulk insert (write-behind, see backend/async_db.py)
+        save_result = await async_db.save_daily_color(
             user_id=entry.user_id,
             emotion=result.get("emotion", "Neutral"),
             color_hex=color_hex,
             mood_score=mood_score,
-            description=result.get("summary", "")
+            description=result.get("summary", ""),
+            entry_text="\n".join(entry.lines)
         )
 
         # Log the save result
         if "error" in save_result:
             print(f"[ERROR] Failed to save to database: {save_result['error']}")
         else:
-            print(f"[OK] Saved entry to database for user: {entry.user_id}")
+            print(f"[OK] Queued entry for database for user: {entry.user_id}")
 
     return result
 
@@ -60,11 +101,122 @@ class TextEntry(BaseModel):
 
 @app.post("/predict_text")
 async def predict_text(entry: TextEntry):
-    return core.analyze_text(entry.text)
+    return await batcher.submit(entry.text)
+
+@app.get("/batching/stats")
+async def batching_stats():
+    """Batch occupancy and queue latency of the inference scheduler"""
+    return {**batcher.stats(), "pool": inference_pool.stats()}
+
+@app.get("/models")
+async def models_status():
+    """Load state, load time and memory per registered model"""
+    return core.model_stats()
+
+@app.get("/ready")
+async def readiness():
+    """200 once every model in LUMI_WARM_MODELS is loaded and warmed up in this worker, else 503"""
+    if inference_pool.kind == "process":
+        # Models live in the pool's processes; report what the startup warm-up saw there
+        models = getattr(app.state, "warm_models", None) or {name: False for name in core.WARM_MODELS}
+    else:
+        models = core.warm_state()
+    ready = all(models.values())
+    body = {"ready": ready, "models": models, "pid": os.getpid(), **core.memory_mb()}
+    if ready:
+        return body
+    return JSONResponse(status_code=503, content=body, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+@app.get("/cascade/stats")
+async def cascade_stats():
+    """Which cascade stage decided predictions and the model time each stage cost"""
+    return core.cascade_stats()
+
+@app.get("/cache/stats")
+async def prediction_cache_stats():
+    """Hit/miss counters and size of the prediction cache"""
+    return prediction_cache.stats()
+
+@app.get("/cache/semantic")
+async def semantic_reuse_stats():
+    """Size, hit rate and audited accuracy of the semantic near-duplicate index"""
+    return semantic_index.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage/request latency histograms, decisions by method, queue depth, model state"""
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces/slow")
+async def slow_traces():
+    """Most recent request traces slower than LUMI_TRACE_SLOW_MS"""
+    return {"threshold_ms": telemetry.SLOW_TRACE_MS, "traces": telemetry.slow_traces()}
+
+async def unload_idle_models_periodically():
+    interval = min(60.0, core.MODEL_IDLE_SECONDS / 2)
+    while True:
+        await asyncio.sleep(interval)
+        for name in core.unload_idle_models():
+            print(f"[OK] Unloaded idle model: {name}")
+
+async def warm_models(names=None):
+    app.state.warm_models = await inference_pool.run(core.warm_up, names)
+
+@app.on_event("startup")
+async def start_models():
+    if core.WARM_IN_BACKGROUND:
+        # Load and warm everything after startup, so the port opens right away; /ready says when done
+        models = list(dict.fromkeys(core.PRELOAD_MODELS + core.WARM_MODELS))
+        if models:
+            app.state.warmer = asyncio.create_task(warm_models(models))
+    else:
+        if core.PRELOAD_MODELS:
+            await inference_pool.run(core.preload_models)
+        if core.WARM_MODELS:
+            app.state.warmer = asyncio.create_task(warm_models())
+    if core.MODEL_IDLE_SECONDS > 0:
+        app.state.idle_unloader = asyncio.create_task(unload_idle_models_periodically())
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    idle_unloader = getattr(app.state, "idle_unloader", None)
+    if idle_unloader is not None:
+        idle_unloader.cancel()
+    rescore_task = getattr(app.state, "rescore_task", None)
+    if rescore_task is not None:
+        rescore_task.cancel()
+    await batcher.close()
+    inference_pool.shutdown()
+    await async_db.close()
 
 @app.post("/calibrate")
 async def calibrate(entry: dict):
-    return {"results": [{"text": t, "prediction": core.analyze_text(t)} for t in entry.get("texts", [])]}
+    texts = entry.get("texts", [])
+    predictions = []
+    # Admit one slice at a time (waiting for room) so a large backfill never holds the
+    # whole queue and live /predict requests keep getting in between slices
+    for start in range(0, len(texts), bulk.BULK_BATCH_SIZE):
+        chunk = texts[start:start + bulk.BULK_BATCH_SIZE]
+        predictions.extend(await inference_pool.run_when_admitted(core.analyze_batch, chunk, weight=len(chunk)))
+    return {"results": [{"text": t, "prediction": p} for t, p in zip(texts, predictions)]}
+
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse for endpoints that keep reading the request body while streaming.
+    Starlette's disconnect listener would compete with request.stream() for receive();
+    request.stream() raises ClientDisconnect on its own, so the listener is not needed."""
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/calibrate/stream")
+async def calibrate_stream(request: Request):
+    """Bulk analysis: NDJSON upload in (a JSON string or {"text": ...} per line), NDJSON results
+    streamed back batch by batch with progress lines. /calibrate remains the plain JSON variant."""
+    content_length = request.headers.get("content-length")
+    total_bytes = int(content_length) if content_length and content_length.isdigit() else None
+    texts = bulk.iter_ndjson_texts(request.stream())
+    return UploadStreamingResponse(bulk.analyze_stream(texts, total_bytes), media_type="application/x-ndjson")
 
 @app.get("/calibrate_sample")
 async def calibrate_sample():
@@ -76,39 +228,149 @@ async def calibrate_sample():
         "Wow, that's amazing!",
         "I'm looking forward to tomorrow"
     ]
-    return {"results": [{"text": t, "prediction": core.analyze_text(t)} for t in samples]}
+    with inference_pool.admit(weight=len(samples)):
+        predictions = await inference_pool.run(core.analyze_batch, samples)
+    return {"results": [{"text": t, "prediction": p} for t, p in zip(samples, predictions)]}
 
 # Database endpoints
 @app.get("/colors/{user_id}")
 async def get_user_colors(user_id: str, limit: int = 30):
     """Get recent daily colors for a user"""
-    colors = database.get_user_colors(user_id, limit)
+    colors = await async_db.get_user_colors(user_id, limit)
     return {"colors": colors}
 
 @app.get("/colors/{user_id}/date/{date}")
 async def get_color_by_date(user_id: str, date: str):
     """Get daily color for a specific date (format: YYYY-MM-DD)"""
-    color = database.get_color_by_date(user_id, date)
+    color = await async_db.get_color_by_date(user_id, date)
     return {"color": color}
 
 @app.get("/colors/{user_id}/range")
 async def get_colors_by_range(user_id: str, start_date: str, end_date: str):
     """Get daily colors within a date range"""
-    colors = database.get_colors_by_date_range(user_id, start_date, end_date)
+    colors = await async_db.get_colors_by_date_range(user_id, start_date, end_date)
     return {"colors": colors}
 
+@app.get("/calendar/{user_id}/{year}/{month}")
+async def get_calendar_month(user_id: str, year: int, month: int, request: Request):
+    """Compact month view: day, mood code and color columns (no descriptions), with an ETag"""
+    try:
+        start_date, end_date = calendar_view.month_range(year, month)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if_none_match = request.headers.get("if-none-match", "")
+    version = await async_db.get_write_version(user_id)
+    if version is not None:
+        # Decide on the version alone, before touching the month's rows
+        tag = calendar_view.etag(user_id, year, month, str(version))
+        if calendar_view.not_modified(if_none_match, tag):
+            return Response(status_code=304, headers={"ETag": tag, "Cache-Control": "private, no-cache"})
+    rows = await async_db.get_colors_by_date_range(user_id, start_date, end_date)
+    payload = calendar_view.month_payload(rows, year, month)
+    if version is None:
+        tag = calendar_view.etag(user_id, year, month, calendar_view.payload_version(payload))
+    headers = {"ETag": tag, "Cache-Control": "private, no-cache"}
+    if calendar_view.not_modified(if_none_match, tag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"user_id": user_id, **payload}, headers=headers)
+
 @app.get("/stats/{user_id}")
 async def get_mood_stats(user_id: str, days: int = 30):
     """Get mood statistics for charts"""
-    stats = database.get_mood_stats(user_id, days)
+    stats = await async_db.get_mood_stats(user_id, days)
     return stats
 
+@app.get("/analytics/{user_id}")
+async def get_mood_analytics(
+    user_id: str,
+    window: int = Query(analytics.DEFAULT_WINDOW_DAYS, ge=1, le=analytics.MAX_WINDOW_DAYS),
+    days: int = Query(analytics.DEFAULT_HISTORY_DAYS, ge=1, le=analytics.MAX_HISTORY_DAYS),
+):
+    """Mood trend series over the last ``days`` days: rolling distributions, streaks,
+    average hue, mood-score moving averages and week-over-week deltas"""
+    today = datetime.date.today()
+    token = color_cache.read_token()
+    newest = await async_db.get_user_colors(user_id, 1)
+    result = analytics.cached(user_id, window, days, newest, today)
+    if result is None:
+        rows = await async_db.get_colors_by_date_range(user_id, analytics.history_start(days, today), str(today))
+        result = await asyncio.to_thread(analytics.compute, rows, window)
+        analytics.store(user_id, window, days, newest, today, token, result)
+    return {"user_id": user_id, **result}
+
 @app.get("/community/mood-today")
 async def get_community_mood_today():
     """Get aggregated mood statistics for all users today (anonymous)"""
-    stats = database.get_community_mood_today()
+    stats = await async_db.get_community_mood_today()
     return stats
 
+@app.get("/db/stats")
+async def db_stats():
+    """Write-behind buffer and color history cache counters"""
+    return {"write_buffer": async_db.write_buffer.stats(), "color_cache": color_cache.stats()}
+
+@app.post("/aggregates/rebuild")
+async def rebuild_mood_aggregates():
+    """Rebuild the in-memory mood counters from daily_colors"""
+    if not database.supabase:
+        return {"error": "Database not configured"}
+    await async_db.write_buffer.flush()
+    return {"success": True, "rebuilt": await async_db.run(mood_aggregates.rebuild, database.supabase)}
+
+@app.get("/aggregates/check")
+async def check_mood_aggregates(user_id: Optional[str] = None, date: Optional[str] = None):
+    """Compare the mood counters with a fresh table scan"""
+    if not database.supabase:
+        return {"error": "Database not configured"}
+    await async_db.write_buffer.flush()
+    return await async_db.run(mood_aggregates.check_consistency, database.supabase, user_id, date)
+
+def _rescore_status() -> dict:
+    job = getattr(app.state, "rescore_job", None)
+    task = getattr(app.state, "rescore_task", None)
+    if job is None:
+        return {"running": False}
+    status = {"running": not task.done(), **job.status()}
+    if task.done() and not task.cancelled() and task.exception() is not None:
+        status["error"] = str(task.exception())
+    return status
+
+@app.post("/rescore")
+async def start_rescore(restart: bool = False, dry_run: bool = False):
+    """Re-score stored rows with the current models in the background (see backend/rescore.py)"""
+    if not database.supabase:
+        return {"error": "Database not configured"}
+    if _rescore_status()["running"]:
+        return JSONResponse(status_code=409, content={"error": "Re-scoring is already running", **_rescore_status()})
+    job = rescore.RescoreJob(
+        database.supabase,
+        infer=lambda texts: inference_pool.run_when_admitted(rescore.score_entries, texts, weight=len(texts)),
+        dry_run=dry_run,
+        pool=inference_pool,
+    )
+    if restart:
+        job.restart()
+    app.state.rescore_job = job
+    app.state.rescore_task = asyncio.create_task(job.run())
+    return _rescore_status()
+
+@app.get("/rescore/status")
+async def rescore_status():
+    """Progress of the re-scoring job: last id, rows scanned/updated/unchanged/skipped"""
+    return _rescore_status()
+
+@app.post("/rescore/stop")
+async def stop_rescore():
+    """Stop re-scoring; progress up to the last finished page stays in the checkpoint"""
+    task = getattr(app.state, "rescore_task", None)
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    return _rescore_status()
+
 class SummarizeRequest(BaseModel):
     reflections: list[str]
 
@@ -137,4 +399,18 @@ async def summarize_reflections(request: SummarizeRequest):
 
     return {"summary": summary}
 
+@app.get("/summarize/{user_id}")
+async def summarize_date_range(user_id: str, start_date: str, end_date: str, abstractive: bool = False):
+    """Stream a summary of the user's stored entries between two dates (NDJSON, one line per month)"""
+    try:
+        start = datetime.date.fromisoformat(start_date)
+        end = datetime.date.fromisoformat(end_date)
+    except ValueError:
+        return JSONResponse({"error": "Dates must be YYYY-MM-DD"}, status_code=400)
+    if end < start:
+        return JSONResponse({"error": "end_date is before start_date"}, status_code=400)
+    if (end - start).days + 1 > range_summary.MAX_DAYS:
+        return JSONResponse({"error": f"Range is longer than {range_summary.MAX_DAYS} days"}, status_code=400)
+    return StreamingResponse(range_summary.stream(user_id, start, end, abstractive), media_type="application/x-ndjson")
+
 # app is importable for compatibility
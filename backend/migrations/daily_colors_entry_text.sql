@@ -0,0 +1,7 @@
+-- Original journal text per daily_colors row (required by LUMI_STORE_ENTRY_TEXT=1).
+--
+-- ``description`` holds the generated day summary, not the text the row was scored from,
+-- so re-scoring (backend/rescore.py) reads this column instead. Rows saved before it
+-- existed stay NULL and are skipped by the re-scoring job.
+
+ALTER TABLE daily_colors ADD COLUMN IF NOT EXISTS entry_text TEXT;
@@ -0,0 +1,18 @@
+-- One daily_colors row per user per day (required by LUMI_DAILY_UPSERT=1).
+--
+-- Run once in the Supabase SQL editor before turning upsert mode on. Duplicate rows from
+-- repeated submissions are removed, keeping the most recent one for each (user_id, date),
+-- which is the entry upsert mode would have kept. The unique index is what the
+-- upsert's on_conflict=user_id,date resolves against.
+
+BEGIN;
+
+DELETE FROM daily_colors AS older
+USING daily_colors AS newer
+WHERE older.user_id = newer.user_id
+  AND older.date = newer.date
+  AND (newer.created_at, newer.id) > (older.created_at, older.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS daily_colors_user_date_key ON daily_colors (user_id, date);
+
+COMMIT;
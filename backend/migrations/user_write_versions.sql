@@ -0,0 +1,35 @@
+-- Per-user write version for conditional GETs on /calendar (backend/calendar_view.py).
+--
+-- A trigger bumps user_write_versions.version in the same transaction as every insert,
+-- update or delete on daily_colors, so the version is shared by all API workers and also
+-- covers writes made outside the API. The calendar compares it with the client's ETag
+-- before reading any daily_colors rows. Until this is run, the API falls back to tags
+-- hashed from the month's rows.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS user_write_versions (
+    user_id TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_user_write_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        INSERT INTO user_write_versions (user_id, version) VALUES (OLD.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = user_write_versions.version + 1;
+    END IF;
+    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.user_id IS DISTINCT FROM OLD.user_id) THEN
+        INSERT INTO user_write_versions (user_id, version) VALUES (NEW.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = user_write_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS daily_colors_bump_write_version ON daily_colors;
+CREATE TRIGGER daily_colors_bump_write_version
+AFTER INSERT OR UPDATE OR DELETE ON daily_colors
+FOR EACH ROW EXECUTE FUNCTION bump_user_write_version();
+
+COMMIT;
@@ -0,0 +1,269 @@
+"""Incremental mood counters for the stats endpoints.
+
+Per-day (community) and per-user-per-day mood counts live in process memory. Each key is
+hydrated from ``daily_colors`` with one narrow query the first time it is read, and then
+kept current by record(), which database.save_daily_color calls after every insert
+(replace() in upsert mode). A user is hydrated from their newest
+LUMI_MOOD_AGGREGATES_USER_ROWS rows (or more, if a read asks for more), not their whole
+history.
+Hydrated keys expire after LUMI_MOOD_AGGREGATES_TTL seconds and are re-read, so writes
+made by other worker processes show up within that window. A scan is only kept if no
+write touched its key while it ran (the same read-token check as color_cache). rebuild() and
+check_consistency() back the /aggregates maintenance endpoints.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+AGGREGATES_TTL_SECONDS = float(os.environ.get("LUMI_MOOD_AGGREGATES_TTL", "300"))
+USER_ROWS = int(os.environ.get("LUMI_MOOD_AGGREGATES_USER_ROWS", "100"))
+PAGE_SIZE = 1000
+MAX_TRACKED_WRITES = 10000
+
+_lock = threading.Lock()
+_day_counts: Dict[str, Dict[str, int]] = {}
+_user_counts: Dict[str, Dict[str, Dict[str, int]]] = {}
+_day_hydrated_at: Dict[str, float] = {}
+_user_hydrated_at: Dict[str, float] = {}
+# Per hydrated user: days after this one are complete (None = the whole history is held)
+_user_since: Dict[str, Optional[str]] = {}
+_write_seq = 0  # bumped on every write or invalidation
+_last_write: "OrderedDict[Tuple[str, str], int]" = OrderedDict()  # ("day"|"user", key) -> _write_seq
+# Keys evicted from _last_write (or never written) count as written at this sequence
+_write_floor = 0
+
+
+def _note_write(user_id: Optional[str] = None, day: Optional[str] = None):
+    """Record a write to these keys (call with _lock held)."""
+    global _write_seq, _write_floor
+    _write_seq += 1
+    for key in (("user", user_id), ("day", day)):
+        if key[1] is not None:
+            _last_write[key] = _write_seq
+            _last_write.move_to_end(key)
+    while len(_last_write) > MAX_TRACKED_WRITES:
+        _, seq = _last_write.popitem(last=False)
+        _write_floor = max(_write_floor, seq)
+
+
+def _written_since(key: Tuple[str, str], token: int) -> bool:
+    return _last_write.get(key, _write_floor) > token
+
+
+def _fresh(hydrated_at: Optional[float]) -> bool:
+    return hydrated_at is not None and time.time() - hydrated_at < AGGREGATES_TTL_SECONDS
+
+
+def _scan(client, columns: str, **filters) -> List[dict]:
+    rows = []
+    offset = 0
+    while True:
+        query = client.table("daily_colors").select(columns)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        page = query.range(offset, offset + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+def _count_day(client, day: str) -> Dict[str, int]:
+    counts = {}
+    for row in _scan(client, "mood", date=day):
+        mood = row.get("mood", "Neutral")
+        counts[mood] = counts.get(mood, 0) + 1
+    return counts
+
+
+def _per_day(rows: List[dict]) -> Dict[str, Dict[str, int]]:
+    per_day = {}
+    for row in rows:
+        counts = per_day.setdefault(str(row["date"]), {})
+        mood = row.get("mood", "Neutral")
+        counts[mood] = counts.get(mood, 0) + 1
+    return per_day
+
+
+def _count_user(client, user_id: str, limit: int):
+    """(complete per-day counts, since, counts of the possibly partial day ``since``) from
+    the user's newest ``limit`` rows. ``since`` is None when that is their whole history."""
+    rows = client.table("daily_colors")\
+        .select("date, mood")\
+        .eq("user_id", user_id)\
+        .order("date", desc=True)\
+        .limit(limit)\
+        .execute().data or []
+    per_day = _per_day(rows)
+    if len(rows) < limit:
+        return per_day, None, {}
+    # The limit may cut the oldest day, so only later days are known complete
+    since = str(rows[-1]["date"])
+    return per_day, since, per_day.pop(since)
+
+
+def _tracks_user_day(user_id: str, day: str) -> bool:
+    return user_id in _user_hydrated_at and (_user_since.get(user_id) is None or day > _user_since[user_id])
+
+
+def record(user_id: str, day: str, mood: str):
+    """Count one saved entry. Keys that are not hydrated yet are left alone; their first
+    read scans the table, which already includes this row."""
+    with _lock:
+        _note_write(user_id, day)
+        if day in _day_hydrated_at:
+            counts = _day_counts.setdefault(day, {})
+            counts[mood] = counts.get(mood, 0) + 1
+        if _tracks_user_day(user_id, day):
+            counts = _user_counts.setdefault(user_id, {}).setdefault(day, {})
+            counts[mood] = counts.get(mood, 0) + 1
+
+
+def replace(user_id: str, day: str, mood: str):
+    """Count an entry that replaced the user's entry for ``day``, if any (upsert mode, where
+    each user has at most one row per day). The community count for the day can only be
+    corrected when the user's counters are hydrated; otherwise it is rescanned on next read."""
+    with _lock:
+        _note_write(user_id, day)
+        previous = None
+        if _tracks_user_day(user_id, day):
+            per_day = _user_counts.setdefault(user_id, {})
+            previous = per_day.get(day, {})
+            per_day[day] = {mood: 1}
+        if day in _day_hydrated_at:
+            if previous is None:
+                _day_counts.pop(day, None)
+                _day_hydrated_at.pop(day, None)
+                return
+            counts = _day_counts.setdefault(day, {})
+            for old_mood, count in previous.items():
+                counts[old_mood] = counts.get(old_mood, 0) - count
+                if counts[old_mood] <= 0:
+                    del counts[old_mood]
+            counts[mood] = counts.get(mood, 0) + 1
+
+
+def day_counts(client, day: str) -> Dict[str, int]:
+    """Mood counts across all users for ``day``."""
+    with _lock:
+        if _fresh(_day_hydrated_at.get(day)):
+            return dict(_day_counts.get(day, {}))
+        token = _write_seq
+    counts = _count_day(client, day)
+    with _lock:
+        # A write during the scan may or may not be in it; leave the key for the next read
+        if not _written_since(("day", day), token):
+            _day_counts[day] = counts
+            _day_hydrated_at[day] = time.time()
+    return dict(counts)
+
+
+def recent_user_counts(client, user_id: str, entries: int) -> Dict[str, int]:
+    """Mood counts over the user's most recent ``entries`` rows, newest day first.
+    Like the old ORDER BY date DESC LIMIT n query, ties within the oldest included day
+    are cut arbitrarily (here: most frequent mood first).
+    """
+    if entries <= 0:
+        return {}
+    with _lock:
+        fresh = _fresh(_user_hydrated_at.get(user_id))
+        per_day = {d: dict(c) for d, c in _user_counts.get(user_id, {}).items()}
+        complete = _user_since.get(user_id) is None
+        token = _write_seq
+    if not fresh or (not complete and sum(sum(c.values()) for c in per_day.values()) < entries):
+        per_day, since, partial = _count_user(client, user_id, max(entries, USER_ROWS))
+        with _lock:
+            if not _written_since(("user", user_id), token):
+                _user_counts[user_id] = {d: dict(c) for d, c in per_day.items()}
+                _user_since[user_id] = since
+                _user_hydrated_at[user_id] = time.time()
+        if since is not None:
+            # Only part of this day was read, which is all the LIMIT query would count too
+            per_day[since] = partial
+
+    totals = {}
+    remaining = entries
+    for day in sorted(per_day, reverse=True):
+        for mood, count in sorted(per_day[day].items(), key=lambda kv: kv[1], reverse=True):
+            take = min(count, remaining)
+            totals[mood] = totals.get(mood, 0) + take
+            remaining -= take
+            if remaining <= 0:
+                return totals
+    return totals
+
+
+def invalidate(user_ids=(), days=()):
+    """Forget the counters of these users and days; their next read rescans the table.
+    Used after rows are rewritten in place, which record() cannot express."""
+    with _lock:
+        for user_id in user_ids:
+            _note_write(user_id=user_id)
+            _user_counts.pop(user_id, None)
+            _user_hydrated_at.pop(user_id, None)
+            _user_since.pop(user_id, None)
+        for day in days:
+            _note_write(day=day)
+            _day_counts.pop(day, None)
+            _day_hydrated_at.pop(day, None)
+
+
+def rebuild(client) -> dict:
+    """Backfill: drop every counter and rebuild today's and all previously tracked keys
+    from daily_colors. Keys not rebuilt here are hydrated on their next read."""
+    global _write_seq, _write_floor
+    with _lock:
+        days = set(_day_hydrated_at) | {str(date.today())}
+        users = set(_user_hydrated_at)
+        # Scans already in flight must not store over the rebuilt counters
+        _write_seq += 1
+        _write_floor = _write_seq
+        _last_write.clear()
+        _day_counts.clear()
+        _user_counts.clear()
+        _day_hydrated_at.clear()
+        _user_hydrated_at.clear()
+        _user_since.clear()
+    for day in days:
+        day_counts(client, day)
+    for user_id in users:
+        recent_user_counts(client, user_id, 1)
+    return {"days": len(days), "users": len(users)}
+
+
+def check_consistency(client, user_id: Optional[str] = None, day: Optional[str] = None) -> dict:
+    """Compare the in-memory counters with a fresh scan and report any difference.
+    Checks today's community counts, plus ``user_id``'s per-day counts when given.
+    Counters are snapshotted before the scan; a scope written while it ran cannot be
+    compared and is listed under ``skipped`` instead (check again)."""
+    day = day or str(date.today())
+    report = {"date": day, "consistent": True, "mismatches": [], "skipped": []}
+    with _lock:
+        token = _write_seq
+        day_counts_held = dict(_day_counts.get(day, {})) if day in _day_hydrated_at else None
+        user_tracked = bool(user_id) and user_id in _user_hydrated_at
+        since = _user_since.get(user_id) if user_tracked else None
+        actual = {d: dict(c) for d, c in _user_counts.get(user_id, {}).items()} if user_tracked else {}
+    expected_day = _count_day(client, day) if day_counts_held is not None else None
+    expected = _per_day(_scan(client, "date, mood", user_id=user_id)) if user_tracked else {}
+    with _lock:
+        day_raced = _written_since(("day", day), token)
+        user_raced = user_tracked and _written_since(("user", user_id), token)
+    if day_counts_held is not None:
+        if day_raced:
+            report["skipped"].append({"scope": "day", "date": day})
+        elif expected_day != day_counts_held:
+            report["mismatches"].append({"scope": "day", "date": day, "counters": day_counts_held, "table": expected_day})
+    if user_raced:
+        report["skipped"].append({"scope": "user", "user_id": user_id})
+    elif user_tracked:
+        for d in sorted(set(expected) | set(actual)):
+            if since is not None and d <= since:
+                continue
+            if expected.get(d, {}) != actual.get(d, {}):
+                report["mismatches"].append({"scope": "user", "user_id": user_id, "date": d, "counters": actual.get(d, {}), "table": expected.get(d, {})})
+    report["consistent"] = not report["mismatches"]
+    return report
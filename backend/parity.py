@@ -0,0 +1,96 @@
+"""Parity check between the PyTorch pipelines and an ONNX Runtime backend.
+
+    python -m backend.parity --backend onnx-int8 [--texts corpus.jsonl] [--min-agreement 0.95]
+
+Builds the emotion classifier and the zero-shot pipeline on both the torch backend and
+``--backend``, runs them over the same texts, and reports top-label agreement, the mean
+absolute difference of the top score and per-text latency for each. Exits non-zero when
+agreement on either model falls below ``--min-agreement`` so it can gate a deploy.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import List
+
+from backend import core
+from backend.inference_backends import build_pipeline
+
+SAMPLE_TEXTS = [
+    "My dog died",
+    "I got a promotion",
+    "I'm anxious about exams",
+    "This is disgusting",
+    "Wow, that's amazing!",
+    "I'm looking forward to tomorrow",
+    "Woke up early and had coffee",
+    "Had an argument with my sibling and I am still annoyed",
+    "Spent the evening reading, nothing special happened",
+    "I can't stop worrying about the interview next week",
+]
+
+
+def _top_emotion(pipe, text):
+    scores = core._parse_emotion_scores(pipe(text, return_all_scores=True))
+    return max(scores.items(), key=lambda kv: kv[1])
+
+
+def _top_zero_shot(pipe, text):
+    output = pipe(text, list(core.EMOTION_MAP.keys()), multi_label=False)
+    return output["labels"][0], float(output["scores"][0])
+
+
+def compare(task: str, model: str, backend: str, texts: List[str], top_fn) -> dict:
+    reference = build_pipeline(task, model, backend="torch")
+    candidate = build_pipeline(task, model, backend=backend)
+    agree = 0
+    score_diff = 0.0
+    timings = {"torch": 0.0, backend: 0.0}
+    disagreements = []
+    for text in texts:
+        start = time.perf_counter()
+        ref_label, ref_score = top_fn(reference, text)
+        timings["torch"] += time.perf_counter() - start
+        start = time.perf_counter()
+        cand_label, cand_score = top_fn(candidate, text)
+        timings[backend] += time.perf_counter() - start
+        if ref_label == cand_label:
+            agree += 1
+        else:
+            disagreements.append({"text": text, "torch": ref_label, backend: cand_label})
+        score_diff += abs(ref_score - cand_score)
+    n = max(1, len(texts))
+    return {
+        "model": model,
+        "agreement": round(agree / n, 4),
+        "mean_abs_score_diff": round(score_diff / n, 4),
+        "ms_per_text": {name: round(total / n * 1000.0, 2) for name, total in timings.items()},
+        "disagreements": disagreements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"])
+    parser.add_argument("--texts", help="JSONL file with a \"text\" field per line (defaults to built-in samples)")
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [json.loads(line)["text"] for line in f if line.strip()]
+
+    report = {
+        "emotion": compare("text-classification", core.EMOTION_MODEL, args.backend, texts, _top_emotion),
+        "zero_shot": compare("zero-shot-classification", core.ZERO_SHOT_MODEL, args.backend, texts, _top_zero_shot),
+    }
+    print(json.dumps(report, indent=2))
+    failed = [name for name, r in report.items() if r["agreement"] < args.min_agreement]
+    if failed:
+        print(f"Parity below {args.min_agreement:.0%} for: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+CACHE_SIZE = int(os.environ.get("LUMI_PREDICTION_CACHE_SIZE", "4096"))
+CACHE_TTL_SECONDS = float(os.environ.get("LUMI_PREDICTION_CACHE_TTL", "86400"))
+CACHE_MAX_MB = float(os.environ.get("LUMI_PREDICTION_CACHE_MAX_MB", "64"))
+CACHE_PATH = os.environ.get("LUMI_PREDICTION_CACHE_PATH")
+
+_HORIZONTAL_SPACE = re.compile(r"[ \t\f\v]+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: unified newlines, collapsed spaces, trimmed lines.
+    Line breaks are kept because the summary is built line by line.
+    """
+    lines = (_HORIZONTAL_SPACE.sub(" ", line).strip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def fingerprint(version: dict, extra: Optional[dict] = None) -> str:
+    """Stable hash of the model versions (plus anything else that changes predictions)."""
+    payload = json.dumps({"version": version, "extra": extra or {}}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class PredictionCache:
+    """Content-addressed LRU cache of prediction dicts with TTL and a memory bound.
+
+    Keys are sha256(fingerprint + variant + normalized text), so changing the model
+    versions in the fingerprint makes every older entry unreachable. ``variant`` separates
+    results computed differently for the same text (e.g. chunked analysis). With ``path``
+    set, entries are also written through to SQLite and survive restarts. Only rows past
+    their TTL are pruned, when the file is opened, so processes and configurations that
+    share the file keep each other's entries; unreachable rows age out the same way.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 max_bytes: int = int(CACHE_MAX_MB * 1024 * 1024), path: Optional[str] = CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.path = path
+        self._entries = OrderedDict()  # key -> (payload json, created_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(text: str, fp: str, variant: str = "") -> str:
+        prefix = f"{fp}\x00{variant}" if variant else fp
+        return hashlib.sha256(f"{prefix}\x00{normalize_text(text)}".encode()).hexdigest()
+
+    def _open_db(self):
+        if not self.path:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, created_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._db.execute("DELETE FROM predictions WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._db.commit()
+        return self._db
+
+    def get(self, text: str, fp: str, variant: str = "") -> Optional[dict]:
+        if not self.enabled:
+            return None
+        key = self.make_key(text, fp, variant)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(payload)
+                self._remove(key)
+                self.expirations += 1
+            db = self._open_db()
+            if db is not None:
+                row = db.execute("SELECT payload, created_at FROM predictions WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    self._insert(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, text: str, fp: str, prediction: dict, variant: str = ""):
+        if not self.enabled:
+            return
+        key = self.make_key(text, fp, variant)
+        payload = json.dumps(prediction)
+        created_at = time.time()
+        with self._lock:
+            self._insert(key, payload, created_at)
+            db = self._open_db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO predictions (key, fingerprint, created_at, payload) VALUES (?, ?, ?, ?)",
+                    (key, fp, created_at, payload),
+                )
+                db.commit()
+
+    def _insert(self, key: str, payload: str, created_at: float):
+        if key in self._entries:
+            self._remove(key)
+        if len(payload) > self.max_bytes:
+            return
+        self._entries[key] = (payload, created_at)
+        self._bytes += len(payload)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        payload, _ = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": bool(self.path),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+prediction_cache = PredictionCache()
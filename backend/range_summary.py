@@ -0,0 +1,178 @@
+"""Server-side summary of a user's stored entries over a date range, streamed as NDJSON.
+
+The rows are read one calendar month at a time through
+database.get_colors_by_date_range, which also benefits from the color cache. Each month
+becomes one short line as soon as it is read: its entry count, dominant moods and a
+couple of the day summaries with the highest mood scores. When ``abstractive`` is set
+and the BART summarizer is already loaded, that month's summaries are condensed by the
+model instead, on the inference pool. The streamed output is:
+
+    {"page": {"start": ..., "end": ..., "entries": n}, "text": "October 2026 (12 entries): ..."}
+    ...
+    {"done": true, "summary": "...", "entries": n, "mood_counts": {...}, "cached": false}
+
+The final summary is capped at LUMI_RANGE_SUMMARY_MAX_CHARS, and a range may span at most
+LUMI_RANGE_SUMMARY_MAX_DAYS days. Finished results are cached per (user, range,
+abstractive, today), so reopening the same view replays them without touching the
+database or the models. Like the analytics cache, an entry is dropped once this process
+writes the user's rows (color_cache.written_since) or the user's newest row changes.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+from backend import async_db, color_cache, core
+from backend.executor import inference_pool
+
+MAX_CHARS = int(os.environ.get("LUMI_RANGE_SUMMARY_MAX_CHARS", "2000"))
+CACHE_ENTRIES = int(os.environ.get("LUMI_RANGE_SUMMARY_CACHE", "256"))
+MAX_DAYS = int(os.environ.get("LUMI_RANGE_SUMMARY_MAX_DAYS", "3660"))
+HIGHLIGHTS_PER_PAGE = 2
+HIGHLIGHT_CHARS = 120
+# bart-large-cnn reads at most 1024 tokens; stay well inside it
+ABSTRACTIVE_INPUT_CHARS = 3000
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # (user_id, start, end, abstractive, today) -> (newest-row key, read token, [page lines], final record)
+
+
+def month_pages(start: date, end: date) -> List[Tuple[date, date]]:
+    """Calendar months covering [start, end], clipped to the range."""
+    pages = []
+    page_start = start
+    while page_start <= end:
+        next_month = (page_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        page_end = min(end, next_month - timedelta(days=1))
+        pages.append((page_start, page_end))
+        page_start = next_month
+    return pages
+
+
+def _mood_counts(rows: List[dict]) -> dict:
+    counts = {}
+    for row in rows:
+        mood = row.get("mood") or "Neutral"
+        counts[mood] = counts.get(mood, 0) + 1
+    return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split()).rstrip(".")
+    return text if len(text) <= limit else text[:limit - 1].rsplit(" ", 1)[0] + "…"
+
+
+def summarize_page(rows: List[dict], page_start: date) -> str:
+    """One extractive line for a month of rows."""
+    label = page_start.strftime("%B %Y")
+    moods = list(_mood_counts(rows))
+    line = f"{label} ({len(rows)} {'entry' if len(rows) == 1 else 'entries'}): mostly {moods[0]}"
+    if len(moods) > 1:
+        line += ", also " + " and ".join(moods[1:3])
+    line += "."
+    dominant = [r for r in rows if (r.get("mood") or "Neutral") == moods[0] and (r.get("description") or "").strip()]
+    highlights = []
+    for row in sorted(dominant, key=lambda r: r.get("mood_score") or 0, reverse=True):
+        text = _clip(row["description"], HIGHLIGHT_CHARS)
+        if text and text not in highlights:
+            highlights.append(text)
+        if len(highlights) == HIGHLIGHTS_PER_PAGE:
+            break
+    if highlights:
+        line += " " + "; ".join(highlights) + "."
+    return line
+
+
+def _abstractive(descriptions: List[str]) -> Optional[str]:
+    pipe = core.summarizer_pipeline
+    if pipe is None or not descriptions:
+        return None
+    text = " ".join(d.strip() for d in descriptions)[:ABSTRACTIVE_INPUT_CHARS]
+    try:
+        return pipe(text, max_length=80, min_length=15, do_sample=False)[0]["summary_text"].strip()
+    except Exception as e:
+        print(f"[WARNING] Summarizer failed, using extractive summary: {e}")
+        return None
+
+
+def combine(lines: List[str], total_rows: List[dict], start: date, end: date) -> str:
+    """Header plus month lines, capped at MAX_CHARS (whole lines are dropped, not cut)."""
+    if not total_rows:
+        return f"No entries between {start} and {end}."
+    counts = _mood_counts(total_rows)
+    top_mood, top_count = next(iter(counts.items()))
+    summary = (f"Across {len(total_rows)} entries from {start} to {end}, your most common mood was "
+               f"{top_mood} ({top_count / len(total_rows):.0%}).")
+    for index, line in enumerate(lines):
+        if len(summary) + 1 + len(line) > MAX_CHARS:
+            summary += f"\n… and {len(lines) - index} more months."
+            break
+        summary += "\n" + line
+    return summary
+
+
+def _cached(key, newest_key) -> Optional[Tuple[List[str], dict]]:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] != newest_key or color_cache.written_since(key[0], entry[1]):
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return entry[2], entry[3]
+
+
+def _store(key, newest_key, token: int, lines: List[str], final: dict):
+    with _lock:
+        _cache[key] = (newest_key, token, lines, final)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+
+async def stream(user_id: str, start: date, end: date, abstractive: bool = False) -> AsyncIterator[str]:
+    """NDJSON lines summarizing ``user_id``'s rows in [start, end]; see the module docstring."""
+    token = color_cache.read_token()
+    newest_key = color_cache.newest_key(await async_db.get_user_colors(user_id, 1))
+    key = (user_id, str(start), str(end), abstractive, str(date.today()))
+    cached = _cached(key, newest_key)
+    if cached is not None:
+        lines, final = cached
+        for line in lines:
+            yield line
+        yield json.dumps({**final, "cached": True}) + "\n"
+        return
+
+    out = []
+    page_lines = []
+    all_rows = []
+    used_model = False
+    for page_start, page_end in month_pages(start, end):
+        rows = await async_db.get_colors_by_date_range(user_id, str(page_start), str(page_end))
+        if not rows:
+            continue
+        all_rows.extend({"mood": r.get("mood")} for r in rows)
+        text = None
+        if abstractive:
+            descriptions = [r["description"] for r in rows if (r.get("description") or "").strip()]
+            text = await inference_pool.run_when_admitted(_abstractive, descriptions)
+            if text:
+                used_model = True
+                text = f"{page_start.strftime('%B %Y')} ({len(rows)} entries): {text}"
+        text = text or summarize_page(rows, page_start)
+        page_lines.append(text)
+        out.append(json.dumps({"page": {"start": str(page_start), "end": str(page_end), "entries": len(rows)}, "text": text}) + "\n")
+        yield out[-1]
+
+    final = {
+        "done": True,
+        "summary": combine(page_lines, all_rows, start, end),
+        "entries": len(all_rows),
+        "mood_counts": _mood_counts(all_rows),
+        "abstractive": used_model,
+    }
+    _store(key, newest_key, token, out, final)
+    yield json.dumps({**final, "cached": False}) + "\n"
@@ -0,0 +1,207 @@
+"""Re-score stored daily_colors rows after a model or threshold change.
+
+    python -m backend.rescore --checkpoint rescore.json [--rate 20] [--dry-run] [--restart]
+
+or in the server with POST /rescore, GET /rescore/status and POST /rescore/stop.
+
+The job pages through daily_colors by id (keyset pagination, so rewritten rows never
+shift a page). Each page is analyzed in batches, and only the rows whose mood, color or
+score changed are written back, with one bulk upsert per page. After each page the job
+saves the last id it finished to a JSON checkpoint. A restarted job resumes from there,
+unless the model/policy fingerprint has changed since, in which case it starts over.
+The text that gets re-scored is the stored ``entry_text``: the journal lines /predict
+scored, saved with LUMI_STORE_ENTRY_TEXT=1 (see migrations/daily_colors_entry_text.sql).
+They go through the same path as /predict (core.analyze_entries), with the prediction
+cache and the semantic-reuse index bypassed so the job neither reads stale results nor
+evicts live ones. Rows without entry_text are skipped. The job refuses to start when the
+column does not exist; ``description`` holds the generated summary and is never re-scored.
+
+A token bucket caps throughput at LUMI_RESCORE_RATE rows per second. Inside the server
+each batch also waits (up to LUMI_RESCORE_MAX_YIELD seconds) for live requests on the
+inference pool to drain, so re-scoring fills idle capacity instead of competing for it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from backend import core
+
+TEXT_COLUMN = "entry_text"
+RATE_ROWS_PER_SECOND = float(os.environ.get("LUMI_RESCORE_RATE", "20"))
+PAGE_SIZE = int(os.environ.get("LUMI_RESCORE_PAGE_SIZE", "200"))
+BATCH_SIZE = int(os.environ.get("LUMI_RESCORE_BATCH_SIZE", "16"))
+MAX_YIELD_SECONDS = float(os.environ.get("LUMI_RESCORE_MAX_YIELD", "5"))
+CHECKPOINT_PATH = os.environ.get("LUMI_RESCORE_CHECKPOINT", "rescore_checkpoint.json")
+
+
+def scored_fields(result: dict) -> dict:
+    """The stored columns derived from a prediction, as /predict saves them."""
+    return {
+        "mood": result.get("emotion", "Neutral"),
+        "color_hex": core.hue_to_hex(result.get("hue")),
+        "mood_score": int(float(result.get("confidence", "0%").rstrip("%"))),
+    }
+
+
+def score_entries(texts: List[str]) -> List[dict]:
+    """Predictions for stored entry texts, as /predict made them, without the caches."""
+    return core.analyze_entries([text.split("\n") for text in texts], use_cache=False)
+
+
+async def _infer_offline(texts: List[str]) -> List[dict]:
+    return await asyncio.to_thread(score_entries, texts)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def take(self, amount: float):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= min(amount, self.capacity):
+                self.tokens -= amount
+                return
+            await asyncio.sleep((min(amount, self.capacity) - self.tokens) / self.rate)
+
+
+class RescoreJob:
+    def __init__(self, client, checkpoint_path: str = CHECKPOINT_PATH,
+                 infer: Callable[[List[str]], Awaitable[List[dict]]] = _infer_offline,
+                 rate: float = RATE_ROWS_PER_SECOND, page_size: int = PAGE_SIZE, batch_size: int = BATCH_SIZE,
+                 dry_run: bool = False, pool=None):
+        self.client = client
+        self.checkpoint_path = checkpoint_path
+        self.infer = infer
+        self.bucket = TokenBucket(rate, burst=max(rate, batch_size))
+        self.page_size = max(1, page_size)
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run
+        self.pool = pool
+        self.version = core._cache_fingerprint(core.default_policy())
+        self.state = self._load_checkpoint()
+
+    def _fresh_state(self) -> dict:
+        return {"version": self.version, "last_id": 0, "scanned": 0, "updated": 0, "unchanged": 0,
+                "skipped": 0, "done": False, "started_at": time.time(), "updated_at": None}
+
+    def _load_checkpoint(self) -> dict:
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return self._fresh_state()
+        if state.get("version") != self.version:
+            print("[WARNING] Model or policy changed since the checkpoint; re-scoring from the start")
+            return self._fresh_state()
+        return state
+
+    def _save_checkpoint(self):
+        self.state["updated_at"] = time.time()
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def restart(self):
+        self.state = self._fresh_state()
+        self._save_checkpoint()
+
+    def _check_column(self):
+        try:
+            self.client.table("daily_colors").select(f"id, {TEXT_COLUMN}").limit(1).execute()
+        except Exception as e:
+            raise RuntimeError(f"daily_colors has no {TEXT_COLUMN} column to re-score from; run "
+                               f"backend/migrations/daily_colors_entry_text.sql and set LUMI_STORE_ENTRY_TEXT=1 ({e})")
+
+    def _page(self) -> List[dict]:
+        return self.client.table("daily_colors")\
+            .select(f"id, user_id, date, mood, color_hex, mood_score, {TEXT_COLUMN}")\
+            .gt("id", self.state["last_id"])\
+            .order("id", desc=False)\
+            .limit(self.page_size)\
+            .execute().data or []
+
+    async def _yield_to_live_traffic(self):
+        if self.pool is None:
+            return
+        deadline = time.monotonic() + MAX_YIELD_SECONDS
+        while self.pool.outstanding > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def _rescore(self, rows: List[dict]) -> List[dict]:
+        """Updated rows (id, user_id, date and the re-scored columns) for those that changed."""
+        updates = []
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            await self.bucket.take(len(batch))
+            await self._yield_to_live_traffic()
+            results = await self.infer([str(row[TEXT_COLUMN]) for row in batch])
+            for row, result in zip(batch, results):
+                fields = scored_fields(result)
+                if all(row.get(k) == v for k, v in fields.items()):
+                    self.state["unchanged"] += 1
+                else:
+                    updates.append({"id": row["id"], "user_id": row["user_id"], "date": row["date"], **fields})
+        return updates
+
+    async def run(self) -> dict:
+        """Re-score every row after the checkpoint; returns the final state."""
+        from backend import database
+        await asyncio.to_thread(self._check_column)
+        while True:
+            rows = await asyncio.to_thread(self._page)
+            if not rows:
+                break
+            scorable = [row for row in rows if (row.get(TEXT_COLUMN) or "").strip()]
+            self.state["skipped"] += len(rows) - len(scorable)
+            updates = await self._rescore(scorable)
+            if updates and not self.dry_run:
+                result = await asyncio.to_thread(database.update_daily_colors, updates)
+                if "error" in result:
+                    # Keep the checkpoint before this page so a rerun retries it
+                    raise RuntimeError(f"Failed to write re-scored rows: {result['error']}")
+            self.state["updated"] += len(updates)
+            self.state["scanned"] += len(rows)
+            self.state["last_id"] = rows[-1]["id"]
+            self._save_checkpoint()
+        self.state["done"] = True
+        self._save_checkpoint()
+        return self.state
+
+    def status(self) -> dict:
+        return {**self.state, "checkpoint": self.checkpoint_path, "dry_run": self.dry_run}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--rate", type=float, default=RATE_ROWS_PER_SECOND, help="rows per second (0 = unlimited)")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="count changes without writing them")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+    args = parser.parse_args()
+
+    from backend import database
+    if not database.supabase:
+        raise SystemExit("Database not configured")
+    job = RescoreJob(database.supabase, args.checkpoint, rate=args.rate, page_size=args.page_size,
+                     batch_size=args.batch_size, dry_run=args.dry_run)
+    if args.restart:
+        job.restart()
+    print(json.dumps(asyncio.run(job.run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
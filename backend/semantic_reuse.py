@@ -0,0 +1,151 @@
+"""Reuse of predictions for paraphrased entries ("had a great day at work" / "great day at
+work today").
+
+When LUMI_SEMANTIC_REUSE is on, analyze_batch embeds the texts that missed the exact
+prediction cache with a small sentence encoder (LUMI_SEMANTIC_ENCODER). It then looks up
+the nearest recent prediction in a SemanticIndex. If the cosine similarity is at least
+LUMI_SEMANTIC_THRESHOLD, the neighbour's emotion, hue, confidence and candidates are
+returned with ``method: "semantic-reuse"``, and the emotion and zero-shot models do not
+run. The summary is still built from the new text.
+
+The index holds the vectors of the last LUMI_SEMANTIC_INDEX_SIZE full-model predictions
+in a ring buffer, and the oldest entry is evicted first. At that size one matrix-vector
+product per lookup is cheaper than maintaining an approximate structure. The index is
+cleared whenever the model/policy fingerprint changes. A fraction of the hits
+(LUMI_SEMANTIC_AUDIT_RATE) still runs the full models. stats() counts those apart from the
+hits that were served, and reports how often the reused emotion matched what the models
+decided. NumPy is imported when the index is first used, so it is not loaded while reuse
+is off.
+"""
+import json
+import os
+import random
+import threading
+from typing import List, Optional, Tuple
+
+from backend.zero_shot_engine import SentenceEncoder
+
+ENABLED = os.environ.get("LUMI_SEMANTIC_REUSE", "0").lower() in ("1", "true", "yes")
+ENCODER_MODEL = os.environ.get("LUMI_SEMANTIC_ENCODER", "sentence-transformers/all-MiniLM-L6-v2")
+THRESHOLD = float(os.environ.get("LUMI_SEMANTIC_THRESHOLD", "0.92"))
+INDEX_SIZE = int(os.environ.get("LUMI_SEMANTIC_INDEX_SIZE", "2048"))
+AUDIT_RATE = float(os.environ.get("LUMI_SEMANTIC_AUDIT_RATE", "0.05"))
+
+# Per-text fields that must not be copied from the neighbour
+_TEXT_FIELDS = ("summary", "cascade")
+
+
+def build_encoder(task: str, model: str):
+    """Model registry builder for the sentence encoder (see core.MODEL_SPECS)."""
+    return SentenceEncoder(model)
+
+
+class SemanticIndex:
+    """Bounded nearest-neighbour index from sentence vectors to prediction dicts."""
+
+    def __init__(self, max_entries: int = INDEX_SIZE, threshold: float = THRESHOLD,
+                 audit_rate: float = AUDIT_RATE, enabled: bool = ENABLED, seed: Optional[int] = None):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._vectors = None  # [max_entries, dim] float32, allocated on first add
+        self._payloads = [None] * max(0, max_entries)
+        self._size = 0
+        self._next = 0
+        self._fingerprint = None
+        self.lookups = 0
+        self.matches = 0
+        self.audited_matches = 0
+        self.evictions = 0
+        self.audits = 0
+        self.audit_agreements = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and self.max_entries > 0
+
+    def _reset(self, fp: Optional[str]):
+        self._vectors = None
+        self._payloads = [None] * self.max_entries
+        self._size = 0
+        self._next = 0
+        self._fingerprint = fp
+
+    def search(self, vectors: "np.ndarray", fp: str) -> List[Optional[Tuple[dict, float]]]:
+        """(neighbour prediction, similarity) per row of ``vectors``, or None below the threshold."""
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self.lookups += len(vectors)
+            if fp != self._fingerprint:
+                self._reset(fp)
+            if self._size == 0 or self._vectors.shape[1] != vectors.shape[1]:
+                return [None] * len(vectors)
+            similarity = vectors @ self._vectors[:self._size].T
+            best = similarity.argmax(axis=1)
+            matches = []
+            for row, column in enumerate(best):
+                score = float(similarity[row, column])
+                if score >= self.threshold:
+                    self.matches += 1
+                    matches.append((json.loads(self._payloads[column]), score))
+                else:
+                    matches.append(None)
+            return matches
+
+    def add(self, vectors: "np.ndarray", predictions: List[dict], fp: str):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if fp != self._fingerprint or (self._vectors is not None and self._vectors.shape[1] != vectors.shape[1]):
+                self._reset(fp)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vectors.shape[1]), dtype=np.float32)
+            for vector, prediction in zip(vectors, predictions):
+                if self._size == self.max_entries:
+                    self.evictions += 1
+                else:
+                    self._size += 1
+                self._vectors[self._next] = vector
+                self._payloads[self._next] = json.dumps({k: v for k, v in prediction.items() if k not in _TEXT_FIELDS})
+                self._next = (self._next + 1) % self.max_entries
+
+    def should_audit(self) -> bool:
+        """Whether a match should run the full models anyway, to measure reuse accuracy."""
+        with self._lock:
+            audit = self.audit_rate > 0 and self._random.random() < self.audit_rate
+            self.audited_matches += audit
+        return audit
+
+    def record_audit(self, reused: dict, actual: dict):
+        with self._lock:
+            self.audits += 1
+            self.audit_agreements += reused.get("emotion") == actual.get("emotion")
+
+    def clear(self):
+        with self._lock:
+            self._reset(None)
+
+    def stats(self) -> dict:
+        hits = self.matches - self.audited_matches
+        return {
+            "enabled": self.enabled,
+            "encoder": ENCODER_MODEL,
+            "threshold": self.threshold,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "lookups": self.lookups,
+            "hits": hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "audited_hits": self.audited_matches,
+            "audit_rate": self.audit_rate,
+            "audits": self.audits,
+            "audit_agreement": round(self.audit_agreements / self.audits, 4) if self.audits else None,
+        }
+
+
+semantic_index = SemanticIndex()
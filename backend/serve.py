@@ -0,0 +1,119 @@
+"""Prefork server: load the models once, then fork uvicorn workers that share them.
+
+    python -m backend.serve --workers 4 --host 0.0.0.0 --port 8000 [--models emotion,zero_shot]
+
+With ``uvicorn --workers N`` every worker imports the app and loads its own copy of
+each model. Here the parent process loads the weights first, freezes the garbage
+collector's view of them (gc.freeze) and binds the listening socket. Only then does it
+fork the workers. The weight tensors are never written after loading, so the workers
+share those pages copy-on-write. N workers cost the weights once, plus each worker's
+activations and caches.
+
+The parent does not run any inference itself. OpenMP and tokenizer thread pools are not
+fork-safe, so each worker runs its own warm-up pass after the fork (LUMI_WARM_MODELS).
+GET /ready returns 503 until that pass is done. The parent restarts workers that die
+and forwards SIGTERM/SIGINT to them for a graceful shutdown.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, log_level: str):
+    import uvicorn
+    # Fresh default handlers; uvicorn installs its own for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--models", default="emotion,zero_shot", help="models to load before forking")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    # Read by core at import time: workers warm up (and /ready waits for) the shared models
+    os.environ.setdefault("LUMI_WARM_MODELS", ",".join(models))
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    from backend import core
+    from backend.main import app
+
+    start = time.perf_counter()
+    core.load_pipelines(models)
+    # Keep the collector from touching (and so un-sharing) everything allocated so far
+    gc.collect()
+    gc.freeze()
+    memory = core.memory_mb()
+    print(f"[OK] Loaded {', '.join(models)} in {time.perf_counter() - start:.1f}s "
+          f"({memory['rss_mb'] or 0:.0f} MB resident); forking {args.workers} workers")
+
+    sock = _bind(args.host, args.port)
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, args.log_level)
+            finally:
+                os._exit(0)
+        children[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(max(1, args.workers)):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"[WARNING] Worker {pid} exited with status {status}; restarting")
+        if time.time() - started < RESTART_BACKOFF_SECONDS:
+            time.sleep(RESTART_BACKOFF_SECONDS)
+        spawn()
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
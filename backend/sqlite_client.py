@@ -0,0 +1,182 @@
+"""Local SQLite stand-in for the Supabase client.
+
+Implements the small slice of the postgrest query builder that backend/ uses
+(select/eq/gt/gte/lt/lte/order/limit/range/insert/upsert + execute), so database.py runs unchanged
+against a local file for tests and benchmarks. Select it with LUMI_DB_BACKEND=sqlite.
+"""
+import sqlite3
+import threading
+from typing import List, Optional
+
+SCHEMA = {
+    "daily_colors": """
+        CREATE TABLE IF NOT EXISTS daily_colors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            color_hex TEXT,
+            mood TEXT,
+            mood_score INTEGER,
+            description TEXT,
+            entry_text TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    "user_write_versions": """
+        CREATE TABLE IF NOT EXISTS user_write_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """,
+}
+# SQLite version of the trigger in migrations/user_write_versions.sql
+_BUMP = ("INSERT INTO user_write_versions (user_id, version) VALUES ({row}.user_id, 1) "
+         "ON CONFLICT (user_id) DO UPDATE SET version = version + 1")
+TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS daily_colors_version_insert AFTER INSERT ON daily_colors BEGIN {_BUMP.format(row='NEW')}; END",
+    f"CREATE TRIGGER IF NOT EXISTS daily_colors_version_update AFTER UPDATE ON daily_colors BEGIN {_BUMP.format(row='OLD')}; END",
+    f"CREATE TRIGGER IF NOT EXISTS daily_colors_version_move AFTER UPDATE OF user_id ON daily_colors "
+    f"WHEN NEW.user_id <> OLD.user_id BEGIN {_BUMP.format(row='NEW')}; END",
+    f"CREATE TRIGGER IF NOT EXISTS daily_colors_version_delete AFTER DELETE ON daily_colors BEGIN {_BUMP.format(row='OLD')}; END",
+]
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS daily_colors_user_date ON daily_colors (user_id, date)",
+    "CREATE INDEX IF NOT EXISTS daily_colors_date ON daily_colors (date)",
+]
+# SQLite version of migrations/daily_colors_unique_day.sql: keep the newest row per day, then enforce it
+UNIQUE_DAY = [
+    "DELETE FROM daily_colors WHERE id NOT IN (SELECT MAX(id) FROM daily_colors GROUP BY user_id, date)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS daily_colors_user_date_key ON daily_colors (user_id, date)",
+]
+
+
+class SQLiteResult:
+    def __init__(self, data: List[dict]):
+        self.data = data
+
+
+class SQLiteQuery:
+    def __init__(self, client: "SQLiteClient", table: str):
+        self._client = client
+        self._table = table
+        self._columns = "*"
+        self._where = []
+        self._params = []
+        self._order = None
+        self._limit = None
+        self._offset = None
+        self._insert_rows = None
+        self._on_conflict = None
+
+    def select(self, columns: str = "*"):
+        self._columns = ", ".join(c.strip() for c in columns.split(","))
+        return self
+
+    def _filter(self, column: str, op: str, value):
+        self._where.append(f"{column} {op} ?")
+        self._params.append(value)
+        return self
+
+    def eq(self, column: str, value):
+        return self._filter(column, "=", value)
+
+    def gt(self, column: str, value):
+        return self._filter(column, ">", value)
+
+    def gte(self, column: str, value):
+        return self._filter(column, ">=", value)
+
+    def lt(self, column: str, value):
+        return self._filter(column, "<", value)
+
+    def lte(self, column: str, value):
+        return self._filter(column, "<=", value)
+
+    def order(self, column: str, desc: bool = False):
+        self._order = f"{column} {'DESC' if desc else 'ASC'}"
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def insert(self, rows):
+        self._insert_rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id"):
+        """Insert rows, updating the given columns of rows that conflict on ``on_conflict``."""
+        self._insert_rows = rows if isinstance(rows, list) else [rows]
+        self._on_conflict = on_conflict
+        return self
+
+    def execute(self) -> SQLiteResult:
+        if self._insert_rows is not None:
+            return SQLiteResult(self._client._insert(self._table, self._insert_rows, self._on_conflict))
+        sql = f"SELECT {self._columns} FROM {self._table}"
+        if self._where:
+            sql += " WHERE " + " AND ".join(self._where)
+        if self._order:
+            sql += f" ORDER BY {self._order}"
+        if self._limit is not None:
+            sql += f" LIMIT {int(self._limit)}"
+            if self._offset:
+                sql += f" OFFSET {int(self._offset)}"
+        return SQLiteResult(self._client._query(sql, self._params))
+
+
+class SQLiteClient:
+    def __init__(self, path: str = ":memory:", unique_day: bool = False):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            for ddl in SCHEMA.values():
+                self._conn.execute(ddl)
+            for ddl in INDEXES + TRIGGERS + (UNIQUE_DAY if unique_day else []):
+                self._conn.execute(ddl)
+            self._conn.commit()
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, name)
+
+    def _query(self, sql: str, params: list) -> List[dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _insert(self, table: str, rows: List[dict], on_conflict: Optional[str] = None) -> List[dict]:
+        inserted = []
+        with self._lock:
+            try:
+                for row in rows:
+                    columns = list(row)
+                    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+                    if on_conflict:
+                        keys = [k.strip() for k in on_conflict.split(",")]
+                        updates = [c for c in columns if c not in keys]
+                        sql += f" ON CONFLICT ({', '.join(keys)}) DO " + (
+                            "UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates) if updates else "NOTHING")
+                        sql += " RETURNING rowid"
+                        returned = self._conn.execute(sql, [row[c] for c in columns]).fetchone()
+                        if returned is None:
+                            continue
+                        rowid = returned[0]
+                    else:
+                        rowid = self._conn.execute(sql, [row[c] for c in columns]).lastrowid
+                    inserted.append(dict(self._conn.execute(f"SELECT * FROM {table} WHERE rowid = ?", (rowid,)).fetchone()))
+                self._conn.commit()
+            except Exception:
+                # All-or-nothing like a single PostgREST insert request
+                self._conn.rollback()
+                raise
+        return inserted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,132 @@
+"""One-sentence, second-person day summaries built from journal lines.
+
+Patterns are compiled once at import, and the I/my/me rewrite happens in a single
+combined pass. summarize_many() handles a whole batch of entries. Micro-benchmark:
+
+    python -m backend.summary --bench [export.txt | export.jsonl]
+
+which reports throughput in lines/sec over a journal export (one entry per line of a
+text file, or a "text" field per JSONL line) or over a synthetic corpus.
+"""
+import argparse
+import json
+import re
+import time
+from typing import Iterable, List, Optional
+
+_LINE_SPLIT = re.compile(r'[\n\r]+')
+# Common label prefixes from the journal prompts
+_LABEL_PREFIX = re.compile(
+    r'^(Morning|Afternoon|Evening|Night|Day|Morning:|Afternoon:|Evening:|Night:|A key moment|Interaction|A challenge|Event|Thing|Activity|Note)[\s:]*',
+    re.IGNORECASE,
+)
+_FIRST_PERSON = re.compile(r'\b(?:I|my|me)\b', re.IGNORECASE)
+_SECOND_PERSON = {"i": "you", "my": "your", "me": "you"}
+
+QUIET_DAY = "You had a quiet day."
+
+
+def _to_second_person(match: "re.Match") -> str:
+    return _SECOND_PERSON[match.group(0).lower()]
+
+
+def normalize_line(line: str) -> Optional[str]:
+    """Strip the label prefix, rewrite to second person and lowercase the first letter.
+    Returns None when nothing is left."""
+    line_clean = _LABEL_PREFIX.sub('', line.strip(), count=1)
+    if not line_clean:
+        return None
+    line_clean = _FIRST_PERSON.sub(_to_second_person, line_clean).strip()
+    if not line_clean:
+        return None
+    return line_clean[0].lower() + line_clean[1:]
+
+
+def summarize(user_text: str) -> str:
+    """Condense a day's entry into "You did X, Y, Z." from its first three actions."""
+    actions = []
+    for line in _LINE_SPLIT.split(user_text):
+        if line.strip():
+            action = normalize_line(line)
+            if action:
+                actions.append(action)
+
+    if not actions:
+        return QUIET_DAY
+
+    if len(actions) == 1:
+        action = actions[0]
+        # Avoid "You you..." by checking if it already starts with "you"
+        if action.lower().startswith('you '):
+            summary = action[0].upper() + action[1:]
+        else:
+            summary = f"You {action}"
+    elif len(actions) <= 3:
+        summary = "You " + ", ".join(actions)
+    else:
+        # For 4+ actions, combine them more concisely
+        summary = "You " + ", ".join(actions[:3]) + "."
+
+    if not summary.endswith('.'):
+        summary += '.'
+    return summary
+
+
+def summarize_many(entries: Iterable[str]) -> List[str]:
+    return [summarize(entry) for entry in entries]
+
+
+SYNTHETIC_LINES = [
+    "Morning: Woke up early and had coffee with my partner",
+    "A key moment: I got promoted at work",
+    "Interaction: Caught up with an old friend who called me",
+    "A challenge: Had an argument with my sibling",
+    "Evening: Relaxed with a good book",
+    "Note: I feel like my week is finally calming down",
+]
+
+
+def _load_entries(path: Optional[str], synthetic_entries: int) -> List[str]:
+    if not path:
+        return ["\n".join(SYNTHETIC_LINES[i % len(SYNTHETIC_LINES):] + SYNTHETIC_LINES[:i % len(SYNTHETIC_LINES)])
+                for i in range(synthetic_entries)]
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line)["text"] for line in f if line.strip()]
+        return [line.rstrip("\n").replace("\\n", "\n") for line in f if line.strip()]
+
+
+def benchmark(entries: List[str], repeat: int = 5) -> dict:
+    lines = sum(len([l for l in _LINE_SPLIT.split(e) if l.strip()]) for e in entries)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        summarize_many(entries)
+        best = min(best, time.perf_counter() - start)
+    return {
+        "entries": len(entries),
+        "lines": lines,
+        "best_seconds": round(best, 4),
+        "lines_per_sec": round(lines / best) if best > 0 else None,
+        "entries_per_sec": round(len(entries) / best) if best > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("export", nargs="?", help="journal export (.txt or .jsonl); synthetic corpus if omitted")
+    parser.add_argument("--bench", action="store_true", help="report throughput instead of printing summaries")
+    parser.add_argument("--entries", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    entries = _load_entries(args.export, args.entries)
+    if args.bench:
+        print(json.dumps(benchmark(entries, args.repeat), indent=2))
+    else:
+        for summary in summarize_many(entries):
+            print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Per-request traces and Prometheus metrics for the predict pipeline.
+
+Code that does measurable work wraps it in ``span("name")`` (or decorates a function with
+``traced("name")``). Each span feeds the ``lumi_stage_seconds`` histogram and, when a
+request trace is active, adds a timed entry to that trace. TraceMiddleware opens one
+trace per HTTP request and returns it as a ``Server-Timing`` header. Requests slower than
+LUMI_TRACE_SLOW_MS are kept in a small ring buffer served at /traces/slow.
+
+Model stages run batched on the inference pool, so their histogram samples are per batch.
+Their per-request spans use the batch-amortized cost_ms that analyze_batch attaches to
+each result. With LUMI_INFERENCE_EXECUTOR=process, the model-stage histograms and decision
+counts are recorded in the worker processes and do not show up in the server's /metrics.
+
+render() writes the Prometheus text format without the prometheus_client dependency.
+Gauges such as queue depth and model-load state are read from callbacks only at scrape
+time. On the hot path a span costs two perf_counter() calls, one locked bucket update
+and one list append. Setting LUMI_TELEMETRY=0 turns spans off.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ENABLED = os.environ.get("LUMI_TELEMETRY", "1").lower() not in ("0", "false", "no")
+SLOW_TRACE_MS = float(os.environ.get("LUMI_TRACE_SLOW_MS", "1000"))
+SLOW_TRACE_KEEP = 100
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series: Dict[str, list] = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for value, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{self.label}="{value}",le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{self.label}="{value}"}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{self.label}="{value}"}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: int = 1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for value, count in sorted(snapshot.items()):
+            lines.append(f'{self.name}{{{self.label}="{value}"}} {count}')
+        return lines
+
+
+class Gauge:
+    """Gauge whose samples come from a callback at scrape time: ``fn() -> {labels: value}``."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            samples = self.fn()
+        except Exception as e:
+            print(f"[WARNING] Metric {self.name} unavailable: {e}")
+            return lines
+        for labels, value in samples.items():
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{self.name}{{{label_text}}} {value}" if label_text else f"{self.name} {value}")
+        return lines
+
+
+stage_seconds = Histogram("lumi_stage_seconds", "Time spent per pipeline stage (model stages per batch).", "stage")
+request_seconds = Histogram("lumi_request_seconds", "HTTP request latency by route.", "route")
+decisions = Counter("lumi_decisions_total", "Predictions by deciding method.", "method")
+_gauges: List[Gauge] = []
+
+
+def register_gauge(name: str, help_text: str, fn: Callable[[], Dict[Tuple[Tuple[str, str], ...], float]]):
+    _gauges.append(Gauge(name, help_text, fn))
+
+
+class Trace:
+    """Timed spans of one request, in start order, relative to the request start."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []  # (name, start offset ms, duration ms)
+        self.total_ms: Optional[float] = None
+
+    def add(self, name: str, start: float, duration_s: float):
+        # Background work started from a request (e.g. a write-behind flush) may outlive it
+        if self.total_ms is None:
+            self.spans.append((name, (start - self.started) * 1000.0, duration_s * 1000.0))
+
+    def finish(self) -> float:
+        self.total_ms = (time.perf_counter() - self.started) * 1000.0
+        return self.total_ms
+
+    def server_timing(self) -> str:
+        totals: Dict[str, float] = {}
+        for name, _, duration_ms in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration_ms
+        parts = [f"{name.replace('.', '-')};dur={ms:.2f}" for name, ms in totals.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000.0:.2f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "total_ms": round(self.total_ms or 0.0, 2),
+            "spans": [{"name": n, "start_ms": round(s, 2), "duration_ms": round(d, 2)} for n, s, d in self.spans],
+        }
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("lumi_trace", default=None)
+_slow_traces = deque(maxlen=SLOW_TRACE_KEEP)
+
+
+@contextmanager
+def span(name: str):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        stage_seconds.observe(name, duration)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(name, start, duration)
+
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_span(name: str, duration_ms: float, end: Optional[float] = None):
+    """Add an already measured span to the current trace only (no histogram sample)."""
+    trace = current_trace.get()
+    if trace is not None and ENABLED:
+        end = end if end is not None else time.perf_counter()
+        trace.add(name, end - duration_ms / 1000.0, duration_ms / 1000.0)
+
+
+def count_decisions(methods: Iterable[str]):
+    for method in methods:
+        decisions.inc(method)
+
+
+def start_trace(route: str) -> Trace:
+    trace = Trace(route)
+    current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace):
+    total_ms = trace.finish()
+    request_seconds.observe(trace.route, total_ms / 1000.0)
+    if total_ms >= SLOW_TRACE_MS:
+        _slow_traces.append(trace.to_dict())
+
+
+def slow_traces() -> List[dict]:
+    return list(_slow_traces)
+
+
+def render() -> str:
+    lines = []
+    for metric in (stage_seconds, request_seconds, decisions, *_gauges):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class TraceMiddleware:
+    """ASGI middleware: one trace per HTTP request, sent back as a Server-Timing header and
+    recorded in lumi_request_seconds under the matched route template (/colors/{user_id})."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        trace = start_trace(scope["path"])
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            trace.route = getattr(route, "path", "unmatched")
+            finish_trace(trace)
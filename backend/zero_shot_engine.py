@@ -0,0 +1,231 @@
+"""Zero-shot classification specialised for a fixed candidate label set.
+
+The zero-shot fallback always asks about the same nine EMOTION_MAP labels. The HF
+pipeline re-tokenizes "This example is {label}." for every text and label pair. The
+engines here have the same call signature as that pipeline (``zs(texts, candidate_labels,
+multi_label=False)``) and are picked with LUMI_ZERO_SHOT_MODE:
+
+- ``pipeline`` (default): the plain HF zero-shot pipeline.
+- ``nli``: the same NLI cross-encoder and the same scores, but hypotheses are tokenized
+  once per label set and each premise is tokenized once. All text x label pairs of a
+  batch run through the model as one padded forward pass (or a few, per
+  LUMI_ZERO_SHOT_PAIR_BATCH).
+- ``embedding``: a small sentence encoder (LUMI_ZERO_SHOT_ENCODER) with label vectors
+  computed once. Each text costs one encoder pass instead of nine cross-encoder passes.
+  This is much faster but less accurate; check it with the agreement report first.
+
+Agreement report against the pipeline behavior:
+
+    python -m backend.zero_shot_engine --report [--texts corpus.jsonl] [--min-agreement 0.9]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+from backend.inference_backends import build_pipeline, record_backend
+
+ZERO_SHOT_MODE = os.environ.get("LUMI_ZERO_SHOT_MODE", "pipeline").lower()
+ENCODER_MODEL = os.environ.get("LUMI_ZERO_SHOT_ENCODER", "sentence-transformers/all-MiniLM-L6-v2")
+PAIR_BATCH = int(os.environ.get("LUMI_ZERO_SHOT_PAIR_BATCH", "64"))
+MODES = ("pipeline", "nli", "embedding")
+
+HYPOTHESIS_TEMPLATE = "This example is {}."
+# Embedding mode compares texts with a short first-person description of each label
+LABEL_TEMPLATE = "I feel {}."
+EMBEDDING_TEMPERATURE = 0.05
+
+
+def model_name(nli_model: str, mode: Optional[str] = None) -> str:
+    """The model that actually produces zero-shot scores in ``mode`` (for versioning)."""
+    return ENCODER_MODEL if (mode or ZERO_SHOT_MODE) == "embedding" else nli_model
+
+
+def _output(text: str, labels: List[str], scores: List[float]) -> dict:
+    ranked = sorted(zip(labels, scores), key=lambda kv: kv[1], reverse=True)
+    return {"sequence": text, "labels": [l for l, _ in ranked], "scores": [float(s) for _, s in ranked]}
+
+
+class NLIZeroShot:
+    """NLI cross-encoder zero-shot with cached hypothesis tokens; scores match the HF pipeline."""
+
+    def __init__(self, pipe, hypothesis_template: str = HYPOTHESIS_TEMPLATE, pair_batch: int = PAIR_BATCH):
+        self.model = pipe.model
+        self.tokenizer = pipe.tokenizer
+        self.hypothesis_template = hypothesis_template
+        self.pair_batch = max(1, pair_batch)
+        label2id = {k.lower(): v for k, v in self.model.config.label2id.items()}
+        self.entailment_id = next(v for k, v in label2id.items() if k.startswith("entail"))
+        self.contradiction_id = next((v for k, v in label2id.items() if k.startswith("contra")), 0)
+        self.max_length = min(getattr(self.tokenizer, "model_max_length", 512) or 512, 1024)
+        self._special_tokens = self.tokenizer.num_special_tokens_to_add(pair=True)
+        self._hypotheses = {}  # tuple(labels) -> [token ids]
+
+    def _hypothesis_ids(self, labels: List[str]) -> List[List[int]]:
+        key = tuple(labels)
+        ids = self._hypotheses.get(key)
+        if ids is None:
+            ids = [self.tokenizer.encode(self.hypothesis_template.format(l), add_special_tokens=False) for l in labels]
+            self._hypotheses[key] = ids
+        return ids
+
+    def _entailment_logits(self, pairs: List[List[int]]):
+        import torch
+        logits = []
+        with torch.inference_mode():
+            for start in range(0, len(pairs), self.pair_batch):
+                batch = self.tokenizer.pad({"input_ids": pairs[start:start + self.pair_batch]}, return_tensors="pt")
+                logits.append(self.model(**batch).logits)
+        return torch.cat(logits)
+
+    def classify(self, texts: List[str], labels: List[str], multi_label: bool = False) -> List[dict]:
+        import torch
+        hypotheses = self._hypothesis_ids(labels)
+        premise_budget = self.max_length - self._special_tokens - max(len(h) for h in hypotheses)
+        pairs = []
+        for text in texts:
+            premise = self.tokenizer.encode(text, add_special_tokens=False)[:max(1, premise_budget)]
+            pairs.extend(self.tokenizer.build_inputs_with_special_tokens(premise, h) for h in hypotheses)
+        logits = self._entailment_logits(pairs).reshape(len(texts), len(labels), -1)
+        if multi_label:
+            pair_logits = logits[..., [self.contradiction_id, self.entailment_id]]
+            scores = torch.softmax(pair_logits, dim=-1)[..., 1]
+        else:
+            scores = torch.softmax(logits[..., self.entailment_id], dim=-1)
+        return [_output(text, labels, row.tolist()) for text, row in zip(texts, scores)]
+
+    def __call__(self, texts, candidate_labels, multi_label: bool = False, **kwargs):
+        if isinstance(texts, str):
+            return self.classify([texts], list(candidate_labels), multi_label)[0]
+        return self.classify(list(texts), list(candidate_labels), multi_label)
+
+
+class SentenceEncoder:
+    """Mean-pooled, L2-normalized sentence embeddings from a small encoder model.
+    Calling it returns a float32 NumPy array of shape [texts, dim]."""
+
+    def __init__(self, encoder: str = ENCODER_MODEL):
+        from transformers import AutoModel, AutoTokenizer
+        self.name = encoder
+        self.tokenizer = AutoTokenizer.from_pretrained(encoder)
+        self.model = AutoModel.from_pretrained(encoder).eval()
+        record_backend(encoder, "torch")
+
+    def encode(self, texts: List[str]):
+        import torch
+        batch = self.tokenizer(texts, padding=True, truncation=True, return_tensors="pt")
+        with torch.inference_mode():
+            hidden = self.model(**batch).last_hidden_state
+        # Mean pooling over real tokens, then L2-normalize
+        mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(pooled, dim=-1)
+
+    def __call__(self, texts: List[str]):
+        return self.encode(list(texts)).float().numpy()
+
+
+class EmbeddingZeroShot:
+    """Cosine similarity between a sentence embedding and precomputed label embeddings."""
+
+    def __init__(self, encoder: str = ENCODER_MODEL, temperature: float = EMBEDDING_TEMPERATURE):
+        self.encoder = SentenceEncoder(encoder)
+        self.temperature = temperature
+        self._label_vectors = {}  # tuple(labels) -> normalized [labels, dim] tensor
+
+    def _encode(self, texts: List[str]):
+        return self.encoder.encode(texts)
+
+    def _label_matrix(self, labels: List[str]):
+        key = tuple(labels)
+        vectors = self._label_vectors.get(key)
+        if vectors is None:
+            descriptions = [LABEL_TEMPLATE.format(l.replace("/", " and ").lower()) for l in labels]
+            vectors = self._label_vectors[key] = self._encode(descriptions)
+        return vectors
+
+    def classify(self, texts: List[str], labels: List[str], multi_label: bool = False) -> List[dict]:
+        import torch
+        similarity = self._encode(texts) @ self._label_matrix(labels).T
+        if multi_label:
+            scores = (similarity + 1.0) / 2.0
+        else:
+            scores = torch.softmax(similarity / self.temperature, dim=-1)
+        return [_output(text, labels, row.tolist()) for text, row in zip(texts, scores)]
+
+    def __call__(self, texts, candidate_labels, multi_label: bool = False, **kwargs):
+        if isinstance(texts, str):
+            return self.classify([texts], list(candidate_labels), multi_label)[0]
+        return self.classify(list(texts), list(candidate_labels), multi_label)
+
+
+def build(task: str, model: str, mode: Optional[str] = None):
+    """Model registry builder for the zero-shot stage (see core.MODEL_SPECS)."""
+    mode = (mode or ZERO_SHOT_MODE).lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown zero-shot mode: {mode}")
+    if mode == "embedding":
+        return EmbeddingZeroShot(ENCODER_MODEL)
+    pipe = build_pipeline(task, model)
+    if mode == "nli":
+        return NLIZeroShot(pipe)
+    return pipe
+
+
+def agreement_report(texts: List[str], labels: List[str], model: str, modes=("nli", "embedding")) -> dict:
+    """Top-label agreement and speed of each mode against the plain pipeline."""
+    def run(engine):
+        start = time.perf_counter()
+        outputs = [engine(text, labels, multi_label=False) for text in texts]
+        return outputs, (time.perf_counter() - start) / max(1, len(texts)) * 1000.0
+
+    reference, reference_ms = run(build("zero-shot-classification", model, mode="pipeline"))
+    report = {"texts": len(texts), "pipeline_ms_per_text": round(reference_ms, 2), "modes": {}}
+    for mode in modes:
+        outputs, ms = run(build("zero-shot-classification", model, mode=mode))
+        agree = sum(r["labels"][0] == o["labels"][0] for r, o in zip(reference, outputs))
+        score_diff = sum(abs(dict(zip(r["labels"], r["scores"]))[o["labels"][0]] - o["scores"][0])
+                         for r, o in zip(reference, outputs))
+        report["modes"][mode] = {
+            "agreement": round(agree / max(1, len(texts)), 4),
+            "mean_abs_score_diff": round(score_diff / max(1, len(texts)), 4),
+            "ms_per_text": round(ms, 2),
+            "speedup": round(reference_ms / ms, 2) if ms > 0 else None,
+            "disagreements": [{"text": t, "pipeline": r["labels"][0], mode: o["labels"][0]}
+                              for t, r, o in zip(texts, reference, outputs) if r["labels"][0] != o["labels"][0]],
+        }
+    return report
+
+
+def main():
+    from backend import core
+    from backend.parity import SAMPLE_TEXTS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--report", action="store_true", help="compare nli and embedding modes with the pipeline")
+    parser.add_argument("--texts", help="JSONL file with a \"text\" field per line (defaults to built-in samples)")
+    parser.add_argument("--modes", default="nli,embedding")
+    parser.add_argument("--min-agreement", type=float, default=None, help="exit non-zero below this agreement")
+    args = parser.parse_args()
+    if not args.report:
+        parser.print_help()
+        return
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [json.loads(line)["text"] for line in f if line.strip()]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    report = agreement_report(texts, list(core.EMOTION_MAP.keys()), core.ZERO_SHOT_MODEL, modes)
+    print(json.dumps(report, indent=2))
+    if args.min_agreement is not None:
+        failed = [mode for mode, r in report["modes"].items() if r["agreement"] < args.min_agreement]
+        if failed:
+            print(f"Agreement below {args.min_agreement:.0%} for: {', '.join(failed)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
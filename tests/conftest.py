@@ -0,0 +1,49 @@
+"""Shared test setup: the SQLite stand-in for Supabase and the stub pipelines from
+backend.benchmark, so the suite runs without credentials or model downloads.
+
+    PYTHONPATH=. pytest -q
+"""
+import os
+
+os.environ.setdefault("LUMI_DB_BACKEND", "sqlite")
+os.environ.setdefault("LUMI_SQLITE_PATH", ":memory:")
+
+import pytest
+
+from backend import color_cache, core, database, mood_aggregates
+from backend.benchmark import StubEmotionClassifier, StubZeroShot
+from backend.sqlite_client import SQLiteClient
+
+
+@pytest.fixture
+def stub_models(monkeypatch):
+    """Stub emotion and zero-shot pipelines with no per-token delay."""
+    monkeypatch.setattr(core, "emotion_classifier", StubEmotionClassifier(ms_per_token=0))
+    monkeypatch.setattr(core, "zero_shot", StubZeroShot(ms_per_token=0))
+    core.prediction_cache.clear()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh SQLite database with empty caches and counters (insert mode)."""
+    monkeypatch.setattr(database, "DAILY_UPSERT", False)
+    monkeypatch.setattr(database, "supabase", SQLiteClient(":memory:"))
+    color_cache.invalidate()
+    mood_aggregates.rebuild(database.supabase)
+    return database.supabase
+
+
+@pytest.fixture
+def upsert_db(monkeypatch, db):
+    """Like ``db``, with LUMI_DAILY_UPSERT on and the unique (user_id, date) index."""
+    monkeypatch.setattr(database, "DAILY_UPSERT", True)
+    monkeypatch.setattr(database, "supabase", SQLiteClient(":memory:", unique_day=True))
+    return database.supabase
+
+
+@pytest.fixture
+def client(stub_models, db):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from backend import core, telemetry
+from backend.executor import InferenceOverloaded, InferencePool, inference_pool
+
+
+def test_admit_rejects_beyond_queue_limit():
+    pool = InferencePool(queue_limit=2)
+    with pool.admit(weight=2):
+        with pytest.raises(InferenceOverloaded):
+            with pool.admit():
+                pass
+        assert pool.outstanding == 2
+    assert pool.outstanding == 0
+    assert pool.rejected == 1
+
+
+def test_oversized_request_is_admitted_when_idle():
+    pool = InferencePool(queue_limit=2)
+    with pool.admit(weight=5):
+        assert pool.outstanding == 5
+    assert pool.outstanding == 0
+
+
+def test_run_when_admitted_waits_for_room():
+    pool = InferencePool(queue_limit=1)
+
+    async def scenario():
+        with pool.admit():
+            waiting = asyncio.ensure_future(pool.run_when_admitted(lambda: "done", poll_seconds=0.01))
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+        return await waiting
+
+    try:
+        assert asyncio.run(scenario()) == "done"
+    finally:
+        pool.shutdown()
+    assert pool.rejected == 0
+
+
+def test_predict_returns_503_when_queue_is_full(client, monkeypatch):
+    monkeypatch.setattr(inference_pool, "outstanding", inference_pool.queue_limit)
+    response = client.post("/predict", json={"lines": ["I got a promotion"]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+
+
+def test_predict_runs_on_the_pool(client):
+    response = client.post("/predict", json={"lines": ["I got a promotion"]})
+    assert response.status_code == 200
+    assert response.json()["emotion"] in {v["label"] for v in core.EMOTION_MAP.values()}
+    assert inference_pool.outstanding == 0
+
+
+def test_thread_pool_spans_land_in_the_request_trace():
+    pool = InferencePool(kind="thread")
+
+    def work():
+        with telemetry.span("pool.work"):
+            return telemetry.current_trace.get()
+
+    async def scenario():
+        trace = telemetry.start_trace("/test")
+        assert await pool.run(work) is trace
+        return trace
+
+    try:
+        trace = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    if telemetry.ENABLED:
+        assert [name for name, _, _ in trace.spans] == ["pool.work"]
@@ -0,0 +1,46 @@
+import datetime
+
+from backend import analytics, database
+
+
+def _seed(moods, user_id="u"):
+    today = datetime.date.today()
+    rows = [{"user_id": user_id, "date": str(today - datetime.timedelta(days=len(moods) - 1 - i)), "mood": mood,
+             "color_hex": "#808080", "mood_score": 50, "description": "x"} for i, mood in enumerate(moods)]
+    database.save_daily_colors(rows)
+
+
+def test_compute_streaks_and_distribution():
+    today = datetime.date(2024, 6, 10)
+    rows = [{"date": str(today - datetime.timedelta(days=d)), "mood": "Joyful", "mood_score": 80} for d in range(4)]
+    rows.append({"date": str(today - datetime.timedelta(days=6)), "mood": "Sad", "mood_score": 10})
+    result = analytics.compute(rows, window=7, today=today)
+    assert result["entries"] == 5
+    assert result["streaks"]["current_days"] == 4
+    assert result["streaks"]["longest_mood"] == {"mood": "Joyful", "days": 4, "end": str(today)}
+    assert result["daily"]["distribution"][-1][result["moods"].index("Joyful")] == 0.8
+
+
+def test_rescore_invalidates_cached_trends(client):
+    _seed(["Sad", "Sad", "Sad"])
+    assert client.get("/analytics/u").json()["daily"]["dominant_mood"] == ["Sad"] * 3
+
+    oldest = database.get_user_colors("u", 5)[-1]
+    assert database.update_daily_colors([{**oldest, "mood": "Joyful"}])["success"]
+    assert client.get("/analytics/u").json()["daily"]["dominant_mood"] == ["Joyful", "Sad", "Sad"]
+
+
+def test_cache_is_keyed_on_today(client):
+    _seed(["Sad"])
+    first = client.get("/analytics/u").json()
+    assert analytics.cached("u", analytics.DEFAULT_WINDOW_DAYS, analytics.DEFAULT_HISTORY_DAYS,
+                            database.get_user_colors("u", 1), datetime.date.today()) == {k: v for k, v in first.items() if k != "user_id"}
+    assert analytics.cached("u", analytics.DEFAULT_WINDOW_DAYS, analytics.DEFAULT_HISTORY_DAYS,
+                            database.get_user_colors("u", 1), datetime.date.today() + datetime.timedelta(days=1)) is None
+
+
+def test_window_and_days_are_bounded(client):
+    assert client.get("/analytics/u", params={"days": 10_000_000}).status_code == 422
+    assert client.get("/analytics/u", params={"window": 0}).status_code == 422
+    assert analytics.history_start(10 ** 9, datetime.date(2024, 1, 1)) == str(
+        datetime.date(2024, 1, 1) - datetime.timedelta(days=analytics.MAX_HISTORY_DAYS - 1))
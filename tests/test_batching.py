@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+
+from backend import core
+from backend.batching import InferenceBatcher
+from backend.executor import InferencePool
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Record the batches handed to core.analyze_batch, which echoes each text back."""
+    batches = []
+
+    def analyze_batch(texts):
+        batches.append(list(texts))
+        return [{"text": t} for t in texts]
+
+    monkeypatch.setattr(core, "analyze_batch", analyze_batch)
+    return batches
+
+
+def _run(batcher, scenario):
+    async def wrapped():
+        try:
+            return await asyncio.wait_for(scenario(), timeout=5)
+        finally:
+            await batcher.close()
+
+    try:
+        return asyncio.run(wrapped())
+    finally:
+        batcher.pool.shutdown()
+
+
+def test_full_batch_flushes_without_waiting(calls):
+    batcher = InferenceBatcher(max_batch_size=3, max_wait_ms=60000, pool=InferencePool())
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(t) for t in "abc"))
+
+    assert [r["text"] for r in _run(batcher, scenario)] == ["a", "b", "c"]
+    assert calls == [["a", "b", "c"]]
+    assert batcher.stats()["batch_size_histogram"] == {3: 1}
+
+
+def test_partial_batch_flushes_after_max_wait(calls):
+    batcher = InferenceBatcher(max_batch_size=8, max_wait_ms=50, pool=InferencePool())
+
+    async def scenario():
+        start = time.perf_counter()
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+        return results, time.perf_counter() - start
+
+    results, elapsed = _run(batcher, scenario)
+    assert [r["text"] for r in results] == ["a", "b"]
+    assert calls == [["a", "b"]]
+    assert elapsed >= 0.05
+
+
+def test_batch_error_reaches_every_caller(calls, monkeypatch):
+    echo = core.analyze_batch
+
+    def fail_once(texts):
+        monkeypatch.setattr(core, "analyze_batch", echo)
+        raise ValueError("model crashed")
+
+    monkeypatch.setattr(core, "analyze_batch", fail_once)
+    batcher = InferenceBatcher(max_batch_size=2, max_wait_ms=60000, pool=InferencePool())
+
+    async def scenario():
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+        # The worker and its slot survive the failed batch
+        results.append(await asyncio.gather(batcher.submit("c"), batcher.submit("d")))
+        return results
+
+    first, second, later = _run(batcher, scenario)
+    assert isinstance(first, ValueError) and isinstance(second, ValueError)
+    assert [r["text"] for r in later] == ["c", "d"]
+    assert calls == [["c", "d"]]
+    assert batcher.pool.outstanding == 0
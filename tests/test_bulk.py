@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from backend import bulk, core
+
+
+def _stream(client, body: bytes):
+    response = client.post("/calibrate/stream", content=body)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _ndjson(*values):
+    return b"\n".join(json.dumps(v).encode() for v in values)
+
+
+def test_every_line_gets_a_prediction(client):
+    lines = _stream(client, _ndjson("Great day at the beach", {"text": "Missed the bus"}, "Quiet evening") + b"\n\n")
+    results = [line for line in lines if "prediction" in line]
+    assert [(r["index"], r["text"]) for r in results] == [(0, "Great day at the beach"), (1, "Missed the bus"), (2, "Quiet evening")]
+    assert lines[-2]["progress"]["processed"] == 3
+    assert lines[-1]["done"] and lines[-1]["processed"] == 3 and lines[-1]["failed"] == 0
+
+
+def test_malformed_line_reports_how_many_texts_came_before(client):
+    lines = _stream(client, _ndjson("First", "Second") + b"\n{not json\n" + _ndjson("Never read"))
+    assert [line["text"] for line in lines if "prediction" in line] == ["First", "Second"]
+    assert lines[-1]["error"].startswith("Invalid input after 2 texts")
+    assert not any(line.get("done") for line in lines)
+
+
+def test_non_object_line_is_an_input_error(client):
+    lines = _stream(client, _ndjson("First", [1, 2]))
+    assert lines[-1]["error"].startswith("Invalid input after 1 texts")
+
+
+def _analyze(texts, batch_size):
+    async def source():
+        for consumed, text in enumerate(texts, 1):
+            yield text, consumed
+
+    async def collect():
+        return [json.loads(line) async for chunk in bulk.analyze_stream(source(), batch_size=batch_size)
+                for line in chunk.splitlines()]
+
+    return asyncio.run(collect())
+
+
+def test_inference_failure_is_a_server_error(stub_models, monkeypatch):
+    analyze_batch = core.analyze_batch
+
+    def fail_on_boom(texts):
+        if "boom" in texts:
+            raise RuntimeError("model crashed")
+        return analyze_batch(texts)
+
+    monkeypatch.setattr(core, "analyze_batch", fail_on_boom)
+    lines = _analyze(["fine", "boom", "after"], batch_size=2)
+    assert [line for line in lines if "server_error" in line] == \
+        [{"server_error": "Inference failed: model crashed", "first_index": 0, "count": 2}]
+    # The next batch still runs and keeps its input index
+    assert [(line["index"], line["text"]) for line in lines if "prediction" in line] == [(2, "after")]
+    assert not any("error" in line for line in lines)
+    assert lines[-1]["done"] and lines[-1]["processed"] == 3 and lines[-1]["failed"] == 2
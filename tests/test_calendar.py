@@ -0,0 +1,62 @@
+from backend import color_cache, database
+
+
+def _row(mood, day, user_id="u"):
+    return {"user_id": user_id, "date": day, "mood": mood, "color_hex": "#808080", "mood_score": 50, "description": "x"}
+
+
+def test_month_payload_columns(client):
+    database.save_daily_colors([_row("Sad", "2026-10-01"), _row("Joyful", "2026-10-01"), _row("Calm", "2026-10-04")])
+    body = client.get("/calendar/u/2026/10").json()
+    assert body["day"] == [1, 4]
+    assert [body["moods"][code] for code in body["mood"]] == ["Joyful", "Calm"]
+    assert body["days_in_month"] == 31
+
+
+def _count_range_reads(monkeypatch):
+    reads = []
+    read = database.get_colors_by_date_range
+    monkeypatch.setattr(database, "get_colors_by_date_range", lambda *args: reads.append(args) or read(*args))
+    return reads
+
+
+def test_revisit_gets_304_without_reading_rows(client, monkeypatch):
+    database.save_daily_colors([_row("Sad", "2026-10-01")])
+    tag = client.get("/calendar/u/2026/10").headers["ETag"]
+
+    # A cold cache (another worker, or a restart) still answers from the write version alone
+    color_cache.invalidate()
+    reads = _count_range_reads(monkeypatch)
+    response = client.get("/calendar/u/2026/10", headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == tag
+    assert reads == []
+
+
+def test_any_write_changes_the_tag(client, db):
+    database.save_daily_colors([_row("Sad", "2026-10-01")])
+    tag = client.get("/calendar/u/2026/10").headers["ETag"]
+
+    database.save_daily_colors([_row("Joyful", "2026-10-02")])
+    response = client.get("/calendar/u/2026/10", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.json()["day"] == [1, 2]
+    tag = response.headers["ETag"]
+
+    # Writes that bypass the API (another service, the SQL editor) bump the version too
+    db.table("daily_colors").upsert([{**database.get_user_colors("u", 1)[0], "mood": "Calm"}], on_conflict="id").execute()
+    assert client.get("/calendar/u/2026/10", headers={"If-None-Match": tag}).status_code == 200
+
+
+def test_falls_back_to_row_hash_without_versions_table(client, monkeypatch):
+    monkeypatch.setattr(database, "_write_versions_missing", True)
+    database.save_daily_colors([_row("Sad", "2026-10-01")])
+    tag = client.get("/calendar/u/2026/10").headers["ETag"]
+    color_cache.invalidate()
+    assert client.get("/calendar/u/2026/10", headers={"If-None-Match": tag}).status_code == 304
+    database.save_daily_colors([_row("Joyful", "2026-10-02")])
+    assert client.get("/calendar/u/2026/10", headers={"If-None-Match": tag}).status_code == 200
+
+
+def test_invalid_month(client):
+    assert client.get("/calendar/u/2026/13").status_code == 400
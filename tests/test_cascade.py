@@ -0,0 +1,61 @@
+import pytest
+
+from backend import core
+from backend.benchmark import StubEmotionClassifier
+
+FLAT = {label: 1 / 7 for label in StubEmotionClassifier.labels}
+
+
+def _zero_shot(label, score):
+    return {"labels": [label, "Neutral/Mixed"], "scores": [score, 1 - score]}
+
+
+def test_confident_emotion_decides_alone():
+    result = core.decide_from_emotion({"joy": 0.9, "sadness": 0.05, "neutral": 0.05})
+    assert (result["emotion"], result["method"]) == ("Joyful", "emotion-model-multi")
+
+
+def test_promoted_labels_win_close_calls():
+    # surprise gets promote_label_boost, joy does not
+    result = core.decide_from_emotion({"surprise": 0.36, "joy": 0.38, "neutral": 0.26})
+    assert result["emotion"] == "Inspired"
+    no_boost = core.default_policy().with_overrides(promote_label_boost=0.0)
+    assert core.decide_from_emotion({"surprise": 0.36, "joy": 0.38, "neutral": 0.26}, no_boost)["emotion"] == "Joyful"
+
+
+def test_unsure_emotion_defers_unless_the_policy_allows_it():
+    assert core.decide_from_emotion(FLAT) is None
+    lenient = core.default_policy().with_overrides(emotion_confidence_threshold=0.1, multi_label_threshold=0.1)
+    assert core.decide_from_emotion(FLAT, lenient)["method"] == "emotion-model-multi"
+
+
+def test_zero_shot_breaks_the_tie():
+    result = core.decide_with_zero_shot(FLAT, _zero_shot("Fearful/Anxious", 0.7))
+    assert (result["emotion"], result["method"]) == ("Anxious", "zero-shot")
+    assert {c["source"] for c in result["candidates"]} == {"emotion-model", "zero-shot"}
+
+
+def test_weak_signals_fall_back_to_neutral():
+    result = core.decide_with_zero_shot(FLAT, _zero_shot("Fearful/Anxious", 0.2))
+    assert (result["emotion"], result["method"]) == ("Neutral", "fallback-neutral")
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        core.CascadePolicy(mode="slow")
+
+
+@pytest.mark.parametrize("mode, stage, zero_shot_calls", [("full", "zero-shot", 1), ("fast-only", "fast-only", 0)])
+def test_fast_only_never_calls_zero_shot(stub_models, monkeypatch, mode, stage, zero_shot_calls):
+    calls = []
+
+    def zero_shot(texts, labels, multi_label=False):
+        calls.append(texts)
+        return [_zero_shot("Calm/Relaxed", 0.8) for _ in texts]
+
+    monkeypatch.setattr(core, "emotion_classifier", lambda texts, **kwargs: [[{"label": l, "score": s} for l, s in FLAT.items()] for _ in texts])
+    monkeypatch.setattr(core, "zero_shot", zero_shot)
+    results = core.analyze_batch(["Long day", "Not sure how I feel"], core.CascadePolicy(mode=mode), use_cache=False)
+    assert len(calls) == zero_shot_calls
+    assert {r["cascade"]["stage"] for r in results} == {stage}
+    assert {r["emotion"] for r in results} == ({"Calm"} if mode == "full" else {"Neutral"})
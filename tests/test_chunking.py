@@ -0,0 +1,99 @@
+from backend import chunking, core
+
+
+class _WordTokenizer:
+    """One token per word, with a configurable model_max_length."""
+
+    def __init__(self, model_max_length):
+        self.model_max_length = model_max_length
+
+    def __call__(self, text, add_special_tokens=False):
+        return {"input_ids": text.split()}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+class _Pipe:
+    def __init__(self, model_max_length):
+        self.tokenizer = _WordTokenizer(model_max_length)
+
+
+def _words(n):
+    return " ".join(f"w{i}" for i in range(n))
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def test_auto_threshold_is_the_model_limit(monkeypatch):
+    monkeypatch.setattr(chunking, "TOKEN_BUDGET", None)
+    assert chunking.model_token_limit(_Pipe(512)) == 510
+    assert chunking.model_token_limit(_Pipe(int(1e30))) == chunking.DEFAULT_MODEL_LIMIT
+    assert chunking.model_token_limit(None) == chunking.DEFAULT_MODEL_LIMIT
+    # ~100 words fit the model, so they keep the batched whole-text path
+    assert not chunking.should_chunk([_words(100)], mode="auto")
+    assert chunking.should_chunk([_words(500)], mode="auto")
+
+
+def test_core_counts_with_the_loaded_tokenizer(monkeypatch):
+    monkeypatch.setattr(chunking, "TOKEN_BUDGET", None)
+    monkeypatch.setattr(chunking, "CHUNK_MODE", "auto")
+    monkeypatch.setattr(core, "emotion_classifier", _Pipe(64))
+    assert not core.should_chunk([_words(62)])
+    assert core.should_chunk([_words(63)])
+
+
+def test_explicit_budget_overrides(monkeypatch):
+    monkeypatch.setattr(chunking, "TOKEN_BUDGET", 128)
+    assert chunking.token_budget(_Pipe(512)) == 128
+    assert chunking.should_chunk([_words(100)], mode="auto")
+
+
+def test_modes():
+    assert chunking.should_chunk(["short"], mode="always")
+    assert not chunking.should_chunk([_words(5000)], mode="off")
+
+
+def test_split_windows_one_line_per_window():
+    split = chunking.split_windows(["first line", "", "  second line  "], budget=10, count_tokens=count_words)
+    assert split["windows"] == ["first line", "second line"]
+    assert split["lines"] == [[0], [2]]
+    assert split["tokens"] == [2, 2]
+    assert not split["truncated"]
+
+
+def test_split_windows_splits_long_lines_at_sentences_then_words():
+    line = "One two three. Four five six seven. " + _words(9)
+    split = chunking.split_windows([line], budget=4, count_tokens=count_words)
+    assert all(t <= 4 for t in split["tokens"])
+    assert split["windows"][:2] == ["One two three.", "Four five six seven."]
+    assert " ".join(split["windows"][2:]) == _words(9)
+    assert all(owners == [0] for owners in split["lines"])
+
+
+def test_split_windows_packs_then_truncates():
+    lines = [f"line {i}" for i in range(8)]
+    packed = chunking.split_windows(lines, budget=4, max_windows=4, count_tokens=count_words)
+    assert packed["windows"] == ["line 0 line 1", "line 2 line 3", "line 4 line 5", "line 6 line 7"]
+    assert packed["lines"][0] == [0, 1]
+    assert not packed["truncated"]
+
+    cut = chunking.split_windows(lines, budget=2, max_windows=4, count_tokens=count_words)
+    assert len(cut["windows"]) == 4
+    assert cut["truncated"]
+
+
+def test_combine_scores_is_token_weighted():
+    combined = chunking.combine_scores([{"joy": 1.0, "sadness": 0.0}, {}, {"joy": 0.0, "sadness": 1.0}], [3, 5, 1])
+    assert combined == {"joy": 0.75, "sadness": 0.25}
+
+
+def test_medium_entry_uses_the_batcher(client, monkeypatch):
+    monkeypatch.setattr(chunking, "TOKEN_BUDGET", None)
+    monkeypatch.setattr(chunking, "CHUNK_MODE", "auto")
+    result = client.post("/predict", json={"lines": [_words(120)]}).json()
+    assert "chunks" not in result
+    result = client.post("/predict", json={"lines": [_words(600)]}).json()
+    assert result["chunks"]["token_budget"] == chunking.DEFAULT_MODEL_LIMIT
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from backend import async_db, color_cache, database
+
+
+def _row(mood, day, user_id="u"):
+    return {"user_id": user_id, "date": day, "mood": mood, "color_hex": "#808080", "mood_score": 50, "description": "x"}
+
+
+def test_reads_are_cached_and_writes_patched(db):
+    database.save_daily_colors([_row("Sad", "2024-05-01"), _row("Calm", "2024-05-02")])
+    assert len(database.get_colors_by_date_range("u", "2024-05-01", "2024-05-31")) == 2
+    hits = color_cache.stats()["hits"]
+    database.get_colors_by_date_range("u", "2024-05-01", "2024-05-31")
+    assert color_cache.stats()["hits"] == hits + 1
+
+    database.save_daily_colors([_row("Joyful", "2024-05-03")])
+    rows = database.get_colors_by_date_range("u", "2024-05-01", "2024-05-31")
+    assert [r["mood"] for r in rows] == ["Sad", "Calm", "Joyful"]
+    assert color_cache.stats()["hits"] == hits + 2
+
+
+def test_read_that_raced_a_write_is_not_cached(db):
+    database.save_daily_colors([_row("Sad", "2024-05-01")])
+    color_cache.invalidate()
+    token = color_cache.read_token()
+    stale = database.supabase.table("daily_colors").select("*").eq("user_id", "u").execute().data
+    database.save_daily_colors([_row("Joyful", "2024-05-02")])
+
+    stale_stores = color_cache.stats()["stale_stores"]
+    color_cache.store_range("u", "2024-05-01", "2024-05-31", stale, token=token)
+    assert color_cache.stats()["stale_stores"] == stale_stores + 1
+    assert color_cache.get_range("u", "2024-05-01", "2024-05-31") is None
+    assert len(database.get_colors_by_date_range("u", "2024-05-01", "2024-05-31")) == 2
+
+
+def test_in_place_update_invalidates(db):
+    database.save_daily_colors([_row("Sad", "2024-05-01")])
+    row = database.get_user_colors("u", 5)[0]
+    token = color_cache.read_token()
+    database.update_daily_colors([{**row, "mood": "Joyful"}])
+    assert color_cache.written_since("u", token)
+    assert not color_cache.written_since("someone-else", token)
+    assert database.get_user_colors("u", 5)[0]["mood"] == "Joyful"
+
+
+def test_in_flight_rows_count_as_pending(db, monkeypatch):
+    save = database.save_daily_colors
+    started = []
+
+    def slow_save(rows):
+        started.append(len(rows))
+        time.sleep(0.2)
+        return save(rows)
+
+    monkeypatch.setattr(database, "save_daily_colors", slow_save)
+
+    async def scenario():
+        buffer = async_db.WriteBehindBuffer(flush_interval=60)
+        await buffer.add(_row("Calm", "2024-05-01"))
+        flushing = asyncio.ensure_future(buffer.flush())
+        while not started:
+            await asyncio.sleep(0.01)
+        assert buffer.stats()["pending_rows"] == 1
+        assert buffer.has_pending("u")
+        await flushing
+        assert buffer.stats()["pending_rows"] == 0
+        await buffer.close()
+
+    asyncio.run(scenario())
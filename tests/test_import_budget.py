@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+from backend import import_budget
+
+HEADROOM = float(os.environ.get("LUMI_IMPORT_BUDGET_HEADROOM", "1.5"))
+
+
+def test_api_import_skips_heavy_packages():
+    report = import_budget.check("backend.main", budget_ms=float("inf"), top=5)
+    assert report["forbidden_imports"] == []
+    assert report["ok"]
+    assert report["slowest"]
+
+
+def test_core_import_skips_heavy_packages():
+    report = import_budget.check("backend.core", budget_ms=float("inf"), top=5)
+    assert report["forbidden_imports"] == []
+
+
+def test_forbidden_import_fails_the_check(monkeypatch):
+    monkeypatch.setattr(import_budget, "FORBIDDEN", import_budget.FORBIDDEN + ("json",))
+    report = import_budget.check("backend.core", budget_ms=float("inf"), top=5)
+    assert "json" in report["forbidden_imports"]
+    assert not report["ok"]
+
+
+def test_budget_is_enforced():
+    assert not import_budget.check("backend.core", budget_ms=0.0, top=5)["ok"]
+
+
+def test_api_import_fits_the_budget():
+    budget_ms = import_budget.BUDGET_MS * HEADROOM
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-m", "backend.import_budget", "--budget-ms", str(budget_ms)],
+                            cwd=root, capture_output=True, text=True)
+    report = json.loads(result.stdout)
+    assert report["total_ms"] <= budget_ms, result.stderr
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,44 @@
+import sys
+import types
+
+import pytest
+
+from backend import core, inference_backends
+from backend.benchmark import StubEmotionClassifier, StubZeroShot
+
+
+@pytest.fixture
+def onnx_configured(monkeypatch):
+    monkeypatch.setattr(inference_backends, "INFERENCE_BACKEND", "onnx")
+    monkeypatch.setattr(inference_backends, "_loaded_backends", {})
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(pipeline=lambda task, model: f"torch:{model}"))
+
+
+@pytest.mark.parametrize("error", [ImportError("no onnxruntime"), RuntimeError("export failed"), OSError("disk full")])
+def test_onnx_failures_fall_back_to_torch(onnx_configured, monkeypatch, capsys, error):
+    def fail(task, model, quantize):
+        raise error
+
+    monkeypatch.setattr(inference_backends, "_build_onnx_pipeline", fail)
+    assert inference_backends.build_pipeline("text-classification", "m") == "torch:m"
+    assert inference_backends.effective_backend("m") == "torch"
+    assert str(error) in capsys.readouterr().out
+
+
+def test_fingerprint_follows_the_backend_that_loaded(onnx_configured, monkeypatch):
+    def fallback_builder(task, model):
+        inference_backends.record_backend(model, "torch")
+        return StubEmotionClassifier(ms_per_token=0)
+
+    monkeypatch.setattr(core, "emotion_classifier", None)
+    monkeypatch.setattr(core, "zero_shot", StubZeroShot(ms_per_token=0))
+    monkeypatch.setattr(core, "build_pipeline", fallback_builder)
+    monkeypatch.setitem(core._model_state["emotion"], "failed_at", None)
+    core.prediction_cache.clear()
+
+    policy = core.default_policy()
+    before = core._cache_fingerprint(policy)
+    first = core.analyze_batch(["I passed my driving test"], policy)[0]
+    assert first["version"]["backend"] == "torch"
+    assert core._cache_fingerprint(policy) != before
+    assert core.analyze_batch(["I passed my driving test"], policy)[0]["cascade"]["stage"] == "cache"
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from backend import core
+from backend.benchmark import StubEmotionClassifier
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Unloaded registry whose builder counts the models it builds."""
+    built = []
+
+    def build(task, model):
+        built.append(model)
+        return StubEmotionClassifier(ms_per_token=0)
+
+    monkeypatch.setattr(core, "build_pipeline", build)
+    monkeypatch.setattr(core, "emotion_classifier", None)
+    monkeypatch.setattr(core, "_model_state", {name: dict(state, failed_at=None, last_used=None, warm=False)
+                                               for name, state in core._model_state.items()})
+    return built
+
+
+def test_models_load_on_first_use_only(builds):
+    assert builds == []
+    pipe = core.get_pipeline("emotion")
+    assert core.get_pipeline("emotion") is pipe
+    assert builds == [core.EMOTION_MODEL]
+    assert core.model_stats()["emotion"]["loaded"]
+
+
+def test_failed_load_is_not_retried_immediately(builds, monkeypatch):
+    def broken(task, model):
+        builds.append(model)
+        raise OSError("download failed")
+
+    monkeypatch.setattr(core, "build_pipeline", broken)
+    assert core.get_pipeline("emotion") is None
+    assert core.get_pipeline("emotion") is None
+    assert len(builds) == 1
+    assert "download failed" in core._model_state["emotion"]["error"]
+
+    core._model_state["emotion"]["failed_at"] -= core.MODEL_RETRY_SECONDS
+    monkeypatch.setattr(core, "build_pipeline", lambda task, model: StubEmotionClassifier(ms_per_token=0))
+    assert core.get_pipeline("emotion") is not None
+
+
+def test_idle_models_are_unloaded_and_reload_on_demand(builds):
+    core.get_pipeline("emotion")
+    assert core.unload_idle_models(0) == []
+    assert core.unload_idle_models(60) == []
+
+    core._model_state["emotion"]["last_used"] = time.time() - 120
+    assert core.unload_idle_models(60) == ["emotion"]
+    assert core.emotion_classifier is None
+    assert core.get_pipeline("emotion") is not None
+    assert len(builds) == 2
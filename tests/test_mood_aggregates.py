@@ -0,0 +1,72 @@
+import datetime
+
+from backend import database, mood_aggregates
+
+TODAY = str(datetime.date.today())
+
+
+def _save(mood, user_id="u"):
+    assert database.save_daily_color(user_id, mood, "#808080", 50)["success"]
+
+
+def _write_during(monkeypatch, scan_name, mood, user_id="w"):
+    """Make the next ``scan_name`` call save a row right after it reads the table."""
+    scan = getattr(mood_aggregates, scan_name)
+
+    def racing_scan(*args, **kwargs):
+        result = scan(*args, **kwargs)
+        monkeypatch.setattr(mood_aggregates, scan_name, scan)
+        _save(mood, user_id)
+        return result
+
+    monkeypatch.setattr(mood_aggregates, scan_name, racing_scan)
+
+
+def test_counters_follow_writes(db):
+    _save("Sad")
+    assert mood_aggregates.day_counts(db, TODAY) == {"Sad": 1}
+    assert mood_aggregates.recent_user_counts(db, "u", 5) == {"Sad": 1}
+    _save("Joyful")
+    _save("Joyful", user_id="v")
+    assert mood_aggregates.day_counts(db, TODAY) == {"Sad": 1, "Joyful": 2}
+    assert mood_aggregates.recent_user_counts(db, "u", 5) == {"Sad": 1, "Joyful": 1}
+    assert mood_aggregates.check_consistency(db, "u")["consistent"]
+
+
+def test_day_scan_raced_by_a_write_is_not_kept(db, monkeypatch):
+    _save("Sad")
+    mood_aggregates.invalidate(days=[TODAY])
+    _write_during(monkeypatch, "_count_day", "Calm")
+    assert mood_aggregates.day_counts(db, TODAY) == {"Sad": 1}
+    # The stale scan was dropped, so the next read rescans instead of missing the write
+    assert mood_aggregates.day_counts(db, TODAY) == {"Sad": 1, "Calm": 1}
+    assert mood_aggregates.check_consistency(db)["consistent"]
+
+
+def test_user_scan_raced_by_a_write_is_not_kept(db, monkeypatch):
+    _save("Sad", user_id="w")
+    mood_aggregates.invalidate(user_ids=["w"])
+    _write_during(monkeypatch, "_count_user", "Calm")
+    assert mood_aggregates.recent_user_counts(db, "w", 5) == {"Sad": 1}
+    assert mood_aggregates.recent_user_counts(db, "w", 5) == {"Sad": 1, "Calm": 1}
+    assert mood_aggregates.check_consistency(db, "w")["consistent"]
+
+
+def test_check_consistency_skips_scopes_written_during_the_scan(db, monkeypatch):
+    _save("Sad", user_id="w")
+    mood_aggregates.day_counts(db, TODAY)
+    mood_aggregates.recent_user_counts(db, "w", 5)
+    _write_during(monkeypatch, "_scan", "Calm")
+    report = mood_aggregates.check_consistency(db, "w")
+    assert report["consistent"] and not report["mismatches"]
+    assert {s["scope"] for s in report["skipped"]} == {"day", "user"}
+    assert mood_aggregates.check_consistency(db, "w") == {"date": TODAY, "consistent": True, "mismatches": [], "skipped": []}
+
+
+def test_check_consistency_reports_drift(db):
+    _save("Sad")
+    mood_aggregates.day_counts(db, TODAY)
+    db.table("daily_colors").insert({"user_id": "x", "date": TODAY, "mood": "Angry", "color_hex": "#ff0000", "mood_score": 10}).execute()
+    report = mood_aggregates.check_consistency(db)
+    assert not report["consistent"]
+    assert report["mismatches"][0]["table"] == {"Sad": 1, "Angry": 1}
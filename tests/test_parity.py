@@ -0,0 +1,46 @@
+import sys
+import types
+
+from backend import inference_backends, parity
+from backend.benchmark import StubEmotionClassifier, StubZeroShot
+
+
+class _Flipped(StubEmotionClassifier):
+    """Agrees with the reference except on texts mentioning an exam."""
+
+    def _one(self, text):
+        scores = super()._one(text)
+        if "exam" in text:
+            scores = [{"label": s["label"], "score": 1.0 if s["label"] == "surprise" else 0.0} for s in scores]
+        return scores
+
+
+def test_identical_backends_agree(monkeypatch):
+    monkeypatch.setattr(parity, "build_pipeline", lambda task, model, backend=None: StubZeroShot(ms_per_token=0))
+    report = parity.compare("zero-shot-classification", "m", "onnx-int8", parity.SAMPLE_TEXTS, parity._top_zero_shot)
+    assert report["agreement"] == 1.0
+    assert report["mean_abs_score_diff"] == 0.0
+    assert report["disagreements"] == []
+    assert set(report["ms_per_text"]) == {"torch", "onnx-int8"}
+
+
+def test_disagreements_are_reported(monkeypatch):
+    pipes = {"torch": StubEmotionClassifier(ms_per_token=0), "onnx": _Flipped(ms_per_token=0)}
+    monkeypatch.setattr(parity, "build_pipeline", lambda task, model, backend=None: pipes[backend])
+    report = parity.compare("text-classification", "m", "onnx", parity.SAMPLE_TEXTS, parity._top_emotion)
+    assert report["agreement"] < 1.0
+    assert [d["text"] for d in report["disagreements"]] == ["I'm anxious about exams"]
+    assert report["disagreements"][0]["onnx"] == "surprise"
+
+
+def test_fallback_reports_torch(monkeypatch):
+    def unavailable(task, model, quantize):
+        raise ImportError("No module named 'onnxruntime'")
+
+    monkeypatch.setattr(inference_backends, "_build_onnx_pipeline", unavailable)
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(pipeline=lambda task, model: StubEmotionClassifier()))
+    monkeypatch.setattr(inference_backends, "_loaded_backends", {})
+    monkeypatch.setattr(inference_backends, "INFERENCE_BACKEND", "onnx-int8")
+    assert inference_backends.effective_backend("m") == "onnx-int8"
+    inference_backends.build_pipeline("text-classification", "m")
+    assert inference_backends.effective_backend("m") == "torch"
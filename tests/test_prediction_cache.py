@@ -0,0 +1,75 @@
+import json
+
+from backend import core, prediction_cache as prediction_cache_module
+from backend.prediction_cache import PredictionCache, fingerprint
+
+PREDICTION = {"emotion": "Calm", "hue": 120}
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(prediction_cache_module.time, "time", clock)
+    cache = PredictionCache(ttl_seconds=60, path=None)
+    cache.put("A quiet walk", "fp", PREDICTION)
+    clock.now += 59
+    assert cache.get("A  quiet walk ", "fp") == PREDICTION
+    clock.now += 2
+    assert cache.get("A quiet walk", "fp") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_new_fingerprint_misses_older_entries():
+    cache = PredictionCache(path=None)
+    old = fingerprint({"emotion_model": "a"})
+    cache.put("A quiet walk", old, PREDICTION)
+    assert cache.get("A quiet walk", fingerprint({"emotion_model": "b"})) is None
+    assert cache.get("A quiet walk", old, variant="chunked:510:16") is None
+    assert cache.get("A quiet walk", old) == PREDICTION
+
+
+def test_policy_changes_the_core_fingerprint():
+    policy = core.default_policy()
+    assert core._cache_fingerprint(policy) == core._cache_fingerprint(core.default_policy())
+    assert core._cache_fingerprint(policy.with_overrides(mode="fast-only")) != core._cache_fingerprint(policy)
+
+
+def test_memory_bound_evicts_least_recently_used():
+    size = len(json.dumps(PREDICTION))
+    cache = PredictionCache(max_bytes=size * 3, path=None)
+    for text in ("one", "two", "three"):
+        cache.put(text, "fp", PREDICTION)
+    cache.get("one", "fp")
+    cache.put("four", "fp", PREDICTION)
+    assert cache.get("two", "fp") is None
+    assert all(cache.get(text, "fp") for text in ("one", "three", "four"))
+    assert cache.stats()["bytes"] <= size * 3
+    assert cache.stats()["evictions"] == 1
+
+    cache.put("huge", "fp", {"summary": "x" * size * 4})
+    assert cache.get("huge", "fp") is None
+    assert cache.stats()["entries"] == 3
+
+
+def test_entry_count_bound():
+    cache = PredictionCache(max_entries=2, path=None)
+    for text in ("one", "two", "three"):
+        cache.put(text, "fp", PREDICTION)
+    assert cache.stats()["entries"] == 2
+    assert cache.get("one", "fp") is None
+
+
+def test_persistent_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "predictions.db")
+    PredictionCache(path=path).put("A quiet walk", "fp", PREDICTION)
+    reopened = PredictionCache(path=path)
+    assert reopened.get("A quiet walk", "fp") == PREDICTION
+    assert reopened.stats()["disk_hits"] == 1
@@ -0,0 +1,34 @@
+import datetime
+import json
+
+from backend import database
+
+
+def _lines(client, **params):
+    return [json.loads(line) for line in client.get("/summarize/u", params=params).text.splitlines()]
+
+
+def test_replay_matches_the_first_stream_except_the_cached_flag(client, monkeypatch):
+    rows = [{"user_id": "u", "date": f"2026-0{m}-1{d}", "mood": mood, "color_hex": "#808080", "mood_score": 10 * d,
+             "description": f'You wrote "cached": false on day {d}.'} for m in (1, 2) for d, mood in enumerate(["Sad", "Calm", "Sad"])]
+    database.save_daily_colors(rows)
+    params = {"start_date": "2026-01-01", "end_date": "2026-03-31"}
+    first = _lines(client, **params)
+    assert [line["page"]["entries"] for line in first[:-1]] == [3, 3]
+    assert first[-1]["done"] and first[-1]["cached"] is False
+    assert first[-1]["mood_counts"] == {"Sad": 4, "Calm": 2}
+
+    reads = []
+    monkeypatch.setattr(database, "get_colors_by_date_range", lambda *args: reads.append(args) or [])
+    replay = _lines(client, **params)
+    assert reads == []
+    assert replay[:-1] == first[:-1]
+    assert replay[-1] == {**first[-1], "cached": True}
+
+
+def test_range_limits(client):
+    today = datetime.date.today()
+    too_long = {"start_date": str(today - datetime.timedelta(days=5000)), "end_date": str(today)}
+    assert client.get("/summarize/u", params=too_long).status_code == 400
+    empty = _lines(client, start_date=str(today), end_date=str(today))
+    assert empty[-1]["summary"] == f"No entries between {today} and {today}."
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+from backend import core, database, mood_aggregates, rescore
+from backend.semantic_reuse import semantic_index
+
+
+@pytest.fixture(autouse=True)
+def store_entry_text(monkeypatch):
+    monkeypatch.setattr(database, "STORE_ENTRY_TEXT", True)
+
+
+def _seed(count):
+    rows = [{"user_id": f"u{i % 2}", "date": f"2024-01-{i % 28 + 1:02d}", "mood": "Neutral", "color_hex": "#808080",
+             "mood_score": 0, "description": "You felt something.",
+             "entry_text": f"Today I felt thing number {i}.\nThen I went home." if i % 4 else None} for i in range(count)]
+    assert database.save_daily_colors(rows)["success"]
+
+
+def _rows(db):
+    return db.table("daily_colors").select("*").order("id").execute().data
+
+
+def test_rescore_rewrites_changed_rows(db, stub_models, tmp_path):
+    _seed(20)
+    job = rescore.RescoreJob(db, str(tmp_path / "ck.json"), rate=0, page_size=6, batch_size=4)
+    state = asyncio.run(job.run())
+    assert state["done"] and state["scanned"] == 20
+    assert state["skipped"] == 5
+    assert state["updated"] + state["unchanged"] == 15
+
+    for row in _rows(db):
+        if row["entry_text"]:
+            expected = rescore.scored_fields(core.analyze_lines(row["entry_text"].split("\n")))
+            assert {k: row[k] for k in expected} == expected
+        else:
+            assert row["mood"] == "Neutral"
+    assert mood_aggregates.check_consistency(db, "u1")["consistent"]
+
+
+def test_unchanged_model_updates_nothing(client, db, tmp_path):
+    entries = [["Got the job offer today!", "Celebrated with friends."], ["Rainy and slow."], ["Argued with my landlord again"]]
+    for lines in entries:
+        assert client.post("/predict", json={"lines": lines, "user_id": "u"}).status_code == 200
+    # Reading the user's colors flushes the write-behind buffer
+    assert len(client.get("/colors/u").json()["colors"]) == 3
+    assert [row["entry_text"] for row in _rows(db)] == ["\n".join(lines) for lines in entries]
+
+    state = asyncio.run(rescore.RescoreJob(db, str(tmp_path / "ck.json"), rate=0).run())
+    assert state["scanned"] == 3
+    assert state["unchanged"] == 3
+    assert state["updated"] == 0
+
+
+def test_rescore_bypasses_prediction_cache_and_semantic_index(db, stub_models, tmp_path):
+    _seed(8)
+    cache_before = core.prediction_cache.stats()
+    index_before = semantic_index.stats()
+    asyncio.run(rescore.RescoreJob(db, str(tmp_path / "ck.json"), rate=0).run())
+    cache_after = core.prediction_cache.stats()
+    assert (cache_after["entries"], cache_after["hits"], cache_after["misses"]) == \
+        (cache_before["entries"], cache_before["hits"], cache_before["misses"])
+    assert semantic_index.stats()["lookups"] == index_before["lookups"]
+
+
+def test_refuses_without_entry_text_column(db, stub_models, tmp_path, monkeypatch):
+    _seed(4)
+    monkeypatch.setattr(rescore, "TEXT_COLUMN", "missing_column")
+    with pytest.raises(RuntimeError, match="migrations/daily_colors_entry_text.sql"):
+        asyncio.run(rescore.RescoreJob(db, str(tmp_path / "ck.json"), rate=0).run())
+    assert {row["mood"] for row in _rows(db)} == {"Neutral"}
+
+
+def test_rescore_resumes_from_checkpoint(db, stub_models, tmp_path, monkeypatch):
+    _seed(20)
+    checkpoint = str(tmp_path / "ck.json")
+    write = database.update_daily_colors
+    calls = []
+
+    def fail_second_page(rows):
+        calls.append(len(rows))
+        return {"error": "boom"} if len(calls) == 2 else write(rows)
+
+    monkeypatch.setattr(database, "update_daily_colors", fail_second_page)
+    with pytest.raises(RuntimeError):
+        asyncio.run(rescore.RescoreJob(db, checkpoint, rate=0, page_size=6, batch_size=4).run())
+    with open(checkpoint) as f:
+        assert json.load(f)["last_id"] == 6
+
+    monkeypatch.setattr(database, "update_daily_colors", write)
+    job = rescore.RescoreJob(db, checkpoint, rate=0, page_size=6, batch_size=4)
+    assert job.state["last_id"] == 6
+    assert asyncio.run(job.run())["done"]
+
+
+def test_dry_run_writes_nothing(db, stub_models, tmp_path):
+    _seed(8)
+    state = asyncio.run(rescore.RescoreJob(db, str(tmp_path / "ck.json"), rate=0, dry_run=True).run())
+    assert state["updated"] > 0
+    assert {row["mood"] for row in _rows(db)} == {"Neutral"}
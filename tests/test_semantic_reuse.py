@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from backend import core
+from backend.semantic_reuse import SemanticIndex
+
+
+def _unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _bag_of_words(texts):
+    """Normalized bag-of-words vectors over a tiny vocabulary, as a stand-in encoder."""
+    vocab = ["great", "day", "work", "today", "awful", "commute", "rain"]
+    return np.stack([_unit(*([float(w in t.lower().split()) for w in vocab] + [0.05])) for t in texts])
+
+
+@pytest.mark.parametrize("threshold, reused", [(0.9, [True, False]), (0.96, [False, False]), (0.75, [True, True])])
+def test_threshold_decides_reuse(threshold, reused):
+    index = SemanticIndex(max_entries=8, threshold=threshold, enabled=True)
+    index.add([_unit(1, 0)], [{"emotion": "Joyful", "summary": "old text", "cascade": {}}], "fp")
+    # cosine similarities 0.95 and 0.8
+    matches = index.search(np.stack([_unit(0.95, 0.312), _unit(0.8, 0.6)]), "fp")
+    assert [m is not None for m in matches] == reused
+    if matches[0] is not None:
+        prediction, similarity = matches[0]
+        assert prediction == {"emotion": "Joyful"}
+        assert similarity == pytest.approx(0.95, abs=1e-3)
+
+
+def test_fingerprint_change_and_ring_eviction():
+    index = SemanticIndex(max_entries=2, threshold=0.99, enabled=True)
+    index.add([_unit(1, 0, 0), _unit(0, 1, 0), _unit(0, 0, 1)], [{"n": 1}, {"n": 2}, {"n": 3}], "fp")
+    assert index.stats()["evictions"] == 1
+    assert [m and m[0]["n"] for m in index.search(np.stack([_unit(1, 0, 0), _unit(0, 0, 1)]), "fp")] == [None, 3]
+    assert index.search(np.stack([_unit(0, 0, 1)]), "new-fp") == [None]
+    assert index.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.3, 1.0])
+def test_audit_sampling_rate(rate):
+    index = SemanticIndex(audit_rate=rate, enabled=True, seed=1)
+    audited = sum(index.should_audit() for _ in range(2000))
+    assert audited == pytest.approx(rate * 2000, abs=100)
+    assert index.stats()["audited_hits"] == audited
+
+
+@pytest.fixture
+def reuse(stub_models, monkeypatch):
+    def make(audit_rate):
+        index = SemanticIndex(max_entries=16, threshold=0.85, audit_rate=audit_rate, enabled=True, seed=0)
+        monkeypatch.setattr(core, "semantic_index", index)
+        monkeypatch.setattr(core, "sentence_encoder", _bag_of_words)
+        return index
+    return make
+
+
+def test_paraphrase_reuses_the_prediction(reuse):
+    index = reuse(audit_rate=0.0)
+    first = core.analyze_batch(["Had a great day at work"])[0]
+    second, other = core.analyze_batch(["Great day at work today", "Awful commute in the rain"])
+    assert second["method"] == "semantic-reuse"
+    assert (second["emotion"], second["hue"]) == (first["emotion"], first["hue"])
+    assert second["summary"] == core.make_summary("Great day at work today")
+    assert other["method"] != "semantic-reuse"
+    assert index.stats()["hits"] == 1
+
+
+def test_audited_hits_run_the_models(reuse):
+    index = reuse(audit_rate=1.0)
+    core.analyze_batch(["Had a great day at work"])
+    audited = core.analyze_batch(["Great day at work today"])[0]
+    assert audited["method"] != "semantic-reuse"
+    stats = index.stats()
+    assert (stats["hits"], stats["audited_hits"], stats["audits"]) == (0, 1, 1)
+    assert stats["audit_agreement"] in (0.0, 1.0)
@@ -0,0 +1,63 @@
+import random
+import re
+
+from backend import summary
+
+
+def baseline_make_summary(user_text):
+    """make_summary as it was in core.py before backend/summary.py (minus the model loading)."""
+    lines = [l.strip() for l in re.split(r'[\n\r]+', user_text) if l.strip()]
+    if not lines:
+        return "You had a quiet day."
+    actions = []
+    for line in lines:
+        line_clean = re.sub(r'^(Morning|Afternoon|Evening|Night|Day|Morning:|Afternoon:|Evening:|Night:|A key moment|Interaction|A challenge|Event|Thing|Activity|Note)[\s:]*', '', line, flags=re.IGNORECASE)
+        if line_clean:
+            line_clean = re.sub(r'\bI\b', 'you', line_clean, flags=re.IGNORECASE)
+            line_clean = re.sub(r'\bmy\b', 'your', line_clean, flags=re.IGNORECASE)
+            line_clean = re.sub(r'\bme\b', 'you', line_clean, flags=re.IGNORECASE)
+            line_clean = line_clean.strip()
+            if line_clean:
+                line_clean = line_clean[0].lower() + line_clean[1:]
+                actions.append(line_clean)
+    if not actions:
+        return "You had a quiet day."
+    if len(actions) == 1:
+        action = actions[0]
+        if action.lower().startswith('you '):
+            summary_text = action[0].upper() + action[1:]
+        else:
+            summary_text = f"You {action}"
+    elif len(actions) <= 3:
+        summary_text = "You " + ", ".join(actions)
+    else:
+        summary_text = "You " + ", ".join(actions[:3]) + "."
+    if not summary_text.endswith('.'):
+        summary_text += '.'
+    return summary_text
+
+
+EDGE_CASES = [
+    "", " ", "\n\r\n", "Morning:", "Note: ", "Morning: I", "i", "I I I", "MY day, me and I.",
+    "You went out with friends", "you ", "Evening walk with my dog", "Daydreaming at my desk",
+    "Thing: it rained.", "Eventually I slept", "Me time\r\nmy time\rI time", "Ich bin müde, mein Freund",
+    "A challenge:   ", "Interaction: Mimi called me", "line one\nline two\nline three\nline four\nline five",
+    "Activity:I ran 5k.", "Note:\tI think my mind is made up.",
+]
+
+
+def test_matches_baseline_on_edge_cases():
+    for text in EDGE_CASES:
+        assert summary.summarize(text) == baseline_make_summary(text), text
+
+
+def test_matches_baseline_on_shuffled_journal_lines():
+    rng = random.Random(7)
+    words = ["I", "my", "me", "Me", "MY", "mine", "time", "Morning:", "Note", "met", "you", "at", "home", ".", ""]
+    texts = []
+    for _ in range(500):
+        lines = rng.sample(summary.SYNTHETIC_LINES, rng.randint(0, len(summary.SYNTHETIC_LINES)))
+        lines += [" ".join(rng.choice(words) for _ in range(rng.randint(0, 6))) for _ in range(rng.randint(0, 3))]
+        rng.shuffle(lines)
+        texts.append(rng.choice(["\n", "\r\n", "\n\n"]).join(lines))
+    assert summary.summarize_many(texts) == [baseline_make_summary(t) for t in texts]
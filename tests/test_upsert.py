@@ -0,0 +1,67 @@
+import asyncio
+import datetime
+import json
+
+from backend import async_db, database, mood_aggregates
+
+
+def _row(mood, day=None, user_id="u"):
+    return {"user_id": user_id, "date": day or str(datetime.date.today()), "mood": mood, "color_hex": "#808080",
+            "mood_score": 50, "description": f"A {mood.lower()} day."}
+
+
+def _stored(db, user_id="u"):
+    return db.table("daily_colors").select("*").eq("user_id", user_id).execute().data
+
+
+def test_second_save_replaces_the_day(upsert_db):
+    assert database.save_daily_color("u", "Sad", "#000000", 20)["success"]
+    first_id = _stored(upsert_db)[0]["id"]
+    assert database.save_daily_color("u", "Joyful", "#ffff00", 90)["success"]
+
+    rows = _stored(upsert_db)
+    assert [(r["id"], r["mood"]) for r in rows] == [(first_id, "Joyful")]
+    assert mood_aggregates.recent_user_counts(upsert_db, "u", 10) == {"Joyful": 1}
+    assert mood_aggregates.check_consistency(upsert_db, "u")["consistent"]
+    assert [r["mood"] for r in database.get_user_colors("u", 5)] == ["Joyful"]
+
+
+def test_batch_keeps_the_last_row_per_day(upsert_db):
+    result = database.save_daily_colors([_row("Sad", "2024-03-01"), _row("Calm", "2024-03-02"), _row("Angry", "2024-03-01")])
+    assert result["success"]
+    assert sorted((r["date"], r["mood"]) for r in _stored(upsert_db)) == [("2024-03-01", "Angry"), ("2024-03-02", "Calm")]
+
+
+def test_insert_mode_keeps_every_row(db):
+    database.save_daily_colors([_row("Sad"), _row("Joyful")])
+    assert len(_stored(db)) == 2
+
+
+def test_write_buffer_coalesces_queued_rows(upsert_db):
+    async def scenario():
+        buffer = async_db.WriteBehindBuffer(flush_interval=60, coalesce_seconds=0)
+        await buffer.add(_row("Sad"))
+        await buffer.add(_row("Joyful"))
+        assert buffer.stats()["coalesced_rows"] == 1
+        await buffer.close()
+
+    asyncio.run(scenario())
+    assert [r["mood"] for r in _stored(upsert_db)] == ["Joyful"]
+
+
+def test_upsert_invalidates_analytics_and_summaries(upsert_db, client):
+    today = datetime.date.today()
+    days = [str(today - datetime.timedelta(days=d)) for d in range(3)]
+    database.save_daily_colors([_row("Sad", day) for day in days])
+    params = {"start_date": days[-1], "end_date": days[0]}
+
+    def summary():
+        return json.loads(client.get("/summarize/u", params=params).text.strip().splitlines()[-1])
+
+    assert client.get("/analytics/u").json()["daily"]["dominant_mood"] == ["Sad"] * 3
+    assert summary()["mood_counts"] == {"Sad": 3}
+    assert summary()["cached"]
+
+    database.save_daily_colors([_row("Joyful", days[1])])
+    assert client.get("/analytics/u").json()["daily"]["dominant_mood"] == ["Sad", "Joyful", "Sad"]
+    assert summary()["mood_counts"] == {"Sad": 2, "Joyful": 1}
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from backend import async_db, database
+
+
+def _row(mood, day="2024-05-01", user_id="u"):
+    return {"user_id": user_id, "date": day, "mood": mood, "color_hex": "#808080", "mood_score": 50, "description": None}
+
+
+def _failing_saves(monkeypatch, failures):
+    """Make the first ``failures`` saves return an error; returns the list of attempted batch sizes."""
+    save = database.save_daily_colors
+    attempts = []
+
+    def flaky(rows):
+        attempts.append(len(rows))
+        return {"error": "connection reset"} if len(attempts) <= failures else save(rows)
+
+    monkeypatch.setattr(database, "save_daily_colors", flaky)
+    return attempts
+
+
+def test_reads_do_not_wait_for_the_retry_backoff(db, monkeypatch):
+    monkeypatch.setattr(async_db, "RETRY_BACKOFF_SECONDS", 30)
+    attempts = _failing_saves(monkeypatch, failures=1)
+
+    async def scenario():
+        buffer = async_db.WriteBehindBuffer(flush_interval=60)
+        await buffer.add(_row("Calm"))
+        start = time.perf_counter()
+        await buffer.flush()
+        assert buffer.has_pending("u")
+        # A read flushes the user's rows first; it retries at once instead of after 30s
+        await buffer.flush()
+        elapsed = time.perf_counter() - start
+        assert not buffer.has_pending("u")
+        await buffer.close()
+        return elapsed
+
+    assert asyncio.run(scenario()) < 5
+    assert attempts == [1, 1]
+    assert [r["mood"] for r in db.table("daily_colors").select("mood").execute().data] == ["Calm"]
+
+
+def test_failed_rows_are_retried_in_the_background(db, monkeypatch):
+    monkeypatch.setattr(async_db, "RETRY_BACKOFF_SECONDS", 0.01)
+    attempts = _failing_saves(monkeypatch, failures=2)
+
+    async def scenario():
+        buffer = async_db.WriteBehindBuffer(flush_interval=60, max_retries=3)
+        await buffer.add(_row("Calm"))
+        await buffer.flush()
+        for _ in range(100):
+            if not buffer.has_pending("u"):
+                break
+            await asyncio.sleep(0.01)
+        stats = buffer.stats()
+        await buffer.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert attempts == [1, 1, 1]
+    assert (stats["flushes"], stats["failed_flushes"], stats["pending_rows"]) == (1, 0, 0)
+
+
+def test_rows_wait_for_the_next_flush_after_max_retries(db, monkeypatch):
+    monkeypatch.setattr(async_db, "RETRY_BACKOFF_SECONDS", 0.01)
+    attempts = _failing_saves(monkeypatch, failures=100)
+
+    async def scenario():
+        buffer = async_db.WriteBehindBuffer(flush_interval=60, max_retries=2)
+        await buffer.add(_row("Calm"))
+        await buffer.flush()
+        await asyncio.sleep(0.2)
+        stats = buffer.stats()
+        await buffer.close()
+        return stats, buffer.stats()
+
+    before_close, after_close = asyncio.run(scenario())
+    assert (before_close["failed_flushes"], before_close["pending_rows"]) == (1, 1)
+    assert len(attempts) == 4  # two attempts, then two more on shutdown
+    assert (after_close["pending_rows"], after_close["dropped_rows"]) == (0, 1)
@@ -0,0 +1,130 @@
+import types
+
+import pytest
+
+from backend import core, zero_shot_engine
+from backend.zero_shot_engine import EmbeddingZeroShot, NLIZeroShot
+
+LABELS = list(core.EMOTION_MAP.keys())
+
+
+class _Tokenizer:
+    """Word-level tokenizer with RoBERTa-style pair layout: <s> A </s></s> B </s>."""
+    model_max_length = 32
+
+    def __init__(self):
+        self.vocab = {}
+
+    def encode(self, text, add_special_tokens=False):
+        ids = [self.vocab.setdefault(w, len(self.vocab) + 3) for w in text.lower().split()]
+        return [0] + ids + [2] if add_special_tokens else ids
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 4 if pair else 2
+
+    def build_inputs_with_special_tokens(self, a, b):
+        return [0] + a + [2, 2] + b + [2]
+
+    def pad(self, encoded, return_tensors="pt"):
+        import torch
+        rows = encoded["input_ids"]
+        width = max(len(r) for r in rows)
+        return {"input_ids": torch.tensor([r + [1] * (width - len(r)) for r in rows]),
+                "attention_mask": torch.tensor([[1] * len(r) + [0] * (width - len(r)) for r in rows])}
+
+
+class _NLIModel:
+    """Logits that depend only on the unpadded pair, so batching must not change them."""
+    config = types.SimpleNamespace(label2id={"CONTRADICTION": 0, "NEUTRAL": 1, "ENTAILMENT": 2})
+
+    def __init__(self):
+        self.widths = []
+
+    def __call__(self, input_ids, attention_mask):
+        import torch
+        self.widths.append(input_ids.shape[1])
+        signal = ((input_ids * attention_mask) % 7).sum(dim=1).float() / 10.0
+        return types.SimpleNamespace(logits=torch.stack([-signal, torch.zeros_like(signal), signal], dim=1))
+
+
+def _pipe():
+    return types.SimpleNamespace(model=_NLIModel(), tokenizer=_Tokenizer())
+
+
+def _pipeline_scores(pipe, text, labels):
+    """What the HF pipeline computes: one pair per label, softmax over entailment logits."""
+    import torch
+    tokenizer = pipe.tokenizer
+    logits = [pipe.model(**tokenizer.pad({"input_ids": [tokenizer.build_inputs_with_special_tokens(
+        tokenizer.encode(text), tokenizer.encode(zero_shot_engine.HYPOTHESIS_TEMPLATE.format(label)))]})).logits[0, 2]
+        for label in labels]
+    scores = torch.softmax(torch.stack(logits), dim=-1).tolist()
+    return dict(zip(labels, scores))
+
+
+def test_nli_engine_matches_per_pair_scores():
+    pytest.importorskip("torch")
+    pipe = _pipe()
+    engine = NLIZeroShot(pipe, pair_batch=4)
+    texts = ["I finally finished the marathon", "Rain all day and nothing to do"]
+    outputs = engine(texts, LABELS)
+    for text, output in zip(texts, outputs):
+        expected = _pipeline_scores(pipe, text, LABELS)
+        assert output["sequence"] == text
+        assert output["scores"] == sorted(output["scores"], reverse=True)
+        for label, score in zip(output["labels"], output["scores"]):
+            assert score == pytest.approx(expected[label], abs=1e-6)
+    assert engine(texts[0], LABELS) == outputs[0]
+    assert len(engine._hypotheses) == 1
+
+
+def test_nli_engine_truncates_long_premises():
+    pytest.importorskip("torch")
+    pipe = _pipe()
+    output = NLIZeroShot(pipe)(" ".join(f"word{i}" for i in range(200)), LABELS, multi_label=True)
+    assert max(pipe.model.widths) <= _Tokenizer.model_max_length
+    assert all(0.0 < s < 1.0 for s in output["scores"])
+    assert sum(output["scores"]) != pytest.approx(1.0)
+
+
+class _KeywordEncoder:
+    """One axis per keyword; texts are encoded as the normalized sum of their keywords."""
+    keywords = ["joy", "calm", "sad", "angry", "fearful", "disgusted", "surprised", "anticipation", "neutral"]
+
+    def __init__(self, name):
+        self.calls = []
+
+    def encode(self, texts):
+        import torch
+        self.calls.append(list(texts))
+        vectors = torch.tensor([[1.0 if k in t.lower() else 0.0 for k in self.keywords] + [0.1] for t in texts])
+        return torch.nn.functional.normalize(vectors, dim=-1)
+
+
+def test_embedding_engine_ranks_by_similarity(monkeypatch):
+    pytest.importorskip("torch")
+    monkeypatch.setattr(zero_shot_engine, "SentenceEncoder", _KeywordEncoder)
+    engine = EmbeddingZeroShot("encoder")
+    outputs = engine(["So sad after the call", "Pure joy at the concert"], LABELS)
+    assert [o["labels"][0] for o in outputs] == ["Sad/Depressed", "Joy/Happy"]
+    assert all(sum(o["scores"]) == pytest.approx(1.0) for o in outputs)
+
+    engine("Calm evening", LABELS, multi_label=True)
+    # Label vectors are encoded once per label set
+    assert sum(len(batch) == len(LABELS) for batch in engine.encoder.calls) == 1
+
+
+def test_build_picks_the_engine(monkeypatch):
+    pipe = _pipe()
+    monkeypatch.setattr(zero_shot_engine, "build_pipeline", lambda task, model: pipe)
+    assert zero_shot_engine.build("zero-shot-classification", "m", mode="pipeline") is pipe
+    engine = zero_shot_engine.build("zero-shot-classification", "m", mode="nli")
+    assert isinstance(engine, NLIZeroShot)
+    assert (engine.entailment_id, engine.contradiction_id) == (2, 0)
+    with pytest.raises(ValueError):
+        zero_shot_engine.build("zero-shot-classification", "m", mode="fast")
+
+
+def test_model_name_follows_the_mode():
+    assert zero_shot_engine.model_name("nli-model", mode="nli") == "nli-model"
+    assert zero_shot_engine.model_name("nli-model", mode="embedding") == zero_shot_engine.ENCODER_MODEL